@@ -0,0 +1,251 @@
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from json import loads, dumps
+from os import cpu_count, makedirs
+from os.path import dirname, exists
+from time import perf_counter
+from math import ceil
+import platform
+import gc
+import tracemalloc
+import numpy
+import sys
+from nlp.dataset import Dataset
+from nlp.document import Document
+from nlp.term_document_matrix import TermDocumentMatrix
+from nlp.naive_bayes import NaiveBayes
+from nlp.knn import KNN
+from nlp.id3 import ID3
+from nlp.latent_semantic_analysis import LatentSemanticAnalysis
+from nlp.kmeans import KMeans
+
+
+class Benchmark:
+
+    """A benchmark of a hot path: a function run on the arguments returned by an (untimed) setup function,
+    processing a number of items (e.g. documents) per run."""
+
+    def __init__(self, name, function, items, setup=None):
+        """Initializes the benchmark given its name, the function benchmarked, the number of items it processes
+        (or a function returning it given the arguments) and the setup function returning the tuple of its arguments
+        (no arguments if None)."""
+        self.name = name
+        self.function = function
+        self.items = items
+        self.setup = setup
+
+    def run(self, repeats=5, minimum_time=0.2):
+        """Returns a dictionary with the median and minimum times (in seconds) of a call of the function over the
+        given number of runs, its throughput (in items per second, for the minimum time) and its peak memory
+        (in megabytes, traced in a separate call); whatever the function prints is discarded.
+
+        After a first (warm-up) call, the function is called as many times per run as needed for a run to last
+        at least the minimum time, so that short functions are timed over several calls; as with timeit,
+        the garbage collector is disabled during the runs."""
+        arguments = () if self.setup is None else self.setup()
+        times = []
+        with redirect_stdout(StringIO()):
+            start = perf_counter()
+            self.function(*arguments)
+            loops = max(1, int(ceil(minimum_time / max(perf_counter() - start, 1e-9))))
+            for i in range(0, repeats):
+                gc.collect()
+                gc.disable()
+                start = perf_counter()
+                for j in range(0, loops):
+                    self.function(*arguments)
+                times.append((perf_counter() - start) / loops)
+                gc.enable()
+            tracemalloc.start()
+            self.function(*arguments)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        items = self.items(*arguments) if callable(self.items) else self.items
+        return {"seconds": float(numpy.median(times)), "minimum_seconds": min(times), "loops": loops, "items": items,
+                "throughput": items / max(min(times), 1e-9), "peak_memory_mb": peak / 1048576}
+
+
+class BenchmarkSuite:
+
+    """A suite of benchmarks covering the hot paths of the project on a dataset: tokenization, the term-document
+    matrix, training and prediction with NaiveBayes, KNN and ID3, latent semantic analysis and k-means.
+
+    The documents are split (in a balanced and repeatable way) into training and testing documents; the results
+    are saved as JSON and can be compared to a baseline, saved from a previous run, to flag the regressions.
+    The results record the environment they were measured in (host, processor, number of CPUs and versions of Python
+    and NumPy), since timings are only comparable within the same environment."""
+
+    def __init__(self, dataset_name="bbc", repeats=5, names=None):
+        """Initializes the suite given the name of the dataset, the number of runs of each benchmark
+        and the names of the benchmarks to run (all of them if None)."""
+        self.dataset_name = dataset_name
+        self.repeats = repeats
+        self.names = names
+
+    def get_benchmarks(self, documents):
+        """Returns the list of the benchmarks for the given documents."""
+        training, testing = Dataset.get_split_documents(documents, 0.8)
+        texts = [document.text for document in documents]
+        return [
+            Benchmark("tokenization", lambda: [Document(text, keep_text=False) for text in texts], len(texts)),
+            Benchmark("term_document_matrix", lambda: TermDocumentMatrix(training), len(training)),
+            Benchmark("naive_bayes_fit", lambda: NaiveBayes(training), len(training)),
+            Benchmark("naive_bayes_predict", lambda classifier: classifier.predict_batch(testing), len(testing),
+                      setup=lambda: (NaiveBayes(training),)),
+            Benchmark("knn_fit", lambda: KNN(training, 5), len(training)),
+            Benchmark("knn_predict", lambda classifier: classifier.predict_batch(testing), len(testing),
+                      setup=lambda: (KNN(training, 5),)),
+            Benchmark("id3_fit", lambda: ID3(training), len(training)),
+            Benchmark("id3_predict", lambda classifier: classifier.predict_batch(testing), len(testing),
+                      setup=lambda: (ID3(training),)),
+            Benchmark("latent_semantic_analysis", lambda: LatentSemanticAnalysis(documents, rank=20), len(documents)),
+            Benchmark("kmeans", lambda word_vectors: KMeans(word_vectors, 10, maximum_iterations=50, seed=0),
+                      lambda word_vectors: len(word_vectors), setup=lambda: BenchmarkSuite.get_word_vectors(documents)),
+        ]
+
+    @staticmethod
+    def get_word_vectors(documents):
+        """Returns the tuple holding the list of the (word, vector) pairs of the words of the given documents
+        in 20 topics, to be clustered."""
+        with redirect_stdout(StringIO()):
+            return (KMeans.get_lsa_word_vectors(LatentSemanticAnalysis(documents, rank=20)),)
+
+    def run(self):
+        """Returns the results of the suite as a dictionary: the dataset, the number of runs, the date, the versions
+        of Python and NumPy, the environment (see get_environment) and the results of each benchmark by name
+        (None if the dataset is invalid)."""
+        dataset = Dataset.get_dataset(self.dataset_name)
+        if dataset is None:
+            return None
+        results = {"dataset": self.dataset_name, "repeats": self.repeats, "date": datetime.now().isoformat(),
+                   "python": platform.python_version(), "numpy": numpy.__version__,
+                   "environment": BenchmarkSuite.get_environment(), "benchmarks": {}}
+        for benchmark in self.get_benchmarks(dataset.documents):
+            if self.names is None or benchmark.name in self.names:
+                results["benchmarks"][benchmark.name] = benchmark.run(repeats=self.repeats)
+        return results
+
+    @staticmethod
+    def get_environment():
+        """Returns a dictionary describing the machine the suite runs on: its host name, operating system,
+        architecture, processor (its model name on Linux) and number of CPUs."""
+        processor = platform.processor()
+        if exists("/proc/cpuinfo"):
+            with open("/proc/cpuinfo", encoding="utf-8") as file:
+                for line in file:
+                    if line.startswith("model name"):
+                        processor = line.partition(":")[2].strip()
+                        break
+        return {"host": platform.node(), "system": platform.system(), "machine": platform.machine(),
+                "processor": processor, "cpus": cpu_count()}
+
+    @staticmethod
+    def get_environment_differences(results, baseline):
+        """Returns the list of the names of what differs between the environments of the results and the baseline
+        (e.g. "host" or "python"), the timings of the two not being comparable if it is not empty;
+        a baseline recorded without its environment differs by "environment"."""
+        if "environment" not in baseline:
+            return ["environment"]
+        differences = [name for name in ["python", "numpy"] if results.get(name) != baseline.get(name)]
+        for name in results["environment"]:
+            if results["environment"][name] != baseline["environment"].get(name):
+                differences.append(name)
+        return differences
+
+    @staticmethod
+    def get_regressions(results, baseline, tolerance=0.5):
+        """Returns a list of (name, ratio) pairs for the benchmarks of the results whose minimum time is more than
+        (1 + tolerance) times the one of the baseline, the ratio being the time of the results over the baseline;
+        the minimum time is compared as it is the least affected by the noise of other processes."""
+        regressions = []
+        for name in results["benchmarks"]:
+            if name in baseline["benchmarks"]:
+                ratio = results["benchmarks"][name]["minimum_seconds"] / \
+                    max(baseline["benchmarks"][name]["minimum_seconds"], 1e-9)
+                if ratio > 1 + tolerance:
+                    regressions.append((name, ratio))
+        return regressions
+
+    @staticmethod
+    def save(results, path):
+        """Saves the given results as JSON to the given path, creating its folder if needed."""
+        if dirname(path) != "" and not exists(dirname(path)):
+            makedirs(dirname(path))
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(dumps(results, indent=2))
+
+    @staticmethod
+    def load(path):
+        """Returns the results saved as JSON to the given path."""
+        with open(path, encoding="utf-8") as file:
+            return loads(file.read())
+
+    @staticmethod
+    def get_report(results, baseline=None):
+        """Returns the table of the results as a string, with the change of each minimum time from the baseline (if any)."""
+        lines = ["{:<26}{:>12}{:>16}{:>14}{:>10}".format("benchmark", "seconds", "items/s", "peak MB", "change")]
+        for name in results["benchmarks"]:
+            result = results["benchmarks"][name]
+            change = ""
+            if baseline is not None and name in baseline["benchmarks"]:
+                ratio = result["minimum_seconds"] / max(baseline["benchmarks"][name]["minimum_seconds"], 1e-9)
+                change = "{:+.1f}%".format(100 * (ratio - 1))
+            lines.append("{:<26}{:>12.4f}{:>16.1f}{:>14.2f}{:>10}".format(name, result["minimum_seconds"],
+                                                                        result["throughput"],
+                                                                        result["peak_memory_mb"], change))
+        return "\n".join(lines)
+
+
+# bench.py [<dataset>] [--repeats=<repeats>] [--only=<names>] [--output=<path>] [--baseline=<path>]
+#          [--tolerance=<ratio>] [--save-baseline]
+
+if __name__ == '__main__':
+    format = "bench.py [<dataset>] [--repeats=<repeats>] [--only=<name>,...] [--output=<path>] [--baseline=<path>] " \
+             "[--tolerance=<ratio>] [--save-baseline]"
+    arguments = []
+    options = {"repeats": "5", "only": None, "output": "benchmarks/latest.json", "baseline": "benchmarks/baseline.json",
+               "tolerance": "0.5"}
+    save_baseline = False
+    for argument in sys.argv:
+        if argument == "--save-baseline":
+            save_baseline = True
+        elif argument.startswith("--") and argument[2:].partition("=")[0] in options:
+            name, _, value = argument[2:].partition("=")
+            options[name] = value
+        else:
+            arguments.append(argument)
+    if len(arguments) in [1, 2]:
+        try:
+            repeats = int(options["repeats"])
+            tolerance = float(options["tolerance"])
+        except:
+            print("Invalid number format for repeats or tolerance; provide a number.")
+            print("  > " + format)
+            exit()
+        names = None if options["only"] is None else options["only"].split(",")
+        suite = BenchmarkSuite("bbc" if len(arguments) == 1 else arguments[1], repeats=repeats, names=names)
+        results = suite.run()
+        if results is None:
+            print("Invalid dataset name.")
+            print("  > " + format)
+            exit()
+        baseline = None
+        if not save_baseline and exists(options["baseline"]):
+            baseline = BenchmarkSuite.load(options["baseline"])
+        print(BenchmarkSuite.get_report(results, baseline))
+        BenchmarkSuite.save(results, options["baseline"] if save_baseline else options["output"])
+        if baseline is not None:
+            regressions = BenchmarkSuite.get_regressions(results, baseline, tolerance=tolerance)
+            for name, ratio in regressions:
+                print("Regression: " + name + " is " + str(round(ratio, 2)) + "x slower than the baseline.")
+            differences = BenchmarkSuite.get_environment_differences(results, baseline)
+            if len(differences) != 0:
+                print("Warning: the baseline was recorded in another environment (differences: " +
+                      ", ".join(differences) + "), so the regressions do not fail the run; "
+                      "save a baseline on this machine with --save-baseline.")
+            elif len(regressions) != 0:
+                exit(1)
+    else:
+        print("Invalid number of arguments.")
+        print("  > " + format)
@@ -1,12 +1,18 @@
+from nlp.document import Tokenizer
+
+
 class Classifier:
 
     """An abstract class to handle common functionalities to most classifiers."""
 
     def __init__(self, documents):
         """Initializes the classifier given the documents;
-        it extracts the classes from the documents and stores them in a list."""
+        it extracts the classes from the documents and stores them in a list,
+        along with the options of the documents (see Tokenizer.get_options), so the documents to predict
+        can be parsed the same way."""
         self.documents = documents
         self.classes = self.get_classes()
+        self.document_options = Tokenizer.get_document_options(documents)
 
     def get_classes(self):
         """Returns a list containing the unique classes found in the documents."""
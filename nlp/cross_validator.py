@@ -1,23 +1,97 @@
 from math import floor
 from nlp.naive_bayes import NaiveBayes
-from nlp.utilities import ConfusionMatrix
+from nlp.utilities import ConfusionMatrix, ProcessContext
 from nlp.knn import KNN
 from nlp.id3 import ID3
+from nlp.classifier import Classifier
+from nlp.neighbour_search import NeighbourSearch, ExactSearch
+from nlp.term_document_matrix import TermDocumentMatrix
 from abc import ABC, abstractmethod
 from nlp.dataset import Dataset
 import sys
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+
+
+class FoldCounts:
+
+    """A data structure holding the word counts of the documents of every fold, counted once for the whole dataset;
+    the counts for the training set of a fold are obtained by subtracting the counts of the held-out fold
+    from the counts of the whole dataset."""
+
+    def __init__(self, sets):
+        """Initializes the counts given the lists of documents of the folds: the term frequencies of every document
+        (a row each, in the order of the folds), the document frequencies, the word counts for each class and
+        the document counts for each class of every fold, along with their totals."""
+        documents = []
+        self.offsets = [0]
+        for set in sets:
+            documents += set
+            self.offsets.append(len(documents))
+        term_document_matrix = TermDocumentMatrix(documents)
+        self.vocabulary = term_document_matrix.vocabulary
+        self.term_frequencies = term_document_matrix.term_frequencies
+        self.classes = Classifier(documents).classes
+        class_ids = {}
+        for c in self.classes:
+            class_ids[c] = len(class_ids)
+        labels = numpy.array([class_ids[document.c] for document in documents], dtype=numpy.int64)
+        one_hot_labels = numpy.eye(len(self.classes))[labels]
+        self.document_frequencies = []
+        self.class_word_counts = []
+        self.class_document_counts = []
+        for n in range(0, len(sets)):
+            start, end = self.offsets[n], self.offsets[n + 1]
+            rows = self.term_frequencies[start:end]
+            self.document_frequencies.append(numpy.bincount(rows.indices, minlength=len(self.vocabulary)))
+            self.class_word_counts.append(numpy.asarray(rows.T @ one_hot_labels[start:end]).T)
+            self.class_document_counts.append(numpy.bincount(labels[start:end], minlength=len(self.classes)))
+        self.total_document_frequencies = sum(self.document_frequencies)
+        self.total_class_word_counts = sum(self.class_word_counts)
+        self.total_class_document_counts = sum(self.class_document_counts)
+
+    def get_training_testing_rows(self, n):
+        """Returns the arrays of the rows of the documents for training and testing when the fold n is held out."""
+        training = []
+        for i in range(0, len(self.offsets) - 1):
+            if i != n:
+                training.append(numpy.arange(self.offsets[i], self.offsets[i + 1]))
+        return numpy.concatenate(training), numpy.arange(self.offsets[n], self.offsets[n + 1])
+
+    def get_training_document_frequencies(self, n):
+        """Returns the array of the document frequencies of the words when the fold n is held out."""
+        return self.total_document_frequencies - self.document_frequencies[n]
+
+    def get_training_class_word_counts(self, n):
+        """Returns the (classes x vocabulary) array of the word counts for each class when the fold n is held out."""
+        return self.total_class_word_counts - self.class_word_counts[n]
+
+    def get_training_class_document_counts(self, n):
+        """Returns the array of the document counts for each class when the fold n is held out."""
+        return self.total_class_document_counts - self.class_document_counts[n]
 
 
 class CrossValidator(ABC):
 
     """An abstract class to perform K-Fold Cross-Validation on a set with a classifier."""
 
-    def __init__(self, dataset, folds):
-        """Initializes the tool given the dataset and the number of folds."""
+    # the validator of the current worker process, set once when the worker starts (see get_parallel_test_results)
+    worker_validator = None
+
+    def __init__(self, dataset, folds, shared=False):
+        """Initializes the tool given the dataset and the number of folds;
+        if the shared option is set to true, the words of the whole dataset are counted once
+        and the classifier of each fold is derived from these counts.
+        The time spent counting is kept, so the time reported by cross_validate includes it."""
         self.dataset = dataset
         self.folds = folds
         self.sets = self.get_sets()
+        self.fold_counts = None
+        start = datetime.now()
+        if shared:
+            self.fold_counts = FoldCounts(self.sets)
+        self.counting_time = datetime.now() - start
 
     def get_sets(self):
         """Returns as many balanced lists of documents as many folds."""
@@ -43,16 +117,24 @@ class CrossValidator(ABC):
                 training += self.sets[i]
         return training, testing
 
-    def cross_validate(self):
-        """Performs cross validation; prints confusion matrix and accuracy at the end of each fold validation."""
-        start = datetime.now()
+    def cross_validate(self, workers=1):
+        """Performs cross validation; prints confusion matrix and accuracy at the end of each fold validation.
+
+        With more than one worker, the folds are validated in parallel by a pool of processes;
+        the results are still printed and aggregated in the order of the folds.
+        The time printed at the end includes the time spent counting the shared counts (if any)."""
+        start = datetime.now() - self.counting_time
         confusion_matrices = []
-        for i in range(0, self.folds):
-            print("Cross-Validating (" + str(i + 1) + " of " + str(self.folds) + ")")
-            training, testing = self.get_training_testing_sets(i)
-            confusion_matrix = self.get_test_results(training, testing)
-            confusion_matrices.append(confusion_matrix)
-            print(str(confusion_matrix) + "\n")
+        if workers > 1:
+            print("Cross-Validating (" + str(self.folds) + " folds on " + str(workers) + " workers)")
+            for confusion_matrix in self.get_parallel_test_results(workers):
+                confusion_matrices.append(confusion_matrix)
+                print(str(confusion_matrix) + "\n")
+        else:
+            for i in range(0, self.folds):
+                print("Cross-Validating (" + str(i + 1) + " of " + str(self.folds) + ")")
+                confusion_matrices.append(self.get_fold_test_results(i))
+                print(str(confusion_matrices[i]) + "\n")
         sum = 0
         for confusion_matrix in confusion_matrices:
             sum += confusion_matrix.get_accuracy()
@@ -62,6 +144,50 @@ class CrossValidator(ABC):
         delta = finish - start
         print(str(delta))
 
+    def get_fold_test_results(self, n):
+        """Returns the confusion matrix from the validation of the fold at position n."""
+        if self.fold_counts is not None:
+            return self.get_shared_test_results(n)
+        training, testing = self.get_training_testing_sets(n)
+        return self.get_test_results(training, testing)
+
+    def get_shared_test_results(self, n):
+        """Returns the confusion matrix from the validation of the fold at position n using the shared counts;
+        unless overridden, the fold is validated as usual."""
+        training, testing = self.get_training_testing_sets(n)
+        return self.get_test_results(training, testing)
+
+    @staticmethod
+    def get_confusion_matrix(classes, testing, predictions):
+        """Returns the confusion matrix for the given classes, testing documents and predicted classes."""
+        confusion_matrix = ConfusionMatrix(classes)
+        for i in range(0, len(testing)):
+            predicted = predictions[i]
+            actual = testing[i].c
+            confusion_matrix.add(actual, predicted)
+        return confusion_matrix
+
+    def get_parallel_test_results(self, workers):
+        """Returns an iterator over the confusion matrices of the folds, in order, validated by a pool of processes.
+
+        The validator (and its documents) is handed to each worker once when the worker starts: where processes
+        can be forked the workers simply share it with the parent, otherwise it is pickled once per worker;
+        afterwards only the fold numbers and the confusion matrices are exchanged."""
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ProcessContext.get_context(),
+                                 initializer=CrossValidator.set_worker_validator, initargs=(self,)) as executor:
+            for confusion_matrix in executor.map(CrossValidator.get_worker_test_results, range(0, self.folds)):
+                yield confusion_matrix
+
+    @staticmethod
+    def set_worker_validator(validator):
+        """Stores the validator used by the current worker process."""
+        CrossValidator.worker_validator = validator
+
+    @staticmethod
+    def get_worker_test_results(n):
+        """Returns the confusion matrix from the validation of the fold at position n in the current worker process."""
+        return CrossValidator.worker_validator.get_fold_test_results(n)
+
     @abstractmethod
     def get_test_results(self, training, testing):
         """(Abstract) Returns the confusion matrix from the fold validation for the given training and testing sets."""
@@ -74,31 +200,69 @@ class NaiveBayesCrossValidator(CrossValidator):
     def get_test_results(self, training, testing):
         """Returns the confusion matrix from the fold validation for the given training and testing sets."""
         nb = NaiveBayes(training)
-        confusion_matrix = ConfusionMatrix(nb.classes)
-        for document in testing:
-            predicted = nb.get_prediction(document)
-            actual = document.c
-            confusion_matrix.add(actual, predicted)
-        return confusion_matrix
+        return CrossValidator.get_confusion_matrix(nb.classes, testing, nb.predict_batch(testing))
+
+    def get_shared_test_results(self, n):
+        """Returns the confusion matrix from the validation of the fold at position n;
+        the tables of the classifier are computed from the word and document counts for each class of the
+        training set, obtained by subtraction, and the testing documents are taken as rows of term frequencies."""
+        training, testing = self.get_training_testing_sets(n)
+        training_rows, testing_rows = self.fold_counts.get_training_testing_rows(n)
+        classes = Classifier(training).classes
+        class_ids = []
+        for c in classes:
+            class_ids.append(self.fold_counts.classes.index(c))
+        class_word_counts = self.fold_counts.get_training_class_word_counts(n)[class_ids]
+        class_document_counts = self.fold_counts.get_training_class_document_counts(n)[class_ids]
+        known = class_word_counts.sum(axis=0) > 0
+        log_likelihoods, unknown_log_likelihoods = NaiveBayes.get_log_likelihoods_from_counts(class_word_counts[:, known], 1)
+        log_priors = numpy.log(class_document_counts / class_document_counts.sum())
+        counts = self.fold_counts.term_frequencies[testing_rows]
+        unknown = numpy.asarray(counts[:, ~known].sum(axis=1)).ravel()
+        posteriors = counts[:, known] @ log_likelihoods.T
+        posteriors += numpy.outer(unknown, unknown_log_likelihoods) + log_priors
+        predictions = []
+        for i in numpy.argmax(posteriors, axis=1).tolist():
+            predictions.append(classes[i])
+        return CrossValidator.get_confusion_matrix(classes, testing, predictions)
 
 class KNNCrossValidator(CrossValidator):
 
     """A K-Fold Cross-Validator for the KNN classifier."""
 
-    def __init__(self, dataset, folds, k):
+    def __init__(self, dataset, folds, k, shared=False):
         """Initializes the KNN K-Fold Cross-Validator with the dataset, the folds and the number of neighbours."""
-        CrossValidator.__init__(self, dataset, folds)
+        CrossValidator.__init__(self, dataset, folds, shared=shared)
         self.k = k
 
     def get_test_results(self, training, testing):
         """Returns the confusion matrix from the fold validation for the given training and testing sets."""
         knn = KNN(training, self.k)
-        confusion_matrix = ConfusionMatrix(knn.classes)
-        for document in testing:
-            predicted = knn.get_prediction(document)
-            actual = document.c
-            confusion_matrix.add(actual, predicted)
-        return confusion_matrix
+        return CrossValidator.get_confusion_matrix(knn.classes, testing, knn.predict_batch(testing))
+
+    def get_shared_test_results(self, n, block_size=256):
+        """Returns the confusion matrix from the validation of the fold at position n;
+        the inverse document frequencies are computed from the document frequencies of the training set,
+        obtained by subtraction, and used to weight the rows of term frequencies of the training and testing
+        documents (words not occurring in the training set having no weight)."""
+        training, testing = self.get_training_testing_sets(n)
+        training_rows, testing_rows = self.fold_counts.get_training_testing_rows(n)
+        document_frequencies = self.fold_counts.get_training_document_frequencies(n)
+        weights = numpy.log(len(training) / (document_frequencies + 1.0))
+        weights[document_frequencies == 0] = 0
+        term_frequencies = self.fold_counts.term_frequencies
+        training_matrix = TermDocumentMatrix.get_weighted_columns(term_frequencies[training_rows], weights)
+        neighbour_search = ExactSearch(NeighbourSearch.get_normalised_matrix(training_matrix))
+        predictions = []
+        for start in range(0, len(testing_rows), block_size):
+            rows = testing_rows[start:start + block_size]
+            query_matrix = TermDocumentMatrix.get_weighted_columns(term_frequencies[rows], weights)
+            for indices, similarities in neighbour_search.search(NeighbourSearch.get_normalised_matrix(query_matrix), self.k):
+                most_similar_documents = []
+                for i in indices.tolist():
+                    most_similar_documents.append(training[i])
+                predictions.append(KNN.get_majority_class(most_similar_documents, similarities.tolist()))
+        return CrossValidator.get_confusion_matrix(Classifier(training).classes, testing, predictions)
 
 class ID3CrossValidator(CrossValidator):
 
@@ -107,20 +271,41 @@ class ID3CrossValidator(CrossValidator):
     def get_test_results(self, training, testing):
         """Returns the confusion matrix from the fold validation for the given training and testing sets."""
         id3 = ID3(training)
-        confusion_matrix = ConfusionMatrix(id3.classes)
-        for document in testing:
-            predicted = id3.get_prediction(document)
-            actual = document.c
-            confusion_matrix.add(actual, predicted)
-        return confusion_matrix
+        return CrossValidator.get_confusion_matrix(id3.classes, testing, id3.predict_batch(testing))
+
+    def get_shared_test_results(self, n):
+        """Returns the confusion matrix from the validation of the fold at position n;
+        the tree is generated from the rows of term frequencies of the training documents."""
+        training, testing = self.get_training_testing_sets(n)
+        training_rows, testing_rows = self.fold_counts.get_training_testing_rows(n)
+        id3 = ID3(training, vocabulary=self.fold_counts.vocabulary,
+                  term_frequencies=self.fold_counts.term_frequencies[training_rows])
+        return CrossValidator.get_confusion_matrix(id3.classes, testing, id3.predict_batch(testing))
 
 
 # cross_validator.py <folds> <dataset> <classifier> <options>
 
 if __name__ == '__main__':
     print(" ")
-    format = "cross_validator.py <folds> <dataset> <classifier> [<options>]\n"
-    arguments = sys.argv
+    format = "cross_validator.py <folds> <dataset> <classifier> [<options>] [--workers=<workers>] [--shared] [--cache]\n"
+    arguments = []
+    workers = 1
+    shared = False
+    cache = False
+    for argument in sys.argv:
+        if argument == "--shared":
+            shared = True
+        elif argument == "--cache":
+            cache = True
+        elif argument.startswith("--workers="):
+            try:
+                workers = int(argument[len("--workers="):])
+            except:
+                print("Invalid format for number of workers (should be integer).")
+                print("\n  >  " + format)
+                exit()
+        else:
+            arguments.append(argument)
     if len(arguments) >= 4:
         folds = 0
         try:
@@ -129,11 +314,11 @@ if __name__ == '__main__':
             print("Invalid format for number of folds (should be integer).")
             print("\n  >  " + format)
             exit()
-        dataset = Dataset.get_dataset(arguments[2])
+        dataset = Dataset.get_dataset(arguments[2], cache=cache)
         if dataset is not None:
             cv = None
             if arguments[3] == "naive_bayes":
-                cv = NaiveBayesCrossValidator(dataset, folds)
+                cv = NaiveBayesCrossValidator(dataset, folds, shared=shared)
             elif arguments[3] == "knn":
                 if len(arguments) == 5:
                     k = 0
@@ -143,18 +328,18 @@ if __name__ == '__main__':
                         print("Invalid number format for number of neighbours")
                         print("\n  >  cross_validator.py <folds> <dataset> <classifier> <neighbours>\n")
                         exit()
-                    cv = KNNCrossValidator(dataset, folds, k)
+                    cv = KNNCrossValidator(dataset, folds, k, shared=shared)
                 else:
                     print("Invalid number of arguments, missing number of neighbours.")
                     print("\n  >  cross_validator.py <folds> <dataset> <classifier> <neighbours>\n")
                     exit()
             elif arguments[3] == "id3":
-                cv = ID3CrossValidator(dataset, folds)
+                cv = ID3CrossValidator(dataset, folds, shared=shared)
             else:
                 print("Invalid classifier name (should be \"naive_bayes\", \"knn\" or \"id3\").")
                 print("\n  >  " + format)
                 exit()
-            cv.cross_validate()
+            cv.cross_validate(workers=workers)
         else:
             print("Invalid dataset name.")
             print("\n  >  " + format)
@@ -163,28 +348,3 @@ if __name__ == '__main__':
         print("Invalid number of arguments.")
         print("\n  >  " + format)
         exit()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
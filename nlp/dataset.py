@@ -1,13 +1,26 @@
-from nlp.document import ClassDocument
-from json import loads
+from nlp.document import ClassDocument, Tokenizer, Interner
+from json import loads, dumps
 import random
-from os import listdir
+from os import makedirs, replace, scandir, stat, walk
+from os.path import exists, isfile, join
+from shutil import rmtree
+from hashlib import sha1
+from array import array
+import numpy
+from re import compile
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from nlp.utilities import ProcessContext
 
 
 class Dataset:
 
     """A data structure to store and handle a group of documents."""
 
+    overall_pattern = compile(r'"overall":\s*([0-9.]+)')
+    worker_tokenizer = None
+
     def __init__(self, documents):
         """Initializes the dataset given the documents;
         if the normalisation option is set to true, the documents are randomly downsampled to be balanced."""
@@ -48,63 +61,244 @@ class Dataset:
         return training, testing
 
     @staticmethod
-    def get_amazon_dataset(dataset_name, preserve_duplicates=False, remove_stopwords=False, balanced=True, ngrams=None):
+    def get_amazon_dataset(dataset_name, preserve_duplicates=False, remove_stopwords=False, balanced=True, ngrams=None,
+                           interned=False, keep_text=True, maximum=None, workers=1):
         """Returns the dataset containing the negative and positive Amazon product reviews given the name of the set;
-        options include preserving duplicate words, removing stopwords, the size of the ngrams as a list and
-        balancing the dataset.
+        options include preserving duplicate words, removing stopwords, the size of the ngrams as a list,
+        balancing the dataset, storing the words as ids of a shared interner, keeping the raw texts,
+        the maximum number of documents and the number of processes parsing the reviews.
 
         Only reviews with score equal to 1 and 5 are kept and mapped as negative and positive, respectively."""
-        documents = []
+        documents = list(Dataset.get_amazon_documents("documents/" + dataset_name,
+                                                      preserve_duplicates=preserve_duplicates,
+                                                      remove_stopwords=remove_stopwords, ngrams=ngrams,
+                                                      interned=interned, keep_text=keep_text, balanced=balanced,
+                                                      maximum=maximum, workers=workers))
+        random.Random(42).shuffle(documents)
+        dataset = ClassDataset(documents, normalise=False)
+        return dataset
+
+    @staticmethod
+    def get_amazon_documents(path, preserve_duplicates=False, remove_stopwords=False, ngrams=None, interned=False,
+                             keep_text=True, balanced=False, maximum=None, workers=1, chunk_size=1000):
+        """Returns a generator of the ClassDocuments for the negative and positive Amazon product reviews found in
+        the file at the given path (see get_amazon_dataset for the options); the file is streamed line by line and
+        the documents are yielded as soon as they are parsed, in the order of the file.
+
+        If the maximum number of documents is given, only the first ones are kept; if the documents are balanced,
+        an equal number of reviews per class (at most half of the maximum) is sampled uniformly at random and
+        parsed once the whole file has been read."""
+        tokenizer = Tokenizer(preserve_duplicates=preserve_duplicates, remove_stopwords=remove_stopwords, ngrams=ngrams,
+                              interner=Interner() if interned else None)
+        reviews = Dataset.get_amazon_reviews(path)
+        if balanced:
+            capacity = None
+            if maximum is not None:
+                capacity = maximum // 2
+            reviews = iter(Dataset.get_balanced_reviews(reviews, capacity=capacity))
+        elif maximum is not None:
+            reviews = islice(reviews, maximum)
+        for text, c, bag_of_words in Dataset.get_tokenized_reviews(reviews, tokenizer, workers=workers,
+                                                                   chunk_size=chunk_size):
+            yield ClassDocument(text, c, tokenizer=tokenizer, keep_text=keep_text, bag_of_words=bag_of_words)
+
+    @staticmethod
+    def get_amazon_reviews(path):
+        """Returns a generator of the (text, class) pairs of the reviews with score equal to 1 and 5 in the file
+        at the given path; the score is looked up in the raw line first, so other reviews are never fully parsed."""
         map = {1.0: "-", 5.0: "+"}
-        with open("documents/" + dataset_name) as file:
-            lines = file.readlines()
-            for line in lines:
+        with open(path) as file:
+            for line in file:
+                match = Dataset.overall_pattern.search(line)
+                if match is not None and float(match.group(1)) not in map:
+                    continue
                 data = loads(line)
                 score = data["overall"]
                 if score in map:
-                    rating = map[score]
-                    text = data["reviewText"]
-                    document = ClassDocument(text, rating, preserve_duplicates=preserve_duplicates,
-                                        remove_stopwords=remove_stopwords, ngrams=ngrams)
-                    documents.append(document)
+                    yield data["reviewText"], map[score]
+
+    @staticmethod
+    def get_balanced_reviews(reviews, capacity=None, seed=42):
+        """Returns a balanced list of (text, class) pairs sampled uniformly at random from the given ones;
+        the reviews of each class are sampled by a reservoir (holding at most capacity reviews, if given)
+        and each reservoir is then downsampled to the size of the smallest one."""
+        generator = random.Random(seed)
+        reservoirs = {}
+        counts = {}
+        for review in reviews:
+            c = review[1]
+            if c not in reservoirs:
+                reservoirs[c] = []
+                counts[c] = 0
+            counts[c] += 1
+            if capacity is None or len(reservoirs[c]) < capacity:
+                reservoirs[c].append(review)
+            else:
+                i = generator.randrange(counts[c])
+                if i < capacity:
+                    reservoirs[c][i] = review
+        balanced_reviews = []
+        if len(reservoirs) != 0:
+            minimum_class_count = min([len(reservoir) for reservoir in reservoirs.values()])
+            for c in reservoirs:
+                balanced_reviews += generator.sample(reservoirs[c], minimum_class_count)
+        return balanced_reviews
+
+    @staticmethod
+    def get_tokenized_reviews(reviews, tokenizer, workers=1, chunk_size=1000):
+        """Returns a generator of the (text, class, bag of words) triples for the given (text, class) pairs
+        (an iterable, e.g. a list or a generator), in order;
+        with more than one worker, the texts are sent in chunks to a pool of processes, each holding a copy of the
+        tokenizer, and only a few chunks per worker are pending at any time."""
+        if workers <= 1:
+            for text, c in reviews:
+                yield text, c, tokenizer.get_bag_of_words(text)
+            return
+        worker_tokenizer = Tokenizer(preserve_duplicates=tokenizer.preserve_duplicates,
+                                     remove_stopwords=tokenizer.remove_stopwords, ngrams=tokenizer.ngrams)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ProcessContext.get_context(),
+                                 initializer=Dataset.set_worker_tokenizer, initargs=(worker_tokenizer,)) as executor:
+            reviews = iter(reviews)
+            pending = deque()
+            while True:
+                chunk = list(islice(reviews, chunk_size))
+                if len(chunk) != 0:
+                    texts = [text for text, c in chunk]
+                    pending.append((chunk, executor.submit(Dataset.get_worker_bags_of_words, texts)))
+                if len(pending) != 0 and (len(chunk) == 0 or len(pending) > 2 * workers):
+                    chunk, future = pending.popleft()
+                    for (text, c), bag_of_words in zip(chunk, future.result()):
+                        yield text, c, bag_of_words
+                elif len(chunk) == 0:
+                    break
+
+    @staticmethod
+    def set_worker_tokenizer(tokenizer):
+        """Sets the tokenizer used by the current worker process."""
+        Dataset.worker_tokenizer = tokenizer
+
+    @staticmethod
+    def get_worker_bags_of_words(texts):
+        """Returns the bags of words of the given texts, parsed by the tokenizer of the current worker process."""
+        return [Dataset.worker_tokenizer.get_bag_of_words(text) for text in texts]
+
+    @staticmethod
+    def get_bbc_dataset(preserve_duplicates=False, remove_stopwords=False, ngrams=None, interned=False, keep_text=True):
+        """Returns the dataset containing the articles found in the BBC dataset; the classes are the categories.
+        Options include preserving duplicate words, removing stopwords, the size of the ngrams as a list,
+        storing the words as ids of a shared interner and keeping the raw texts."""
+        return Dataset.get_directory_dataset("documents/bbc/", preserve_duplicates=preserve_duplicates,
+                                             remove_stopwords=remove_stopwords, ngrams=ngrams, interned=interned,
+                                             keep_text=keep_text)
+
+    @staticmethod
+    def get_directory_dataset(root, preserve_duplicates=False, remove_stopwords=False, ngrams=None, interned=False,
+                              keep_text=True, extension=".txt", workers=4, chunk_size=64, encoding="utf-8"):
+        """Returns the dataset containing the documents found in a folder of the form <root>/<class>/<document>,
+        where each subfolder of the root holds the files of a class; the documents are shuffled.
+        Options are the same as get_amazon_dataset, along with the extension of the files, the number of threads
+        reading the files, the number of files read by a thread at a time and their encoding."""
+        documents = list(Dataset.get_directory_documents(root, preserve_duplicates=preserve_duplicates,
+                                                         remove_stopwords=remove_stopwords, ngrams=ngrams,
+                                                         interned=interned, keep_text=keep_text, extension=extension,
+                                                         workers=workers, chunk_size=chunk_size, encoding=encoding))
         random.Random(42).shuffle(documents)
-        dataset = ClassDataset(documents, normalise=balanced)
-        return dataset
+        return ClassDataset(documents, normalise=False)
 
     @staticmethod
-    def get_bbc_dataset():
-        """Returns the dataset containing the articles found in the BBC dataset; the classes are the categories."""
-        origin = "documents/bbc/"
-        folders = ["business", "entertainment", "politics", "sport", "tech"]
+    def get_directory_documents(root, preserve_duplicates=False, remove_stopwords=False, ngrams=None, interned=False,
+                                keep_text=True, extension=".txt", workers=4, chunk_size=64, encoding="utf-8"):
+        """Returns a generator of the ClassDocuments for the files found in a folder of the form
+        <root>/<class>/<document> (see get_directory_dataset for the options), in the order of the classes and files.
+
+        The files are read and tokenized in chunks by a pool of threads, with at most two chunks per thread in flight;
+        the documents are built (and their words interned) in the calling thread."""
+        tokenizer = Tokenizer(preserve_duplicates=preserve_duplicates, remove_stopwords=remove_stopwords, ngrams=ngrams,
+                              interner=Interner() if interned else None)
+        files = Dataset.get_directory_files(root, extension=extension)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            pending = deque()
+            for start in range(0, len(files), chunk_size):
+                chunk = files[start:start + chunk_size]
+                paths = [path for path, c in chunk]
+                pending.append((chunk, executor.submit(Dataset.get_parsed_files, paths, tokenizer, encoding)))
+                if len(pending) > 2 * max(workers, 1):
+                    chunk, future = pending.popleft()
+                    yield from Dataset.get_chunk_documents(chunk, future.result(), tokenizer, keep_text)
+            while len(pending) != 0:
+                chunk, future = pending.popleft()
+                yield from Dataset.get_chunk_documents(chunk, future.result(), tokenizer, keep_text)
+
+    @staticmethod
+    def get_chunk_documents(chunk, parsed_files, tokenizer, keep_text=True):
+        """Returns the list of the ClassDocuments for the given (path, class) pairs of a chunk of files
+        and their (text, bag of words) pairs, as returned by get_parsed_files."""
         documents = []
+        for (path, c), (text, bag_of_words) in zip(chunk, parsed_files):
+            documents.append(ClassDocument(text, c, tokenizer=tokenizer, keep_text=keep_text, bag_of_words=bag_of_words))
+        return documents
+
+    @staticmethod
+    def get_directory_files(root, extension=".txt"):
+        """Returns a list of the (path, class) pairs of the files with the given extension in a folder of the form
+        <root>/<class>/<document>; the classes are sorted by name, the files of a class are in the order of the folder."""
+        files = []
+        with scandir(root) as entries:
+            folders = sorted([entry for entry in entries if entry.is_dir()], key=lambda entry: entry.name)
         for folder in folders:
-            path = origin + folder + "/"
-            for filename in listdir(path):
-                if filename.count(".txt") != 0:
-                    filepath = path + filename
-                    f = open(filepath, "r", encoding="utf-8")
-                    t = f.read()
-                    document = ClassDocument(t, folder)
-                    documents.append(document)
-        random.Random(42).shuffle(documents)
-        return ClassDataset(documents, normalise=False)
+            with scandir(folder.path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(extension) and entry.is_file():
+                        files.append((entry.path, folder.name))
+        return files
+
+    @staticmethod
+    def get_parsed_files(paths, tokenizer, encoding="utf-8"):
+        """Returns a list of the (text, bag of words) pairs of the files at the given paths,
+        each file being closed once read and its text parsed by the given tokenizer."""
+        parsed_files = []
+        for path in paths:
+            with open(path, "r", encoding=encoding) as file:
+                text = file.read()
+            parsed_files.append((text, tokenizer.get_bag_of_words(text)))
+        return parsed_files
 
     @staticmethod
-    def get_dataset(name):
-        """Returns the dataset matching the name provided (if any, otherwise None)."""
+    def get_dataset(name, preserve_duplicates=False, remove_stopwords=False, ngrams=None, cache=False):
+        """Returns the dataset matching the name provided (if any, otherwise None); options include preserving
+        duplicate words, removing stopwords and the size of the ngrams as a list (see Document).
+        If the cache option is set to true, the tokenized dataset is loaded from the cache (see DatasetCache)."""
+        if cache:
+            return DatasetCache().get_dataset(name, preserve_duplicates=preserve_duplicates,
+                                              remove_stopwords=remove_stopwords, ngrams=ngrams)
+        options = {"preserve_duplicates": preserve_duplicates, "remove_stopwords": remove_stopwords, "ngrams": ngrams}
         if name in ["musical_instruments", "automotive", "instant_video", "beauty", "tools"]:
-            return Dataset.get_amazon_dataset(name + ".json")
+            return Dataset.get_amazon_dataset(name + ".json", **options)
         elif name == "all_amazon":
-            instruments = Dataset.get_amazon_dataset("musical_instruments.json", balanced=False).documents
-            automotive = Dataset.get_amazon_dataset("automotive.json", balanced=False).documents
-            instant_video = Dataset.get_amazon_dataset("instant_video.json", balanced=False).documents
-            tools = Dataset.get_amazon_dataset("tools.json", balanced=False).documents
-            beauty = Dataset.get_amazon_dataset("beauty.json", balanced=False).documents
+            instruments = Dataset.get_amazon_dataset("musical_instruments.json", balanced=False, **options).documents
+            automotive = Dataset.get_amazon_dataset("automotive.json", balanced=False, **options).documents
+            instant_video = Dataset.get_amazon_dataset("instant_video.json", balanced=False, **options).documents
+            tools = Dataset.get_amazon_dataset("tools.json", balanced=False, **options).documents
+            beauty = Dataset.get_amazon_dataset("beauty.json", balanced=False, **options).documents
             documents = instruments + automotive + instant_video + tools + beauty
             random.shuffle(documents)
             return Dataset(documents)
         elif name == "bbc":
-            return Dataset.get_bbc_dataset()
+            return Dataset.get_bbc_dataset(**options)
+        else:
+            return None
+
+    @staticmethod
+    def get_dataset_paths(name):
+        """Returns the list of the paths of the files and folders the dataset matching the name provided
+        is loaded from (if any, otherwise None)."""
+        if name in ["musical_instruments", "automotive", "instant_video", "beauty", "tools"]:
+            return ["documents/" + name + ".json"]
+        elif name == "all_amazon":
+            return ["documents/musical_instruments.json", "documents/automotive.json", "documents/instant_video.json",
+                    "documents/tools.json", "documents/beauty.json"]
+        elif name == "bbc":
+            return ["documents/bbc/"]
         else:
             return None
 
@@ -131,3 +325,119 @@ class ClassDataset(Dataset):
         return documents
 
 
+class DatasetCache:
+
+    """A cache of tokenized datasets on disk, so a dataset is only read and tokenized once.
+
+    Each dataset is stored in a folder of NumPy arrays, which are loaded as memory maps:
+    the vocabulary, the word ids of all the documents concatenated, the offset of each document in them,
+    the classes and the class id of each document. The folder is named after the dataset and a key derived from
+    the paths, sizes and modification times of its files and the options of the documents, so changing either
+    results in a new entry; the options are also saved with the documents, so they are parsed the same way once
+    loaded. The documents loaded from the cache store the ids of their words, as views of the memory map
+    of the word ids (so they are only read from disk when used), and no raw text."""
+
+    version = 2
+
+    def __init__(self, directory="cache"):
+        """Initializes the cache given the path of its folder."""
+        self.directory = directory
+
+    def get_dataset(self, name, preserve_duplicates=False, remove_stopwords=False, ngrams=None):
+        """Returns the dataset matching the name provided (if any, otherwise None) with the given options;
+        it is loaded from the cache if present, otherwise it is loaded from its files and saved to the cache."""
+        paths = Dataset.get_dataset_paths(name)
+        if paths is None:
+            return None
+        options = Tokenizer(preserve_duplicates=preserve_duplicates, remove_stopwords=remove_stopwords,
+                            ngrams=ngrams).get_options()
+        path = join(self.directory, name + "-" + DatasetCache.get_key(name, paths, options))
+        if exists(path):
+            return DatasetCache.load(path)
+        dataset = Dataset.get_dataset(name, **options)
+        if dataset is not None:
+            DatasetCache.save(dataset, path, options=options)
+        return dataset
+
+    @staticmethod
+    def get_key(name, paths, options):
+        """Returns a hexadecimal key for the dataset given its name, the paths of its files and folders
+        and the options of its documents (see Tokenizer.get_options); it also depends on the version of the cache,
+        so the entries saved by a previous version are not loaded."""
+        files = []
+        for path in paths:
+            for file in DatasetCache.get_files(path):
+                status = stat(file)
+                files.append([file, status.st_size, status.st_mtime_ns])
+        return sha1(dumps([DatasetCache.version, name, files, options]).encode("utf-8")).hexdigest()[0:16]
+
+    @staticmethod
+    def get_files(path):
+        """Returns the sorted list of the paths of the files at the given path (the path itself if it is a file)."""
+        if isfile(path):
+            return [path]
+        files = []
+        for folder, folders, filenames in walk(path):
+            for filename in filenames:
+                files.append(join(folder, filename))
+        return sorted(files)
+
+    @staticmethod
+    def save(dataset, path, options=None):
+        """Saves the documents of the given dataset, parsed with the given options (see Tokenizer.get_options;
+        the ones of its documents if None), to a folder at the given path; the word ids of each document
+        are stored in order if the duplicates are preserved, otherwise sorted."""
+        if options is None:
+            options = Tokenizer.get_document_options(dataset.documents)
+        preserve_duplicates = options["preserve_duplicates"]
+        interner = Interner()
+        token_ids = array("I")
+        offsets = [0]
+        class_ids = {}
+        labels = []
+        for document in dataset.documents:
+            document_ids = interner.get_ids(document.bag_of_words)
+            if not preserve_duplicates:
+                document_ids = sorted(document_ids)
+            token_ids.extend(document_ids)
+            offsets.append(len(token_ids))
+            if document.c not in class_ids:
+                class_ids[document.c] = len(class_ids)
+            labels.append(class_ids[document.c])
+        temporary = path + ".tmp"
+        if exists(temporary):
+            rmtree(temporary)
+        makedirs(temporary)
+        numpy.save(join(temporary, "vocabulary.npy"), numpy.array(interner.words, dtype=str))
+        numpy.save(join(temporary, "token_ids.npy"), numpy.frombuffer(token_ids, dtype=numpy.uint32))
+        numpy.save(join(temporary, "offsets.npy"), numpy.array(offsets, dtype=numpy.int64))
+        numpy.save(join(temporary, "classes.npy"), numpy.array(list(class_ids.keys()), dtype=str))
+        numpy.save(join(temporary, "labels.npy"), numpy.array(labels, dtype=numpy.int32))
+        with open(join(temporary, "options.json"), "w", encoding="utf-8") as file:
+            file.write(dumps(options))
+        replace(temporary, path)
+
+    @staticmethod
+    def load(path):
+        """Returns the dataset saved to the folder at the given path; its documents share a tokenizer
+        holding the vocabulary and the options they were parsed with, which decodes their word ids
+        (views of the memory map) on access."""
+        interner = Interner()
+        interner.words = numpy.load(join(path, "vocabulary.npy")).tolist()
+        interner.ids = dict(zip(interner.words, range(0, len(interner.words))))
+        with open(join(path, "options.json"), encoding="utf-8") as file:
+            options = loads(file.read())
+        tokenizer = Tokenizer(interner=interner, **options)
+        token_ids = numpy.load(join(path, "token_ids.npy"), mmap_mode="r")
+        offsets = numpy.load(join(path, "offsets.npy")).tolist()
+        classes = numpy.load(join(path, "classes.npy")).tolist()
+        labels = numpy.load(join(path, "labels.npy")).tolist()
+        documents = []
+        for i in range(0, len(labels)):
+            document = ClassDocument.__new__(ClassDocument)
+            document.text = None
+            document.words = token_ids[offsets[i]:offsets[i + 1]]
+            document.tokenizer = tokenizer
+            document.c = classes[labels[i]]
+            documents.append(document)
+        return ClassDataset(documents, normalise=False)
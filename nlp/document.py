@@ -1,24 +1,188 @@
-from re import sub
+from re import sub, compile
+from array import array
+import numpy
+
+stopwords = frozenset(["the", "and", "to", "a", "an", "i", "it", "this", "of", "for", "my", "on", "with", "you", "that",
+                       "in", "have"])
+
+
+class Interner:
+
+    """A vocabulary shared by documents, mapping each word to an integer id (its position in the list of words)
+    so that the documents can store their words as compact arrays of ids rather than as strings."""
+
+    def __init__(self):
+        """Initializes an empty interner."""
+        self.words = []
+        self.ids = {}
+
+    def get_ids(self, words):
+        """Returns an array of unsigned integers containing the ids of the given words;
+        the words met for the first time are added to the vocabulary."""
+        ids = self.ids
+        token_ids = array("I")
+        for word in words:
+            word_id = ids.get(word)
+            if word_id is None:
+                word_id = len(self.words)
+                ids[word] = word_id
+                self.words.append(word)
+            token_ids.append(word_id)
+        return token_ids
+
+    def get_words(self, token_ids):
+        """Returns the list of the words for the given ids (an array of ids or a NumPy array, e.g. a memory map)."""
+        return list(map(self.words.__getitem__, token_ids.tolist()))
+
+    def get_positions(self, positions):
+        """Returns an array mapping each id of the interner to the position of its word in the given dictionary
+        (word, position), or to -1 for the words missing from it; it turns arrays of ids into positions at once
+        (e.g. the columns of a vocabulary), without decoding the words."""
+        ids_positions = numpy.full(len(self.words), -1, dtype=numpy.int64)
+        ids = self.ids
+        for word in positions:
+            word_id = ids.get(word)
+            if word_id is not None:
+                ids_positions[word_id] = positions[word]
+        return ids_positions
+
+
+class Tokenizer:
+
+    """A tokenizer turning raw text into a bag of words in a single pass; it is compiled once for a configuration
+    (preserving duplicate words, removing stopwords and the sizes of the ngrams) and reused for every document."""
+
+    pattern = compile(r"[A-Za-z\']+")
+    tokenizers = {}
+
+    def __init__(self, preserve_duplicates=False, remove_stopwords=False, ngrams=None, interner=None):
+        """Initializes the tokenizer given the options of the documents it parses (see Document);
+        if an interner is given, the documents store the ids of their words instead of the words."""
+        self.preserve_duplicates = preserve_duplicates
+        self.remove_stopwords = remove_stopwords
+        self.ngrams = []
+        if ngrams != None and type(ngrams) is list:
+            self.ngrams = ngrams
+        self.interner = interner
+
+    def get_bag_of_words(self, text):
+        """Returns the bag of words of the given text: the lowercase words matched by the regex
+        (without the stopwords, if they are removed) followed by the ngrams, as a list or as a set
+        if the duplicates are not preserved; a text without any word has an empty bag of words.
+        The text is lowercased once and the words are matched in a single pass over it."""
+        words = Tokenizer.pattern.findall(text.lower())
+        if self.remove_stopwords:
+            words = [word for word in words if word not in stopwords]
+        if len(self.ngrams) != 0:
+            words += Document.get_ngrams(self.ngrams, words)
+        if not self.preserve_duplicates:
+            return set(words)
+        return words
+
+    def get_token_ids(self, bag_of_words):
+        """Returns the given bag of words (from get_bag_of_words) as an array of ids from the interner:
+        the ids of the words in order if the duplicates are preserved, otherwise the sorted ids of the distinct words."""
+        if not self.preserve_duplicates:
+            return array("I", sorted(self.interner.get_ids(bag_of_words)))
+        return self.interner.get_ids(bag_of_words)
+
+    def get_bag_of_words_from_ids(self, token_ids):
+        """Returns the bag of words (a list or a set, as for get_bag_of_words) for the given array of ids."""
+        words = self.interner.get_words(token_ids)
+        if not self.preserve_duplicates:
+            return set(words)
+        return words
+
+    def get_options(self):
+        """Returns the options of the documents parsed by the tokenizer, as a dictionary of the keyword arguments
+        of Document (preserve_duplicates, remove_stopwords and ngrams, None if there are none)."""
+        return {"preserve_duplicates": self.preserve_duplicates, "remove_stopwords": self.remove_stopwords,
+                "ngrams": self.ngrams if len(self.ngrams) != 0 else None}
+
+    @staticmethod
+    def get_document_options(documents):
+        """Returns the options of the given documents (any iterable, see get_options), taken from the tokenizer
+        of the first one; the default options if there are no documents or if the first one has no tokenizer
+        (e.g. a loaded one). An iterator is advanced by one document."""
+        document = next(iter(documents), None)
+        if document is None or document.tokenizer is None:
+            return Tokenizer().get_options()
+        return document.tokenizer.get_options()
+
+    @staticmethod
+    def get_tokenizer(preserve_duplicates=False, remove_stopwords=False, ngrams=None):
+        """Returns the (shared) tokenizer for the given options; it is created on first request."""
+        key = (preserve_duplicates == True, remove_stopwords == True, tuple(ngrams) if type(ngrams) is list else None)
+        if key not in Tokenizer.tokenizers:
+            Tokenizer.tokenizers[key] = Tokenizer(preserve_duplicates=preserve_duplicates,
+                                                  remove_stopwords=remove_stopwords, ngrams=ngrams)
+        return Tokenizer.tokenizers[key]
 
-stopwords = ["the", "and", "to", "a", "an", "i", "it", "this", "of", "for", "my", "on", "with", "you", "that", "in", "have"]
 
 class Document:
 
     """A data structure to parse and represent a text document as a bag of words."""
 
-    def __init__(self, text, preserve_duplicates=False, remove_stopwords=False, ngrams=None):
+    __slots__ = ("text", "words", "tokenizer")
+
+    def __init__(self, text, preserve_duplicates=False, remove_stopwords=False, ngrams=None, tokenizer=None,
+                 keep_text=True, bag_of_words=None):
         """Initializes a document object given the raw text and a class;
         options include the possibility of preserving duplicate words in the document,
-        removing the stopwords and adding ngrams (as a list of the n values)."""
-        self.text = text
-        bag_of_words = Document.get_bag_of_words(text)
-        if remove_stopwords == True:
-            bag_of_words = Document.get_bag_without_stopwords(bag_of_words)
-        if ngrams != None and type(ngrams) is list:
-            bag_of_words += Document.get_ngrams(ngrams, bag_of_words)
-        if preserve_duplicates == False:
-            bag_of_words = set(bag_of_words)
-        self.bag_of_words = bag_of_words
+        removing the stopwords and adding ngrams (as a list of the n values).
+        The text is parsed by the given tokenizer, if any, in which case the options are ignored;
+        otherwise, by the shared tokenizer for the options; the tokenizer is kept, so the options are known later on
+        (e.g. to save a model trained on the document).
+        If the tokenizer has an interner, the words are stored as an array of ids and decoded on access,
+        without being kept, so the documents stay compact; the hot paths (e.g. the term frequencies and the tests
+        of a decision tree) use the ids directly instead (see interner and contains);
+        if the keep_text option is set to false, the raw text is dropped once parsed.
+        The bag of words can be given if the text was already parsed by (a copy of) the tokenizer,
+        e.g. in another process."""
+        self.text = text if keep_text else None
+        if tokenizer is None:
+            tokenizer = Tokenizer.get_tokenizer(preserve_duplicates=preserve_duplicates,
+                                                remove_stopwords=remove_stopwords, ngrams=ngrams)
+        if bag_of_words is None:
+            bag_of_words = tokenizer.get_bag_of_words(text)
+        if tokenizer.interner is None:
+            self.words = bag_of_words
+        else:
+            self.words = tokenizer.get_token_ids(bag_of_words)
+        self.tokenizer = tokenizer
+
+    @property
+    def bag_of_words(self):
+        """Returns the bag of words of the document as a list of words, or a set if the duplicates are not preserved;
+        it is decoded from the ids on every access if the words are interned."""
+        if self.tokenizer is None or self.tokenizer.interner is None:
+            return self.words
+        return self.tokenizer.get_bag_of_words_from_ids(self.words)
+
+    @property
+    def interner(self):
+        """Returns the interner the ids of the words of the document refer to, or None if its words are not interned
+        (the words attribute then holds the bag of words)."""
+        if self.tokenizer is None:
+            return None
+        return self.tokenizer.interner
+
+    def contains(self, word):
+        """Returns whether the given word is in the bag of words of the document;
+        if the words are interned, the id of the word is looked up in the ids, which are not decoded."""
+        interner = self.interner
+        if interner is None:
+            return word in self.words
+        word_id = interner.ids.get(word)
+        return word_id is not None and word_id in self.words
+
+    @bag_of_words.setter
+    def bag_of_words(self, bag_of_words):
+        """Replaces the bag of words of the document with the given list or set of words;
+        the options of its tokenizer are kept."""
+        self.words = bag_of_words
+        if self.tokenizer is not None and self.tokenizer.interner is not None:
+            self.tokenizer = Tokenizer.get_tokenizer(**self.tokenizer.get_options())
 
     def __str__(self):
         """Returns the string representation of the document as a class-text pair."""
@@ -38,14 +202,8 @@ class Document:
         """Returns the ngrams given the bag of words and the desired ngram size."""
         ngrams = []
         for n in ns:
-            number_of_ngrams = len(bag_of_words) - n + 1
-            for i in range(0, number_of_ngrams):
-                ngram = ""
-                for j in range(0, n):
-                    ngram += bag_of_words[i + j]
-                    if j != n - 1:
-                        ngram += " "
-                ngrams.append(ngram)
+            for i in range(0, len(bag_of_words) - n + 1):
+                ngrams.append(" ".join(bag_of_words[i:i + n]))
         return ngrams
 
     @staticmethod
@@ -61,9 +219,13 @@ class Document:
         """Returns the given text parsed according to the regex and methods."""
         return sub(r"[^A-Za-z\']+", ' ', text).strip().lower()
 
+
 class ClassDocument(Document):
 
-    def __init__(self, text, c, preserve_duplicates=False, remove_stopwords=False, ngrams=None):
+    __slots__ = ("c",)
+
+    def __init__(self, text, c, preserve_duplicates=False, remove_stopwords=False, ngrams=None, tokenizer=None,
+                 keep_text=True, bag_of_words=None):
         Document.__init__(self, text, preserve_duplicates=preserve_duplicates, remove_stopwords=remove_stopwords,
-                          ngrams=ngrams)
+                          ngrams=ngrams, tokenizer=tokenizer, keep_text=keep_text, bag_of_words=bag_of_words)
         self.c = c
\ No newline at end of file
@@ -0,0 +1,73 @@
+from zlib import crc32
+from scipy.sparse import csr_matrix, vstack
+from concurrent.futures import ProcessPoolExecutor
+from nlp.utilities import ProcessContext
+import numpy
+
+
+class FeatureHasher:
+
+    """A featurizer mapping each word (or ngram) of a document to one of a fixed number of features (columns)
+    by hashing it, so that no vocabulary is built and the memory used does not depend on the size of the corpus;
+    distinct words may share a feature. With signed hashing, each word is also given a sign by the hash,
+    so that the counts of colliding words tend to cancel out rather than add up.
+
+    The hash (CRC-32 of the UTF-8 bytes) does not depend on the process, so documents can be featurized
+    separately, e.g. by a pool of processes, and their rows combined."""
+
+    worker_documents = None
+
+    def __init__(self, bits=20, signed=True):
+        """Initializes the featurizer with 2^bits features, signed or not."""
+        self.bits = bits
+        self.size = 1 << bits
+        self.signed = signed
+
+    def get_features(self, words):
+        """Returns the list of the features of the given words."""
+        mask = self.size - 1
+        return [crc32(word.encode("utf-8")) & mask for word in words]
+
+    def get_matrix(self, documents, workers=1):
+        """Returns a sparse (CSR) matrix of size len(documents) x 2^bits containing the (signed) counts of the
+        features of the given documents; the documents are split between the given number of processes."""
+        if workers <= 1 or len(documents) < 2 * workers:
+            return self.get_rows(documents)
+        size = -(-len(documents) // workers)
+        arguments = []
+        for start in range(0, len(documents), size):
+            arguments.append((self.bits, self.signed, start, start + size))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ProcessContext.get_context(),
+                                 initializer=FeatureHasher.set_worker_documents, initargs=(documents,)) as executor:
+            return vstack(list(executor.map(FeatureHasher.get_worker_rows, arguments)), format="csr")
+
+    def get_rows(self, documents):
+        """Returns the sparse (CSR) matrix of the (signed) feature counts of the given documents, in a single process;
+        features whose counts cancel out are not stored."""
+        mask = self.size - 1
+        indptr = [0]
+        indices = []
+        data = []
+        for document in documents:
+            for word in document.bag_of_words:
+                word_hash = crc32(word.encode("utf-8"))
+                indices.append(word_hash & mask)
+                data.append(-1 if self.signed and word_hash >> 31 else 1)
+            indptr.append(len(indices))
+        matrix = csr_matrix((numpy.array(data, dtype=numpy.float64), numpy.array(indices, dtype=numpy.int32),
+                             numpy.array(indptr, dtype=numpy.int64)), shape=(len(documents), self.size))
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+        return matrix
+
+    @staticmethod
+    def set_worker_documents(documents):
+        """Sets the documents featurized by the current worker process."""
+        FeatureHasher.worker_documents = documents
+
+    @staticmethod
+    def get_worker_rows(arguments):
+        """Returns the feature counts of a range of the documents of the current worker process given the
+        (bits, signed, start, end) arguments."""
+        bits, signed, start, end = arguments
+        return FeatureHasher(bits=bits, signed=signed).get_rows(FeatureHasher.worker_documents[start:end])
@@ -0,0 +1,90 @@
+from scipy.sparse import csr_matrix
+import numpy
+from nlp.classifier import Classifier
+from nlp.id3 import SplitFinder
+
+
+class FeatureSelector:
+
+    """A feature selection stage reducing the vocabulary of training documents before it is given to a classifier
+    (as the vocabulary option of TermDocumentMatrix, NaiveBayes, KNN and ID3), so that the classifiers work
+    over fewer dimensions.
+
+    The document frequency of each word, overall and for each class, is counted in a single pass over the documents;
+    words are kept if their document frequency is within the bounds and, if a number of words is given, if they are
+    among the best words by score: the document frequency ("frequency"), the chi-squared statistic of the word and
+    the classes ("chi2", the highest over the classes) or the information gain of the word ("information_gain")."""
+
+    def __init__(self, documents, minimum_document_frequency=1, maximum_document_ratio=1.0, number_of_words=None,
+                 score="frequency"):
+        """Initializes the selector given the training documents, the minimum number of documents a word must
+        appear in, the maximum ratio of the documents it may appear in, the number of words to keep (all of them if
+        None) and the name of the score ranking them; the selected words are stored as the vocabulary, in the order
+        they were first found, along with the scores of all the words."""
+        self.classes = Classifier(documents).classes
+        self.words, occurrences, labels = FeatureSelector.get_occurrences(documents, self.classes)
+        self.document_frequencies = numpy.bincount(occurrences.indices, minlength=len(self.words))
+        self.class_document_frequencies = numpy.asarray(occurrences.T @ numpy.eye(len(self.classes))[labels]).T
+        self.class_document_counts = numpy.bincount(labels, minlength=len(self.classes))
+        if score == "frequency":
+            self.scores = self.document_frequencies.astype(numpy.float64)
+        elif score == "chi2":
+            self.scores = FeatureSelector.get_chi_squared_scores(self.class_document_frequencies,
+                                                                 self.class_document_counts)
+        elif score == "information_gain":
+            split_finder = SplitFinder(occurrences, labels, len(self.classes))
+            self.scores = split_finder.get_information_gains(numpy.arange(len(documents)))
+        else:
+            raise ValueError("Invalid score name (should be \"frequency\", \"chi2\" or \"information_gain\").")
+        selected = self.document_frequencies >= minimum_document_frequency
+        selected &= self.document_frequencies <= maximum_document_ratio * len(documents)
+        if number_of_words is not None and number_of_words < numpy.count_nonzero(selected):
+            candidates = numpy.flatnonzero(selected)
+            best = candidates[numpy.argsort(-self.scores[candidates], kind="stable")[0:number_of_words]]
+            selected = numpy.zeros(len(self.words), dtype=bool)
+            selected[best] = True
+        self.vocabulary = [self.words[word_id] for word_id in numpy.flatnonzero(selected).tolist()]
+
+    @staticmethod
+    def get_occurrences(documents, classes):
+        """Returns the list of the words found in the given documents, the sparse (CSR) matrix of size
+        len(documents) x len(words) of their occurrences (ones and zeros) and the array of the class ids
+        of the documents (their position in the given classes)."""
+        word_ids = {}
+        words = []
+        indptr = [0]
+        indices = []
+        for document in documents:
+            for word in dict.fromkeys(document.bag_of_words):
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = len(words)
+                    word_ids[word] = word_id
+                    words.append(word)
+                indices.append(word_id)
+            indptr.append(len(indices))
+        occurrences = csr_matrix((numpy.ones(len(indices)), numpy.array(indices, dtype=numpy.int32),
+                                  numpy.array(indptr, dtype=numpy.int64)), shape=(len(documents), len(words)))
+        class_ids = {}
+        for c in classes:
+            class_ids[c] = len(class_ids)
+        labels = numpy.array([class_ids[document.c] for document in documents], dtype=numpy.int64)
+        return words, occurrences, labels
+
+    @staticmethod
+    def get_chi_squared_scores(class_document_frequencies, class_document_counts):
+        """Returns the array with the highest chi-squared statistic over the classes of each word, given the
+        (classes x words) document frequencies for each class and the number of documents of each class;
+        the statistic is computed from the 2 x 2 table of the documents in or out of the class, with or without the word."""
+        number_of_documents = class_document_counts.sum()
+        with_word_in_class = class_document_frequencies
+        with_word = class_document_frequencies.sum(axis=0)[numpy.newaxis, :]
+        in_class = class_document_counts[:, numpy.newaxis]
+        with_word_out_of_class = with_word - with_word_in_class
+        without_word_in_class = in_class - with_word_in_class
+        without_word_out_of_class = number_of_documents - with_word - without_word_in_class
+        numerators = number_of_documents * (with_word_in_class * without_word_out_of_class -
+                                            with_word_out_of_class * without_word_in_class) ** 2
+        denominators = in_class * (number_of_documents - in_class) * with_word * (number_of_documents - with_word)
+        scores = numerators / numpy.where(denominators > 0, denominators, 1)
+        return scores.max(axis=0)
@@ -1,7 +1,9 @@
 from nlp.classifier import Classifier
 from nlp.term_document_matrix import TermDocumentMatrix
+from nlp.model_file import ModelFile
 from math import log
 from abc import ABC, abstractmethod
+import numpy
 
 
 class TreeNode(ABC):
@@ -59,21 +61,211 @@ class ClassTreeNode(TreeNode):
         return string
 
 
+class SplitFinder:
+
+    """A helper to find the most informative word for a subset of the training documents (a node of the tree);
+    the information gain of every word is derived at once from the counts of the documents of each class
+    with and without the word, which are obtained with a single sparse matrix product."""
+
+    def __init__(self, occurrences, labels, number_of_classes):
+        """Initializes the helper given the (documents x vocabulary) sparse matrix of word occurrences (ones and zeros),
+        the array of the class ids of the documents and the number of classes."""
+        self.occurrences = occurrences
+        self.occurrences_by_word = occurrences.tocsc()
+        self.labels = labels
+        self.number_of_classes = number_of_classes
+        self.one_hot_labels = numpy.eye(number_of_classes)[labels]
+
+    def get_class_counts(self, indices):
+        """Returns the array with the number of documents of each class among the documents at the given indices."""
+        return numpy.bincount(self.labels[indices], minlength=self.number_of_classes)
+
+    def get_information_gains(self, indices):
+        """Returns the array with the information gain of each word for the documents at the given indices;
+        the (vocabulary x classes) counts of the documents with the word are the product of the transposed
+        occurrences and the one-hot classes of the documents, the counts without the word are the difference
+        with the class counts of the documents."""
+        class_counts = self.get_class_counts(indices)
+        with_word = self.occurrences[indices].T @ self.one_hot_labels[indices]
+        without_word = class_counts - with_word
+        gains = SplitFinder.get_entropies(class_counts[None, :])[0]
+        gains = gains - SplitFinder.get_entropies(with_word) * with_word.sum(axis=1) / len(indices)
+        gains = gains - SplitFinder.get_entropies(without_word) * without_word.sum(axis=1) / len(indices)
+        return gains
+
+    def get_split(self, indices, word_id):
+        """Returns two arrays given the indices of the documents and a word id:
+        the first contains the indices of the documents with the word, the second of the documents without it."""
+        start, end = self.occurrences_by_word.indptr[word_id], self.occurrences_by_word.indptr[word_id + 1]
+        with_word = numpy.isin(indices, self.occurrences_by_word.indices[start:end])
+        return indices[with_word], indices[~with_word]
+
+    @staticmethod
+    def get_entropies(counts):
+        """Returns the array with the entropy of each row of the given (rows x classes) matrix of class counts."""
+        totals = counts.sum(axis=1, keepdims=True)
+        ratios = counts / numpy.maximum(totals, 1)
+        logarithms = numpy.log2(numpy.where(ratios > 0, ratios, 1))
+        return -(ratios * logarithms).sum(axis=1)
+
+
 class ID3(Classifier):
 
     """An ID3 classifier; given documents, it generates a decision tree for classification."""
 
-    def __init__(self, documents):
-        """Initializes the classifier given the documents; it obtains the vocabulary and generates the tree."""
+    def __init__(self, documents, maximum_depth=None, minimum_documents=2, minimum_gain=None, maximum_leaves=None,
+                 vocabulary=None, term_frequencies=None):
+        """Initializes the classifier given the documents; it obtains the vocabulary and generates the tree.
+
+        The tree is generated from the sparse matrix of the word occurrences in the documents:
+        the nodes hold arrays of document indices and the words are referred to by their id.
+        Optional stopping criteria turn a node into a leaf when it is at the maximum depth, when it has fewer
+        documents than the minimum, when its most informative word has a gain lower than the minimum or when
+        splitting it would exceed the maximum number of leaves.
+        The term frequencies of the documents can be given, with the vocabulary their columns refer to,
+        to avoid counting the words again (e.g. rows of a larger corpus counted once);
+        words of that vocabulary which do not occur in the documents are never used.
+        A vocabulary can also be given alone (e.g. the words kept by a FeatureSelector) to restrict the split search
+        to its words.
+
+        The tree is stored as parallel lists indexed by node (the root being node 0): the id of the word
+        tested by the node (-1 for leaves), the nodes for the documents with and without the word and the id
+        of the class predicted at the node (the majority class of its training documents)."""
         Classifier.__init__(self, documents)
-        documents = set(documents)
-        term_document_matrix = TermDocumentMatrix(documents, compute_word_vectors=False, compute_document_vectors=False)
-        self.vocabulary = set(term_document_matrix.vocabulary)
-        self.tree = self.get_tree(documents, self.vocabulary)
+        self.maximum_depth = maximum_depth
+        self.minimum_documents = minimum_documents
+        self.minimum_gain = minimum_gain
+        self.maximum_leaves = maximum_leaves
+        if term_frequencies is None:
+            term_document_matrix = TermDocumentMatrix(documents, vocabulary=vocabulary)
+            vocabulary = term_document_matrix.vocabulary
+            term_frequencies = term_document_matrix.term_frequencies
+        self.words = vocabulary
+        occurrences = term_frequencies.astype(numpy.float64)
+        occurrences.data[:] = 1
+        self.excluded = numpy.asarray(occurrences.sum(axis=0)).ravel() == 0
+        self.vocabulary = set()
+        for word_id in numpy.flatnonzero(~self.excluded).tolist():
+            self.vocabulary.add(vocabulary[word_id])
+        class_ids = {}
+        for c in self.classes:
+            class_ids[c] = len(class_ids)
+        labels = numpy.array([class_ids[document.c] for document in documents], dtype=numpy.int64)
+        split_finder = SplitFinder(occurrences, labels, len(self.classes))
+        self.features, self.with_word, self.without_word, self.node_classes = self.get_tree_arrays(split_finder)
+        self.cached_tree = None
+
+    def save(self, path):
+        """Saves the classifier to a folder at the given path (see ModelFile): its parameters, the words
+        its ids refer to, the words excluded from the splits and the arrays of the tree."""
+        header = {"classes": self.classes, "maximum_depth": self.maximum_depth,
+                  "minimum_documents": self.minimum_documents, "minimum_gain": self.minimum_gain,
+                  "maximum_leaves": self.maximum_leaves, "document_options": self.document_options}
+        arrays = {"words": numpy.array(self.words, dtype=str), "excluded": self.excluded,
+                  "features": numpy.array(self.features, dtype=numpy.int64),
+                  "with_word": numpy.array(self.with_word, dtype=numpy.int64),
+                  "without_word": numpy.array(self.without_word, dtype=numpy.int64),
+                  "node_classes": numpy.array(self.node_classes, dtype=numpy.int64)}
+        ModelFile.save(path, "ID3", header, arrays)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Returns the classifier saved to the folder at the given path, loaded with the given memory map mode;
+        it holds no training documents."""
+        header, arrays = ModelFile.load(path, "ID3", mmap_mode=mmap_mode)
+        id3 = ID3.__new__(ID3)
+        id3.documents = []
+        id3.classes = header["classes"]
+        id3.document_options = ModelFile.get_document_options(header)
+        id3.maximum_depth = header["maximum_depth"]
+        id3.minimum_documents = header["minimum_documents"]
+        id3.minimum_gain = header["minimum_gain"]
+        id3.maximum_leaves = header["maximum_leaves"]
+        id3.words = arrays["words"].tolist()
+        id3.excluded = arrays["excluded"]
+        id3.vocabulary = set()
+        for word_id in numpy.flatnonzero(~id3.excluded).tolist():
+            id3.vocabulary.add(id3.words[word_id])
+        id3.features = arrays["features"].tolist()
+        id3.with_word = arrays["with_word"].tolist()
+        id3.without_word = arrays["without_word"].tolist()
+        id3.node_classes = arrays["node_classes"].tolist()
+        id3.cached_tree = None
+        return id3
+
+    @property
+    def tree(self):
+        """Returns the decision tree as linked tree nodes (e.g. to be printed); it is generated on first access."""
+        if self.cached_tree is None:
+            nodes = []
+            for node in range(0, len(self.features)):
+                if self.features[node] == -1:
+                    nodes.append(ClassTreeNode(self.classes[self.node_classes[node]]))
+                else:
+                    nodes.append(WordTreeNode(self.words[self.features[node]]))
+            for node in range(0, len(self.features)):
+                if self.features[node] != -1:
+                    nodes[node].children = [nodes[self.with_word[node]], nodes[self.without_word[node]]]
+            self.cached_tree = nodes[0]
+        return self.cached_tree
 
     def get_prediction(self, document):
-        """Returns the predicted class for the given document based on the previously generated decision tree."""
-        return self.classify(document, self.tree)
+        """Returns the predicted class for the given document based on the previously generated decision tree;
+        it is done by moving from the root to the child for the outcome of each test until a leaf.
+        The ids of an interned document are gathered in a set once, so the tests look up the id of the word
+        rather than decoding the words."""
+        interner = document.interner
+        words = document.words if interner is None else set(document.words.tolist())
+        node = 0
+        while self.features[node] != -1:
+            word = self.words[self.features[node]]
+            if interner is not None:
+                word = interner.ids.get(word)
+            if word in words:
+                node = self.with_word[node]
+            else:
+                node = self.without_word[node]
+        return self.classes[self.node_classes[node]]
+
+    def predict_batch(self, documents):
+        """Returns the list of predicted classes for the given documents; all the documents move down one level
+        of the tree at a time, testing the presence of the words in a boolean (documents x tree words) matrix
+        (filled from the ids of interned documents, without decoding their words)."""
+        features = numpy.array(self.features)
+        tree_word_ids = numpy.unique(features[features != -1])
+        columns = {}
+        for column in range(0, len(tree_word_ids)):
+            columns[self.words[tree_word_ids[column]]] = column
+        presence = numpy.zeros((len(documents), len(tree_word_ids) + 1), dtype=bool)
+        interner = None
+        interner_columns = None
+        for i in range(0, len(documents)):
+            document = documents[i]
+            if document.interner is not None:
+                if document.interner is not interner or len(interner_columns) != len(document.interner.words):
+                    interner = document.interner
+                    interner_columns = interner.get_positions(columns)
+                document_columns = interner_columns[numpy.asarray(document.words, dtype=numpy.int64)]
+                presence[i, document_columns[document_columns != -1]] = True
+            else:
+                for word in document.bag_of_words:
+                    if word in columns:
+                        presence[i, columns[word]] = True
+        feature_columns = numpy.searchsorted(tree_word_ids, features)
+        feature_columns[features == -1] = len(tree_word_ids)
+        with_word = numpy.array(self.with_word)
+        without_word = numpy.array(self.without_word)
+        nodes = numpy.zeros(len(documents), dtype=numpy.int64)
+        active = numpy.flatnonzero(features[nodes] != -1)
+        while len(active) != 0:
+            current = nodes[active]
+            present = presence[active, feature_columns[current]]
+            nodes[active] = numpy.where(present, with_word[current], without_word[current])
+            active = active[features[nodes[active]] != -1]
+        predictions = []
+        for node in nodes.tolist():
+            predictions.append(self.classes[self.node_classes[node]])
+        return predictions
 
     def classify(self, document, tree):
         """Returns the predicted class for the document;
@@ -81,34 +273,66 @@ class ID3(Classifier):
         if type(tree) is ClassTreeNode:
             return tree.c
         else:
-            if tree.word in document.bag_of_words:
+            if document.contains(tree.word):
                 return self.classify(document, tree.children[0])
             else:
                 return self.classify(document, tree.children[1])
 
-    def get_tree(self, documents, vocabulary):
-        """Returns the decision tree for the documents given the vocabulary;
-        it is done recursively by passing the updated vocabulary at each call.
-
-        Checks for the base cases first and returns a leaf node if they succeed;
-        Otherwise, it finds the most informative word, splits the document and calls recursively for each child.
-        """
-        if self.contain_one_class(documents):
-            return ClassTreeNode(self.contain_one_class(documents))
-        elif len(vocabulary) == 0:
-            return ClassTreeNode(self.get_majority_class(documents))
-        else:
-            most_informative_word = self.get_most_informative_word(documents, vocabulary)
-            tree_node = WordTreeNode(most_informative_word)
-            with_word, without_word = self.get_split_data(most_informative_word, documents)
-            vocabulary.remove(most_informative_word)
-            for subset in [with_word, without_word]:
-                if len(subset) == 0:
-                    tree_node.children.append(ClassTreeNode(self.get_majority_class(subset)))
-                else:
-                    tree_node.children.append(self.get_tree(subset, vocabulary))
-            vocabulary.add(most_informative_word)
-            return tree_node
+    def get_tree_arrays(self, split_finder):
+        """Returns the lists for the word ids, the children with and without the word and the class ids of the
+        nodes of the decision tree; it is built with an explicit stack of the nodes still to be split.
+
+        For each node, it checks for the base cases and the stopping criteria first and leaves it as a leaf
+        if they succeed; otherwise, it finds the most informative word (among the ones occurring in the documents)
+        that is not tested by an ancestor, splits the documents and pushes the children on the stack.
+        An empty subset becomes a leaf with the majority class of the documents being split."""
+        features = [-1]
+        with_word = [-1]
+        without_word = [-1]
+        node_classes = [0]
+        parents = [-1]
+        leaves = 1
+        stack = [(0, numpy.arange(len(split_finder.labels)), 0)]
+        while len(stack) != 0:
+            node, indices, depth = stack.pop()
+            class_counts = split_finder.get_class_counts(indices)
+            node_classes[node] = int(numpy.argmax(class_counts))
+            if numpy.count_nonzero(class_counts) <= 1 or len(indices) < self.minimum_documents:
+                continue
+            if self.maximum_depth is not None and depth >= self.maximum_depth:
+                continue
+            if self.maximum_leaves is not None and leaves >= self.maximum_leaves:
+                continue
+            used = []
+            ancestor = parents[node]
+            while ancestor != -1:
+                used.append(features[ancestor])
+                ancestor = parents[ancestor]
+            if len(used) == len(self.vocabulary):
+                continue
+            gains = split_finder.get_information_gains(indices)
+            gains[self.excluded] = -numpy.inf
+            gains[used] = -numpy.inf
+            word_id = int(numpy.argmax(gains))
+            if self.minimum_gain is not None and gains[word_id] < self.minimum_gain:
+                continue
+            features[node] = word_id
+            children = []
+            for subset in split_finder.get_split(indices, word_id):
+                child = len(features)
+                features.append(-1)
+                with_word.append(-1)
+                without_word.append(-1)
+                node_classes.append(node_classes[node])
+                parents.append(node)
+                children.append((child, subset, depth + 1))
+            with_word[node] = children[0][0]
+            without_word[node] = children[1][0]
+            leaves += 1
+            for child, subset, child_depth in reversed(children):
+                if len(subset) != 0:
+                    stack.append((child, subset, child_depth))
+        return features, with_word, without_word, node_classes
 
     def contain_one_class(self, documents):
         """Returns None if the documents contain more than a class; returns the class otherwise."""
@@ -145,7 +369,7 @@ class ID3(Classifier):
         with_word = set([])
         without_word = set([])
         for document in documents:
-            if word in document.bag_of_words:
+            if document.contains(word):
                 with_word.add(document)
             else:
                 without_word.add(document)
@@ -173,7 +397,7 @@ class ID3(Classifier):
         return gain
 
     def get_entropy(self, documents):
-        """Returns the entropy of the given documents;
+        r"""Returns the entropy of the given documents;
         it is computed as: H(S) = - sum_{x \in X) p(x) * log(p(x), 2),
         where H(S) is the entropy of set S, x is a class in X and p(x) is the ratio of examples in S with class x."""
         entropy = 0
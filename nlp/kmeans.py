@@ -1,100 +1,184 @@
-from random import uniform, randint
-from math import pow, sqrt
+import numpy
+from concurrent.futures import ProcessPoolExecutor
+from nlp.utilities import ProcessContext
 
 
 class KMeans:
 
-    def __init__(self, word_vectors, k):
+    """A k-means clustering of word vectors; the vectors are held in a single array and every distance between
+    the vectors and the centroids is computed at once by matrix products."""
+
+    worker_vectors = None
+
+    def __init__(self, word_vectors, k, maximum_iterations=300, tolerance=1e-4, seed=None, batch_size=None,
+                 restarts=1, workers=1):
+        """Initializes the clustering given the word vectors, as a list of (word, vector) pairs, and the number of
+        clusters, then clusters the vectors; the clustering stops after the maximum number of iterations or once the
+        centroids move (in total squared distance) less than the tolerance times the mean variance of the vectors.
+
+        If a batch size is given, each iteration only uses a random batch of vectors (mini-batch k-means).
+        The clustering is run as many times as the number of restarts, from different seeds, by a pool of as many
+        processes as workers, and the run with the lowest inertia is kept.
+        The resulting label of each vector, centroids (one row each) and inertia (sum of the squared distances of the
+        vectors to their centroid) are stored."""
         self.word_vectors = word_vectors
-        self.dimensions = len(word_vectors[0][1])
-        self.boundaries = self.get_boundaries(word_vectors)
+        self.words = [word_vector[0] for word_vector in word_vectors]
+        self.vectors = numpy.array([word_vector[1] for word_vector in word_vectors], dtype=numpy.float64)
+        self.dimensions = self.vectors.shape[1]
         self.k = k
-        self.cluster(word_vectors)
-
-    def cluster(self, word_vectors):
-        clusters = self.get_initial_clusters()
-        while True:
-            for word_vector in word_vectors:
-                vector = word_vector[1]
-                best_centroid = None
-                best_distance = float("+inf")
-                for centroid in clusters:
-                    distance = self.get_euclidean_distance(vector, centroid)
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_centroid = centroid
-                clusters[best_centroid].append(word_vector)
-            self.print_clusters(clusters)
-            new_clusters = self.get_new_clusters(clusters)
-            for i in range(0, self.k - len(new_clusters)):
-                point = self.get_random_point()
-                new_clusters[point] = []
-            if new_clusters.keys() == clusters.keys():
-                break
+        self.maximum_iterations = maximum_iterations
+        self.tolerance = tolerance
+        self.seed = seed
+        self.batch_size = batch_size
+        self.restarts = restarts
+        self.workers = workers
+        self.labels = None
+        self.centroids = None
+        self.inertia = None
+        self.iterations = 0
+        self.cluster(self.vectors)
+
+    def cluster(self, vectors):
+        """Clusters the given vectors (one row each) once per restart, sequentially or in parallel,
+        and keeps the labels, centroids, inertia and number of iterations of the run with the lowest inertia."""
+        seeds = numpy.random.SeedSequence(self.seed).spawn(self.restarts)
+        arguments = []
+        for seed in seeds:
+            arguments.append((self.k, self.maximum_iterations, self.tolerance, seed, self.batch_size))
+        if self.workers > 1 and self.restarts > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, self.restarts),
+                                     mp_context=ProcessContext.get_context(),
+                                     initializer=KMeans.set_worker_vectors, initargs=(vectors,)) as executor:
+                results = list(executor.map(KMeans.get_worker_clustering, arguments))
+        else:
+            results = []
+            for k, maximum_iterations, tolerance, seed, batch_size in arguments:
+                results.append(KMeans.get_clustering(vectors, k, maximum_iterations=maximum_iterations,
+                                                     tolerance=tolerance, seed=seed, batch_size=batch_size))
+        best = min(results, key=lambda result: result[2])
+        self.labels, self.centroids, self.inertia, self.iterations = best
+
+    @staticmethod
+    def set_worker_vectors(vectors):
+        """Sets the vectors clustered by the current worker process."""
+        KMeans.worker_vectors = vectors
+
+    @staticmethod
+    def get_worker_clustering(arguments):
+        """Returns the result of get_clustering for the vectors of the current worker process and the given
+        (k, maximum iterations, tolerance, seed, batch size) arguments."""
+        k, maximum_iterations, tolerance, seed, batch_size = arguments
+        return KMeans.get_clustering(KMeans.worker_vectors, k, maximum_iterations=maximum_iterations,
+                                     tolerance=tolerance, seed=seed, batch_size=batch_size)
+
+    @staticmethod
+    def get_clustering(vectors, k, maximum_iterations=300, tolerance=1e-4, seed=None, batch_size=None):
+        """Returns the labels, centroids, inertia and number of iterations of a clustering of the given vectors,
+        starting from centroids seeded by k-means++.
+
+        Each iteration assigns every vector to its closest centroid and moves the centroids to the mean of
+        their vectors, a centroid left without vectors being moved to the vector farthest from its centroid;
+        with a batch size, each iteration assigns a random batch of vectors instead and moves each centroid to the
+        running mean of all the vectors it was assigned so far (the vectors are then labelled once at the end)."""
+        generator = numpy.random.default_rng(seed)
+        threshold = tolerance * float(numpy.mean(numpy.var(vectors, axis=0)))
+        centroids = KMeans.get_initial_centroids(vectors, k, generator)
+        counts = numpy.zeros(len(centroids))
+        iterations = 0
+        while iterations < maximum_iterations:
+            iterations += 1
+            if batch_size is None:
+                distances = KMeans.get_squared_distances(vectors, centroids)
+                labels = numpy.argmin(distances, axis=1)
+                new_centroids = KMeans.get_centroids(vectors, labels, distances[numpy.arange(len(vectors)), labels],
+                                                     len(centroids))
             else:
-                clusters = new_clusters
-
-    def print_clusters(self, clusters):
-        i = 1
-        for centroid in clusters:
-            row = str(i) + "\n\n"
-            i += 1
-            for word_vector in clusters[centroid]:
-                row += word_vector[0] + ","
-            print(row)
-
-    def get_new_clusters(self, clusters):
-        new_clusters = {}
-        for centroid in clusters:
-            new_centroid = []
-            for n in range(0, self.dimensions):
-                sum = 0
-                for word_vector in clusters[centroid]:
-                    sum += word_vector[1][n]
-                if len(clusters[centroid]) != 0:
-                    new_centroid.append(sum / len(clusters[centroid]))
-            if len(new_centroid) != 0:
-                new_clusters[tuple(new_centroid)] = []
-        return new_clusters
-
-    def get_initial_clusters(self):
-        clusters = {}
-        for i in range(0, self.k):
-            point = self.get_random_point()
-            clusters[point] = []
+                batch = vectors[generator.choice(len(vectors), size=min(batch_size, len(vectors)), replace=False)]
+                new_centroids = KMeans.get_mini_batch_centroids(batch, centroids, counts)
+            shift = float(numpy.sum((new_centroids - centroids) ** 2))
+            centroids = new_centroids
+            if shift <= threshold:
+                break
+        distances = KMeans.get_squared_distances(vectors, centroids)
+        labels = numpy.argmin(distances, axis=1)
+        inertia = float(numpy.sum(distances[numpy.arange(len(vectors)), labels]))
+        return labels, centroids, inertia, iterations
+
+    @staticmethod
+    def get_mini_batch_centroids(batch, centroids, counts):
+        """Returns the centroids updated with the given batch of vectors: each vector of the batch is assigned to its
+        closest centroid, which moves towards it with a rate of one over the number of vectors it was assigned so far
+        (kept in counts, which is updated), so each centroid is the running mean of its vectors."""
+        labels = numpy.argmin(KMeans.get_squared_distances(batch, centroids), axis=1)
+        batch_counts = numpy.bincount(labels, minlength=len(centroids))
+        sums = numpy.zeros(centroids.shape)
+        numpy.add.at(sums, labels, batch)
+        counts += batch_counts
+        updated = batch_counts > 0
+        new_centroids = centroids.copy()
+        new_centroids[updated] += (sums[updated] - batch_counts[updated][:, numpy.newaxis] * centroids[updated]) / \
+            counts[updated][:, numpy.newaxis]
+        return new_centroids
+
+    @staticmethod
+    def get_lsa_word_vectors(lsa):
+        """Returns the list of the (word, vector) pairs of the vocabulary of the given latent semantic analysis,
+        where the vector of a word is its word vector scaled by the singular values (one dimension per topic)."""
+        return list(zip(lsa.vocabulary, lsa.word_vectors * lsa.singular_values))
+
+    def get_clusters(self):
+        """Returns a list containing, for each cluster, the list of the words of its vectors."""
+        clusters = []
+        for i in range(0, len(self.centroids)):
+            clusters.append([])
+        for word, label in zip(self.words, self.labels.tolist()):
+            clusters[label].append(word)
         return clusters
 
-    def get_euclidean_distance(self, vector_a, vector_b):
-        sum = 0
-        for n in range(0, self.dimensions):
-            sum += pow(vector_a[n] - vector_b[n], 2)
-        return sqrt(sum)
-
-    def get_manhattan_distance(self, vector_a, vector_b):
-        sum = 0
-        for n in range(0, self.dimensions):
-            sum += abs(vector_a[n] - vector_b[n])
-        return sum
-
-    def get_random_point(self):
-        point = []
-        for n in range(0, self.dimensions):
-            minimum = self.boundaries[n][0]
-            maximum = self.boundaries[n][1]
-            point.append(self.get_random_number(minimum, maximum))
-        return tuple(point)
-
-    def get_random_number(self, minimum, maximum):
-        return uniform(minimum, maximum)
-
-    def get_boundaries(self, word_vectors):
-        boundaries = []
-        for n in range(0, self.dimensions):
-            minimum = float("+inf")
-            maximum = float("-inf")
-            for word_vector in word_vectors:
-                vector = word_vector[1]
-                minimum = min(minimum, vector[n])
-                maximum = max(maximum, vector[n])
-            boundaries.append((minimum, maximum))
-        return boundaries
\ No newline at end of file
+    def print_clusters(self):
+        """Prints the words of each cluster."""
+        clusters = self.get_clusters()
+        for i in range(0, len(clusters)):
+            print(str(i + 1) + "\n\n" + ",".join(clusters[i]) + ",")
+
+    @staticmethod
+    def get_initial_centroids(vectors, k, generator):
+        """Returns k centroids chosen among the given vectors by k-means++: after a first vector picked uniformly,
+        each vector is picked with a probability proportional to its squared distance to the closest centroid."""
+        k = min(k, len(vectors))
+        centroids = numpy.empty((k, vectors.shape[1]))
+        centroids[0] = vectors[generator.integers(len(vectors))]
+        distances = KMeans.get_squared_distances(vectors, centroids[0:1])[:, 0]
+        for i in range(1, k):
+            total = float(numpy.sum(distances))
+            if total > 0:
+                index = int(numpy.searchsorted(numpy.cumsum(distances), generator.random() * total, side="right"))
+                index = min(index, len(vectors) - 1)
+            else:
+                index = int(generator.integers(len(vectors)))
+            centroids[i] = vectors[index]
+            distances = numpy.minimum(distances, KMeans.get_squared_distances(vectors, centroids[i:i + 1])[:, 0])
+        return centroids
+
+    @staticmethod
+    def get_squared_distances(vectors, centroids):
+        """Returns an array of size len(vectors) x len(centroids) containing the squared Euclidean distances
+        between the vectors and the centroids, as |v|^2 - 2 v.c + |c|^2."""
+        distances = numpy.sum(vectors ** 2, axis=1)[:, numpy.newaxis] - 2 * (vectors @ centroids.T)
+        distances += numpy.sum(centroids ** 2, axis=1)[numpy.newaxis, :]
+        return numpy.maximum(distances, 0)
+
+    @staticmethod
+    def get_centroids(vectors, labels, distances, k):
+        """Returns the k centroids as the means of the vectors with each label; the centroid of an empty cluster
+        is the vector with the largest (squared) distance to its centroid, which is then not reused."""
+        counts = numpy.bincount(labels, minlength=k)
+        centroids = numpy.zeros((k, vectors.shape[1]))
+        numpy.add.at(centroids, labels, vectors)
+        nonempty = counts > 0
+        centroids[nonempty] /= counts[nonempty][:, numpy.newaxis]
+        empty = numpy.flatnonzero(~nonempty)
+        if len(empty) != 0:
+            farthest = numpy.argsort(-distances, kind="stable")[0:len(empty)]
+            centroids[empty[0:len(farthest)]] = vectors[farthest]
+        return centroids
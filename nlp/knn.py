@@ -1,25 +1,102 @@
 from nlp.term_document_matrix import TermDocumentMatrix
 from math import pow, sqrt, log
 from nlp.classifier import Classifier
+from nlp.neighbour_search import NeighbourSearch
+from nlp.document import ClassDocument
+from nlp.model_file import ModelFile
+import numpy
 
 
 class KNN(Classifier):
 
     """A KNN classifier; given the training documents and number of neighbours, it generates the document vectors."""
 
-    def __init__(self, documents, k, weight_neighbors=True):
+    def __init__(self, documents, k, weight_neighbors=True, block_size=256, search="exact", search_options=None,
+                 hasher=None, vocabulary=None):
         """Initializes the classifier given the training documents and number of neighbours;
-        it computes the term-document matrix necessary to obtain the vocabulary and tf-idf document vectors."""
+        it computes the term-document matrix necessary to obtain the vocabulary and tf-idf document vectors,
+        which are normalised to unit length once so that cosine similarities are plain dot products.
+        The block size is the number of documents whose similarities are computed at once when predicting;
+        the search is the name of the neighbour search (either "exact" or the approximate "lsh"),
+        built with the optional dictionary of search options.
+        If a feature hasher is given, the vectors are built from the features of the words (see TermDocumentMatrix);
+        if a vocabulary is given (e.g. by a FeatureSelector), the vectors only have its words as dimensions."""
         Classifier.__init__(self, documents)
-        self.term_document_matrix = TermDocumentMatrix(documents, compute_word_vectors=False)
-        self.document_vectors = self.term_document_matrix.document_vectors
+        self.term_document_matrix = TermDocumentMatrix(documents, hasher=hasher, vocabulary=vocabulary)
+        matrix = NeighbourSearch.get_normalised_matrix(self.term_document_matrix.matrix)
+        self.neighbour_search = NeighbourSearch.get_neighbour_search(search, matrix, search_options)
+        if self.neighbour_search is None:
+            raise ValueError("Invalid neighbour search name (should be \"exact\" or \"lsh\").")
+        self.search = search
+        self.search_options = search_options
         self.k = k
         self.weight_neighbors = weight_neighbors
+        self.block_size = block_size
+
+    def save(self, path):
+        """Saves the classifier to a folder at the given path (see ModelFile): its parameters, the class of each
+        training document, the term-document matrix and the normalised matrix searched for the neighbours."""
+        header, arrays = self.term_document_matrix.get_state()
+        class_ids = {}
+        for c in self.classes:
+            class_ids[c] = len(class_ids)
+        header.update({"classes": self.classes, "k": self.k, "weight_neighbors": self.weight_neighbors,
+                       "block_size": self.block_size, "search": self.search, "search_options": self.search_options,
+                       "document_options": self.document_options})
+        arrays["labels"] = numpy.array([class_ids[document.c] for document in self.documents], dtype=numpy.int32)
+        arrays.update(ModelFile.get_sparse_arrays("matrix", self.neighbour_search.matrix))
+        ModelFile.save(path, "KNN", header, arrays)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Returns the classifier saved to the folder at the given path, with its matrices loaded with the given
+        memory map mode and its neighbour search built again from the saved matrix; its training documents
+        only hold their class (the neighbours found have no text nor bag of words)."""
+        header, arrays = ModelFile.load(path, "KNN", mmap_mode=mmap_mode)
+        knn = KNN.__new__(KNN)
+        knn.classes = header["classes"]
+        knn.document_options = ModelFile.get_document_options(header)
+        knn.documents = []
+        for label in arrays["labels"].tolist():
+            document = ClassDocument.__new__(ClassDocument)
+            document.text = None
+            document.words = []
+            document.tokenizer = None
+            document.c = knn.classes[label]
+            knn.documents.append(document)
+        knn.term_document_matrix = TermDocumentMatrix.__new__(TermDocumentMatrix)
+        knn.term_document_matrix.set_state(header, arrays, knn.documents)
+        knn.neighbour_search = NeighbourSearch.get_neighbour_search(header["search"],
+                                                                    ModelFile.get_sparse_matrix(arrays, "matrix"),
+                                                                    header["search_options"])
+        knn.search = header["search"]
+        knn.search_options = header["search_options"]
+        knn.k = header["k"]
+        knn.weight_neighbors = header["weight_neighbors"]
+        knn.block_size = header["block_size"]
+        return knn
+
+    @property
+    def document_vectors(self):
+        """Returns the tf-idf document vectors of the training documents as dictionaries (word, weight)."""
+        return self.term_document_matrix.document_vectors
 
     def get_prediction(self, document):
         """Returns the predicted class for the given document;
         it is done my finding the k most similar documents and computing the majority class."""
         most_similar_documents, similarities = self.get_most_similar_documents(document)
+        return self.get_class(most_similar_documents, similarities)
+
+    def predict_batch(self, documents):
+        """Returns the list of predicted classes for the given documents;
+        the similarities are computed for a block of documents at a time."""
+        predictions = []
+        for most_similar_documents, similarities in self.get_most_similar_documents_batch(documents):
+            predictions.append(self.get_class(most_similar_documents, similarities))
+        return predictions
+
+    def get_class(self, most_similar_documents, similarities):
+        """Returns the majority class of the given neighbours, weighted by similarity if specified."""
         if self.weight_neighbors:
             return KNN.get_majority_class(most_similar_documents, similarities)
         else:
@@ -28,19 +105,21 @@ class KNN(Classifier):
     def get_most_similar_documents(self, target):
         """Returns the k most similar documents to the given document;
         it is done by computing the cosine similarity between each training document and the target document."""
-        target_vector = self.term_document_matrix.get_document_vector(target)
-        documents_and_similarities = []
-        for i in range(0, len(self.documents)):
-            similarity = KNN.get_similarity(target_vector, self.document_vectors[i])
-            documents_and_similarities.append((self.documents[i], similarity))
-        documents_and_similarities.sort(key=lambda t: t[1], reverse=True)
-        documents_and_similarities = documents_and_similarities[0:self.k]
-        most_similar_documents = []
-        similarities = []
-        for x in documents_and_similarities:
-            most_similar_documents.append(x[0])
-            similarities.append(x[1])
-        return most_similar_documents, similarities
+        return self.get_most_similar_documents_batch([target])[0]
+
+    def get_most_similar_documents_batch(self, targets):
+        """Returns a list containing, for each of the given documents, the k most similar training documents
+        and their similarities; the neighbours of a block of documents are searched at once."""
+        results = []
+        for start in range(0, len(targets), self.block_size):
+            block = targets[start:start + self.block_size]
+            query_matrix = NeighbourSearch.get_normalised_matrix(self.term_document_matrix.get_document_matrix(block))
+            for indices, similarities in self.neighbour_search.search(query_matrix, self.k):
+                most_similar_documents = []
+                for i in indices.tolist():
+                    most_similar_documents.append(self.documents[i])
+                results.append((most_similar_documents, similarities.tolist()))
+        return results
 
     @staticmethod
     def get_majority_class(documents, similarities):
@@ -1,32 +1,168 @@
 from nlp.term_document_matrix import TermDocumentMatrix
-from numpy.linalg import svd
+from nlp.document import Tokenizer
+from numpy.linalg import svd, qr
+from scipy.sparse.linalg import svds
+import numpy
 import sys
 from nlp.dataset import Dataset
+from nlp.model_file import ModelFile
 
 
 class LatentSemanticAnalysis:
 
     """A class to perform latent semantic analysis on a corpus of documents."""
 
-    def __init__(self, documents):
+    def __init__(self, documents, rank=None, algorithm="lanczos", power_iterations=4, oversampling=None, seed=42):
         """Initializes the utility given the documents;
-        the word vectors are generated along with the dictionary, then stores the singular-value decomposition."""
+        the word vectors are generated along with the dictionary, then stores the singular-value decomposition.
+
+        If a rank is given, only the first rank topics are computed, with a truncated decomposition of the sparse
+        (words x documents) matrix: either by the Lanczos method ("lanczos") or by a randomized range finder
+        ("randomized") with the given number of power iterations and extra columns (as many as the rank by default).
+        Otherwise, the whole dense matrix is decomposed.
+        The signs of the singular vectors are chosen so that the largest weight of each word vector is positive."""
         self.documents = documents
+        self.rank = rank
         term_document_matrix = TermDocumentMatrix(documents, compute_document_vectors=False, log=True)
+        self.document_options = Tokenizer.get_document_options(documents)
+        self.term_document_matrix = term_document_matrix
         self.vocabulary = term_document_matrix.vocabulary
-        self.word_vectors, self.singular_values, self.document_vectors = svd(term_document_matrix.word_vectors,
-                                                                             full_matrices=False)
+        matrix = term_document_matrix.matrix.T.tocsr()
+        if rank is None or rank >= min(matrix.shape):
+            word_vectors, singular_values, document_vectors = svd(matrix.toarray(), full_matrices=False)
+            if rank is not None:
+                word_vectors, singular_values, document_vectors = (word_vectors[:, 0:rank], singular_values[0:rank],
+                                                                   document_vectors[0:rank])
+        elif algorithm == "randomized":
+            word_vectors, singular_values, document_vectors = LatentSemanticAnalysis.get_randomized_svd(
+                matrix, rank, power_iterations=power_iterations, oversampling=oversampling, seed=seed)
+        else:
+            word_vectors, singular_values, document_vectors = LatentSemanticAnalysis.get_lanczos_svd(matrix, rank,
+                                                                                                    seed=seed)
+        self.word_vectors, self.document_vectors = LatentSemanticAnalysis.get_signed_vectors(word_vectors,
+                                                                                             document_vectors)
+        self.singular_values = singular_values
+
+    def save(self, path):
+        """Saves the analysis to a folder at the given path (see ModelFile): its rank, the options of its documents,
+        the term-document matrix, the word vectors, the singular values and the document vectors."""
+        header, arrays = self.term_document_matrix.get_state()
+        header["rank"] = self.rank
+        header["document_options"] = self.document_options
+        arrays.update({"word_vectors": self.word_vectors, "singular_values": self.singular_values,
+                       "document_vectors": self.document_vectors})
+        ModelFile.save(path, "LatentSemanticAnalysis", header, arrays)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Returns the analysis saved to the folder at the given path, with its vectors loaded with the given memory map
+        mode, without decomposing the matrix again; it holds no documents, but can still transform and be updated
+        with new ones."""
+        header, arrays = ModelFile.load(path, "LatentSemanticAnalysis", mmap_mode=mmap_mode)
+        lsa = LatentSemanticAnalysis.__new__(LatentSemanticAnalysis)
+        lsa.documents = []
+        lsa.rank = header["rank"]
+        lsa.document_options = ModelFile.get_document_options(header)
+        lsa.term_document_matrix = TermDocumentMatrix.__new__(TermDocumentMatrix)
+        lsa.term_document_matrix.set_state(header, arrays, lsa.documents)
+        lsa.vocabulary = lsa.term_document_matrix.vocabulary
+        lsa.word_vectors = arrays["word_vectors"]
+        lsa.singular_values = arrays["singular_values"]
+        lsa.document_vectors = arrays["document_vectors"]
+        return lsa
+
+    def transform(self, documents):
+        """Returns an array of size len(documents) x topics where the nth row is the projection of the nth document
+        in the latent space (folding-in): its tf-idf vector (with the inverse document frequencies of the corpus,
+        words outside of the vocabulary being ignored) multiplied by the word vectors and divided by the singular values.
+        The projection of a document of the corpus is its document vector."""
+        matrix = self.term_document_matrix.get_document_matrix(documents)
+        singular_values = numpy.where(self.singular_values > 0, self.singular_values, 1)
+        return numpy.asarray(matrix @ self.word_vectors) / singular_values
+
+    def update(self, documents, block_size=256):
+        """Adds the given documents to the corpus and updates the decomposition without recomputing it, by Brand's
+        incremental method, one block of documents at a time; the documents are also appended to the term-document
+        matrix, so it keeps matching the document vectors (e.g. once saved).
+        The vocabulary and the inverse document frequencies of the corpus stay frozen: words outside of the vocabulary
+        are ignored and the document frequencies are not updated with the new documents.
+        The number of topics is kept if a rank was given, otherwise the decomposition stays complete."""
+        for start in range(0, len(documents), block_size):
+            columns = self.term_document_matrix.add_documents(documents[start:start + block_size]).T.tocsr()
+            rank = self.rank
+            if rank is None:
+                rank = min(len(self.singular_values) + columns.shape[1], len(self.vocabulary))
+            word_vectors, self.singular_values, document_vectors = LatentSemanticAnalysis.get_updated_svd(
+                self.word_vectors, self.singular_values, self.document_vectors, columns, rank)
+            self.word_vectors, self.document_vectors = LatentSemanticAnalysis.get_signed_vectors(word_vectors,
+                                                                                                 document_vectors)
+        self.documents = self.documents + documents
+
+    @staticmethod
+    def get_updated_svd(left_vectors, singular_values, right_vectors, columns, rank):
+        """Returns the first rank left singular vectors (as columns), singular values and right singular vectors
+        (as rows) of the matrix whose decomposition is given, with the given (sparse) columns appended.
+
+        The columns are split into their projection on the left singular vectors and a residual, whose orthonormal
+        basis extends them; the decomposition of the small matrix made of the singular values, the projections and
+        the triangular factor of the residual then rotates the extended bases (Brand's method).
+        The residual basis has at most as many columns as there are words, so the small matrix is not square
+        when more columns than words are appended."""
+        size = len(singular_values)
+        number_of_columns = columns.shape[1]
+        projections = numpy.asarray(columns.T @ left_vectors).T
+        basis, triangle = qr(columns.toarray() - left_vectors @ projections)
+        middle = numpy.zeros((size + basis.shape[1], size + number_of_columns))
+        middle[0:size, 0:size] = numpy.diag(singular_values)
+        middle[0:size, size:] = projections
+        middle[size:size + basis.shape[1], size:] = triangle
+        middle_left_vectors, singular_values, middle_right_vectors = svd(middle, full_matrices=False)
+        left_vectors = numpy.hstack((left_vectors, basis)) @ middle_left_vectors[:, 0:rank]
+        right_vectors = numpy.hstack((middle_right_vectors[0:rank, 0:size] @ right_vectors,
+                                      middle_right_vectors[0:rank, size:]))
+        return left_vectors, singular_values[0:rank], right_vectors
+
+    @staticmethod
+    def get_lanczos_svd(matrix, rank, seed=42):
+        """Returns the first rank left singular vectors (as columns), singular values and right singular vectors
+        (as rows) of the given sparse matrix, computed by the Lanczos method (rank must be lower than both sizes)."""
+        start = numpy.random.default_rng(seed).uniform(-1, 1, min(matrix.shape))
+        left_vectors, singular_values, right_vectors = svds(matrix, k=rank, v0=start)
+        order = numpy.argsort(-singular_values, kind="stable")
+        return left_vectors[:, order], singular_values[order], right_vectors[order]
+
+    @staticmethod
+    def get_randomized_svd(matrix, rank, power_iterations=4, oversampling=None, seed=42):
+        """Returns the first rank left singular vectors (as columns), singular values and right singular vectors
+        (as rows) of the given sparse matrix, computed with a randomized range finder and power iterations;
+        only products of the sparse matrix with dense matrices of rank + oversampling columns are needed."""
+        if oversampling is None:
+            oversampling = rank
+        rank = min(rank, min(matrix.shape))
+        size = min(rank + oversampling, min(matrix.shape))
+        random_matrix = numpy.random.default_rng(seed).standard_normal((matrix.shape[1], size))
+        basis, _ = qr(matrix @ random_matrix)
+        for i in range(0, power_iterations):
+            basis, _ = qr(matrix.T @ basis)
+            basis, _ = qr(matrix @ basis)
+        projected_vectors, singular_values, right_vectors = svd((matrix.T @ basis).T, full_matrices=False)
+        left_vectors = basis @ projected_vectors
+        return left_vectors[:, 0:rank], singular_values[0:rank], right_vectors[0:rank]
+
+    @staticmethod
+    def get_signed_vectors(word_vectors, document_vectors):
+        """Returns the given singular vectors with the signs of each pair flipped, if needed,
+        so that the weight of the largest magnitude in each word vector (column) is positive."""
+        largest = numpy.argmax(numpy.abs(word_vectors), axis=0)
+        signs = numpy.sign(word_vectors[largest, numpy.arange(word_vectors.shape[1])])
+        signs[signs == 0] = 1
+        return word_vectors * signs, document_vectors * signs[:, numpy.newaxis]
 
     def get_keywords_for_topic(self, topic_number, n=10):
         """Returns a list containing the n words mostly associated to the topic at the given index."""
-        pairs = []
-        for i in range(0, len(self.vocabulary)):
-            pairs.append((self.vocabulary[i], self.word_vectors[i][topic_number]))
-        pairs.sort(key=lambda t: t[1], reverse=True)
         keywords = []
-        pairs = pairs[0:n]
-        for pair in pairs:
-            keywords.append(pair[0])
+        for i in numpy.argsort(-self.word_vectors[:, topic_number], kind="stable")[0:n].tolist():
+            keywords.append(self.vocabulary[i])
         return keywords
 
     def get_keywords_for_topics(self, number_of_topics, n):
@@ -40,13 +176,13 @@ class LatentSemanticAnalysis:
 # lsa.py <dataset> <number_of_topics> <number_of_keywords>
 
 if __name__ == '__main__':
-    arguments = sys.argv
-    format = "latent_semantic_analysis.py <dataset> <number of topics> <number of keywords>"
+    arguments = [argument for argument in sys.argv if argument != "--cache"]
+    format = "latent_semantic_analysis.py <dataset> <number of topics> <number of keywords> [--cache]"
     if len(arguments) == 4:
         dataset_name = arguments[1]
         topics_number = arguments[2]
         keywords_number = arguments[3]
-        dataset = Dataset.get_dataset(dataset_name)
+        dataset = Dataset.get_dataset(dataset_name, cache="--cache" in sys.argv)
         if dataset is not None:
             try:
                 topics_number = int(topics_number)
@@ -54,7 +190,8 @@ if __name__ == '__main__':
             except:
                 print("Invalid number format for number of topics and / or keywords; provide an integer.")
                 print("  > " + format)
-            lsa = LatentSemanticAnalysis(dataset.documents)
+                exit()
+            lsa = LatentSemanticAnalysis(dataset.documents, rank=topics_number)
             keywords = lsa.get_keywords_for_topics(topics_number, keywords_number)
             for i in range(0, len(keywords)):
                 print("Topic " + str(i + 1))
@@ -0,0 +1,139 @@
+from json import loads, dumps
+from os import makedirs, replace
+from os.path import exists, join
+from shutil import rmtree
+from scipy.sparse import csr_matrix
+import numpy
+import sys
+
+
+class ModelFile:
+
+    """A versioned format to save trained models to disk, so they can be loaded without training them again.
+
+    A model is saved to a folder holding a small JSON header (header.json), with the format name and version,
+    the type of the model, its parameters and the names of its arrays, and one NumPy file (.npy) per array;
+    the arrays are loaded as read-only memory maps by default, so loading is fast and several processes loading the
+    same model share the same pages. Sparse matrices are stored as the arrays of their CSR representation."""
+
+    format = "nlp-model"
+    version = 1
+
+    @staticmethod
+    def save(path, model, header, arrays):
+        """Saves the given header (a dictionary of JSON values) and arrays (a dictionary (name, array)) of a model
+        of the given type to a folder at the given path, replacing the previous one (if any); the folder is written
+        under a temporary name first, so a partially written model is never loaded."""
+        temporary = path + ".tmp"
+        if exists(temporary):
+            rmtree(temporary)
+        makedirs(temporary)
+        for name in arrays:
+            numpy.save(join(temporary, name + ".npy"), arrays[name])
+        content = {"format": ModelFile.format, "version": ModelFile.version, "model": model,
+                   "arrays": list(arrays.keys()), "header": header}
+        with open(join(temporary, "header.json"), "w", encoding="utf-8") as file:
+            file.write(dumps(content))
+        if exists(path):
+            rmtree(path)
+        replace(temporary, path)
+
+    @staticmethod
+    def load(path, model, mmap_mode="r"):
+        """Returns the header and the arrays (as a dictionary (name, array)) of the model of the given type saved to
+        the folder at the given path; the arrays are loaded with the given memory map mode (None to read them).
+        A ValueError is raised if the folder holds another type of model or a version that is not supported."""
+        with open(join(path, "header.json"), encoding="utf-8") as file:
+            content = loads(file.read())
+        if content.get("format") != ModelFile.format or content.get("model") != model:
+            raise ValueError("The model at " + path + " is not a saved " + model + " model.")
+        if content["version"] > ModelFile.version:
+            raise ValueError("The model at " + path + " has version " + str(content["version"]) +
+                             ", only versions up to " + str(ModelFile.version) + " are supported.")
+        arrays = {}
+        for name in content["arrays"]:
+            arrays[name] = numpy.load(join(path, name + ".npy"), mmap_mode=mmap_mode)
+        return content["header"], arrays
+
+    @staticmethod
+    def get_model(path):
+        """Returns the type of the model saved to the folder at the given path (e.g. "NaiveBayes"),
+        or None if the folder does not hold a saved model."""
+        if not exists(join(path, "header.json")):
+            return None
+        with open(join(path, "header.json"), encoding="utf-8") as file:
+            content = loads(file.read())
+        if content.get("format") != ModelFile.format:
+            return None
+        return content.get("model")
+
+    @staticmethod
+    def get_sparse_arrays(name, matrix):
+        """Returns a dictionary (name, array) with the arrays of the given sparse (CSR) matrix, named after it."""
+        return {name + "_data": matrix.data, name + "_indices": matrix.indices, name + "_indptr": matrix.indptr,
+                name + "_shape": numpy.array(matrix.shape, dtype=numpy.int64)}
+
+    @staticmethod
+    def get_sparse_matrix(arrays, name):
+        """Returns the sparse (CSR) matrix with the given name from the given arrays, without copying them."""
+        shape = tuple(arrays[name + "_shape"].tolist())
+        return csr_matrix((arrays[name + "_data"], arrays[name + "_indices"], arrays[name + "_indptr"]), shape=shape,
+                          copy=False)
+
+    @staticmethod
+    def get_hasher_header(hasher):
+        """Returns the header of the given feature hasher (None if there is none)."""
+        if hasher is None:
+            return None
+        return {"bits": hasher.bits, "signed": hasher.signed}
+
+    @staticmethod
+    def get_document_options(header):
+        """Returns the options of the documents of a model (see Tokenizer.get_options) from its header;
+        the default options for a model saved before they were stored."""
+        if header.get("document_options") is None:
+            return {"preserve_duplicates": False, "remove_stopwords": False, "ngrams": None}
+        return header["document_options"]
+
+
+# model_file.py <dataset> <model> <path> [<neighbours> | <topics>]
+
+if __name__ == '__main__':
+    from nlp.dataset import Dataset
+    from nlp.naive_bayes import NaiveBayes
+    from nlp.knn import KNN
+    from nlp.id3 import ID3
+    from nlp.latent_semantic_analysis import LatentSemanticAnalysis
+    arguments = [argument for argument in sys.argv if argument != "--cache"]
+    format = "model_file.py <dataset> <model> <path> [<neighbours> | <topics>] [--cache]"
+    if len(arguments) in [4, 5]:
+        dataset = Dataset.get_dataset(arguments[1], cache="--cache" in sys.argv)
+        if dataset is not None:
+            number = None
+            if len(arguments) == 5:
+                try:
+                    number = int(arguments[4])
+                except:
+                    print("Invalid number format for neighbours or topics; provide an integer.")
+                    print("  > " + format)
+                    exit()
+            if arguments[2] == "naive_bayes":
+                model = NaiveBayes(dataset.documents)
+            elif arguments[2] == "knn":
+                model = KNN(dataset.documents, 5 if number is None else number)
+            elif arguments[2] == "id3":
+                model = ID3(dataset.documents)
+            elif arguments[2] == "lsa":
+                model = LatentSemanticAnalysis(dataset.documents, rank=number)
+            else:
+                print("Invalid model name (should be \"naive_bayes\", \"knn\", \"id3\" or \"lsa\").")
+                print("  > " + format)
+                exit()
+            model.save(arguments[3])
+            print("Saved the model to " + arguments[3] + ".")
+        else:
+            print("Invalid dataset name.")
+            print("  > " + format)
+    else:
+        print("Invalid number of arguments.")
+        print("  > " + format)
@@ -1,7 +1,11 @@
 from math import log
 from nlp.classifier import Classifier
+from scipy.sparse import csr_matrix
+import numpy
 import sys
 from nlp.dataset import Dataset
+from nlp.feature_hasher import FeatureHasher
+from nlp.model_file import ModelFile
 
 
 class NaiveBayes(Classifier):
@@ -9,22 +13,132 @@ class NaiveBayes(Classifier):
     """A Naive Bayes classifier;
     given the documents for training, it generates lists and dictionaries for probability estimation."""
 
-    def __init__(self, documents, k=1):
+    def __init__(self, documents, k=1, hasher=None, vocabulary=None):
         """It initializes the classifier given the documents for training and computes the priors;
         it generates the vocabulary, the vocabularies and word counts for each class.
-        An optional constant is used for (Laplace) additive smoothing."""
+        An optional constant is used for (Laplace) additive smoothing.
+
+        The counts are then turned into lookup tables aligned to the word ids (the positions of the words
+        in the vocabulary) and to the classes: the (log) priors, a (classes x vocabulary) table of (log) likelihoods
+        and the (log) likelihoods of a word never seen in training, for each class.
+        More documents can be added later on with partial_fit, or the counts of another classifier with merge.
+
+        If a feature hasher is given, the words of the documents are replaced by their features, so the vocabularies
+        are bounded by the number of features (classifiers to be merged must use the same hasher).
+        If a vocabulary is given (e.g. the words kept by a FeatureSelector), the other words are ignored,
+        both in training and when predicting."""
         Classifier.__init__(self, documents)
+        self.hasher = hasher
+        self.selected_words = None if vocabulary is None else set(vocabulary)
         self.vocabulary = self.get_vocabulary(documents)
         self.class_vocabularies = self.get_class_vocabularies(documents)
         self.class_word_counts = self.get_class_word_counts(self.class_vocabularies)
-        self.priors = self.get_priors()
+        self.class_document_counts = self.get_class_document_counts(documents)
         self.k = k
+        self.update_tables()
+
+    def partial_fit(self, documents):
+        """Updates the counts, the priors and the tables with the given documents, without processing again the
+        documents seen so far; the documents attribute keeps holding only the documents given at initialization."""
+        self.add_counts(self.get_vocabulary(documents), self.get_class_vocabularies(documents),
+                        self.get_class_document_counts(documents))
+        self.update_tables()
+
+    def merge(self, other):
+        """Updates the counts, the priors and the tables with the counts of the given classifier, trained
+        independently (e.g. on another shard of the documents); the smoothing constant of this classifier is kept."""
+        self.add_counts(other.vocabulary, other.class_vocabularies, other.class_document_counts)
+        self.update_tables()
+
+    def add_counts(self, vocabulary, class_vocabularies, class_document_counts):
+        """Adds the given vocabulary, class vocabularies and document counts for each class to the ones of the
+        classifier; new classes are appended to the list of classes."""
+        for word in vocabulary:
+            self.vocabulary[word] = self.vocabulary.get(word, 0) + vocabulary[word]
+        for c in class_vocabularies:
+            if c not in self.class_vocabularies:
+                self.class_vocabularies[c] = {}
+            class_vocabulary = self.class_vocabularies[c]
+            for word in class_vocabularies[c]:
+                class_vocabulary[word] = class_vocabulary.get(word, 0) + class_vocabularies[c][word]
+        for c in class_document_counts:
+            if c not in self.classes:
+                self.classes.append(c)
+            self.class_document_counts[c] = self.class_document_counts.get(c, 0) + class_document_counts[c]
+        self.class_word_counts = self.get_class_word_counts(self.class_vocabularies)
+
+    def save(self, path):
+        """Saves the classifier to a folder at the given path (see ModelFile): its parameters, the words
+        (or features) in the order of their ids, the table of the word counts for each class, the document counts
+        and the lookup tables."""
+        counts = numpy.zeros((len(self.classes), len(self.word_ids)), dtype=numpy.int64)
+        for i in range(0, len(self.classes)):
+            class_vocabulary = self.class_vocabularies.get(self.classes[i], {})
+            counts[i, [self.word_ids[word] for word in class_vocabulary]] = list(class_vocabulary.values())
+        header = {"classes": self.classes, "k": self.k, "hasher": ModelFile.get_hasher_header(self.hasher),
+                  "document_options": self.document_options}
+        arrays = {"words": numpy.array(list(self.word_ids.keys()), dtype=str if self.hasher is None else numpy.int64),
+                  "counts": counts,
+                  "class_document_counts": numpy.array([self.class_document_counts[c] for c in self.classes]),
+                  "log_priors": self.log_priors, "log_likelihoods": self.log_likelihoods,
+                  "unknown_log_likelihoods": self.unknown_log_likelihoods}
+        if self.selected_words is not None:
+            arrays["selected_words"] = numpy.array(list(self.selected_words), dtype=str)
+        ModelFile.save(path, "NaiveBayes", header, arrays)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Returns the classifier saved to the folder at the given path, with its lookup tables loaded with the given
+        memory map mode; it can be trained further with partial_fit or merge, but holds no training documents."""
+        header, arrays = ModelFile.load(path, "NaiveBayes", mmap_mode=mmap_mode)
+        naive_bayes = NaiveBayes.__new__(NaiveBayes)
+        naive_bayes.documents = []
+        naive_bayes.classes = header["classes"]
+        naive_bayes.k = header["k"]
+        naive_bayes.document_options = ModelFile.get_document_options(header)
+        naive_bayes.hasher = None if header["hasher"] is None else FeatureHasher(**header["hasher"])
+        naive_bayes.selected_words = None
+        if "selected_words" in arrays:
+            naive_bayes.selected_words = set(arrays["selected_words"].tolist())
+        words = arrays["words"].tolist()
+        counts = arrays["counts"]
+        naive_bayes.vocabulary = dict(zip(words, counts.sum(axis=0).tolist()))
+        naive_bayes.class_vocabularies = {}
+        for i in range(0, len(naive_bayes.classes)):
+            ids = numpy.flatnonzero(counts[i])
+            naive_bayes.class_vocabularies[naive_bayes.classes[i]] = dict(zip([words[j] for j in ids.tolist()],
+                                                                              counts[i, ids].tolist()))
+        naive_bayes.class_word_counts = naive_bayes.get_class_word_counts(naive_bayes.class_vocabularies)
+        naive_bayes.class_document_counts = dict(zip(naive_bayes.classes, arrays["class_document_counts"].tolist()))
+        naive_bayes.priors = naive_bayes.get_priors()
+        naive_bayes.word_ids = naive_bayes.get_word_ids()
+        naive_bayes.log_priors = arrays["log_priors"]
+        naive_bayes.log_likelihoods = arrays["log_likelihoods"]
+        naive_bayes.unknown_log_likelihoods = arrays["unknown_log_likelihoods"]
+        return naive_bayes
+
+    def update_tables(self):
+        """Computes the priors, the word ids and the lookup tables from the current counts."""
+        self.priors = self.get_priors()
+        self.word_ids = self.get_word_ids()
+        self.log_priors = numpy.array([self.priors[c] for c in self.classes])
+        self.log_likelihoods, self.unknown_log_likelihoods = self.get_log_likelihoods()
+
+    def get_words(self, document):
+        """Returns the words of the given document (only the selected ones, if a vocabulary was given),
+        or their features if the words are hashed."""
+        words = document.bag_of_words
+        if self.selected_words is not None:
+            words = [word for word in words if word in self.selected_words]
+        if self.hasher is None:
+            return words
+        return self.hasher.get_features(words)
 
     def get_vocabulary(self, documents):
         """Returns a dictionary containing the words found (uniquely) in the documents and the number of occurrences."""
         vocabulary = {}
         for document in documents:
-            for word in document.bag_of_words:
+            for word in self.get_words(document):
                 if word not in vocabulary:
                     vocabulary[word] = 0
                 vocabulary[word] += 1
@@ -37,7 +151,7 @@ class NaiveBayes(Classifier):
             c = document.c
             if c not in class_vocabularies:
                 class_vocabularies[c] = {}
-            for word in document.bag_of_words:
+            for word in self.get_words(document):
                 if word not in class_vocabularies[c]:
                     class_vocabularies[c][word] = 0
                 class_vocabularies[c][word] += 1
@@ -55,85 +169,104 @@ class NaiveBayes(Classifier):
     def get_priors(self):
         """Returns a dictionary for each class containing the (log) prior probability (e.g. P(c));
         calculated as the ratio of documents for a class and the total number of documents."""
+        total = 0
+        for c in self.class_document_counts:
+            total += self.class_document_counts[c]
         priors = {}
         for c in self.classes:
-            count = 0
-            total = 0
-            for document in self.documents:
-                k = 1
-                if document.c == c:
-                    count += k
-                total += k
-            priors[c] = log(count / total)
+            priors[c] = log(self.class_document_counts[c] / total)
         return priors
 
+    def get_class_document_counts(self, documents):
+        """Returns a dictionary for each class containing the number of documents of that class."""
+        class_document_counts = {}
+        for document in documents:
+            if document.c not in class_document_counts:
+                class_document_counts[document.c] = 0
+            class_document_counts[document.c] += 1
+        return class_document_counts
+
+    def get_word_ids(self):
+        """Returns a dictionary (word, id) where the id is the position of the word in the vocabulary."""
+        word_ids = {}
+        for word in self.vocabulary:
+            word_ids[word] = len(word_ids)
+        return word_ids
+
+    def get_log_likelihoods(self):
+        """Returns the (classes x vocabulary) table of the (log) likelihoods of each word for each class
+        and the array of the (log) likelihoods of an unknown word for each class;
+        the nth row is for the nth class in the list of classes, the nth column for the word with id n."""
+        counts = numpy.zeros((len(self.classes), len(self.word_ids)))
+        for i in range(0, len(self.classes)):
+            class_vocabulary = self.class_vocabularies[self.classes[i]]
+            ids = [self.word_ids[word] for word in class_vocabulary]
+            counts[i, ids] = list(class_vocabulary.values())
+        return NaiveBayes.get_log_likelihoods_from_counts(counts, self.k)
+
+    @staticmethod
+    def get_log_likelihoods_from_counts(counts, k):
+        """Returns the table of the (log) likelihoods and the array of the (log) likelihoods of an unknown word
+        given the (classes x vocabulary) table of the word counts for each class and the smoothing constant."""
+        totals = counts.sum(axis=1) + counts.shape[1] * k
+        log_likelihoods = numpy.log((counts + k) / totals[:, None])
+        unknown_log_likelihoods = numpy.log(k / totals)
+        return log_likelihoods, unknown_log_likelihoods
+
     def get_likelihood(self, word, c):
         """Returns the (log) likelihood of the given word belonging to the given class (e.g. P(word | class));
         calculated as (count(word, c) + k) / (sum_(for each word in vocabulary) count(word, c) + k)"""
-        count = self.k
-        if word in self.class_vocabularies[c]:
-            count += self.class_vocabularies[c][word]
-        total = self.class_word_counts[c] + len(self.vocabulary) * self.k
-        result = log(count / total)
-        return result
+        i = self.classes.index(c)
+        if self.hasher is not None:
+            word = self.hasher.get_features([word])[0]
+        if word in self.word_ids:
+            return float(self.log_likelihoods[i, self.word_ids[word]])
+        else:
+            return float(self.unknown_log_likelihoods[i])
 
     def get_prediction(self, testing_document):
         """Returns the predicted class for the given document;
-        calculated as class that maximises the posterior probability (e.g. P(class | word))."""
-        best_class = None
-        best_class_posterior = None
-        for c in self.classes:
-            prior = self.priors[c]
-            likelihood = 0
-            for word in testing_document.bag_of_words:
-                word_likelihood = self.get_likelihood(word, c)
-                likelihood += word_likelihood
-            if best_class is None or prior + likelihood > best_class_posterior:
-                best_class_posterior = prior + likelihood
-                best_class = c
-        return best_class
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        calculated as class that maximises the posterior probability (e.g. P(class | word)).
+        The likelihoods of the known words are gathered from the table by id and summed for every class at once."""
+        ids = []
+        unknown = 0
+        for word in self.get_words(testing_document):
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                unknown += 1
+            else:
+                ids.append(word_id)
+        posteriors = self.log_priors + self.log_likelihoods[:, ids].sum(axis=1) + unknown * self.unknown_log_likelihoods
+        return self.classes[int(numpy.argmax(posteriors))]
+
+    def predict_batch(self, documents):
+        """Returns the list of predicted classes for the given documents;
+        the posteriors are computed at once as the product of the documents' word count matrix and the table."""
+        counts, unknown = self.get_count_matrix(documents)
+        posteriors = counts @ self.log_likelihoods.T
+        posteriors += numpy.outer(unknown, self.unknown_log_likelihoods) + self.log_priors
+        predictions = []
+        for i in numpy.argmax(posteriors, axis=1).tolist():
+            predictions.append(self.classes[i])
+        return predictions
+
+    def get_count_matrix(self, documents):
+        """Returns a sparse (CSR) matrix of size len(documents) x len(vocabulary) with the counts of the known words
+        in each of the given documents, along with the array of the counts of the unknown words."""
+        indptr = [0]
+        indices = []
+        unknown = []
+        for document in documents:
+            count = 0
+            for word in self.get_words(document):
+                word_id = self.word_ids.get(word)
+                if word_id is None:
+                    count += 1
+                else:
+                    indices.append(word_id)
+            indptr.append(len(indices))
+            unknown.append(count)
+        counts = csr_matrix((numpy.ones(len(indices)), numpy.array(indices, dtype=numpy.int32),
+                             numpy.array(indptr, dtype=numpy.int64)), shape=(len(documents), len(self.word_ids)))
+        counts.sum_duplicates()
+        return counts, numpy.array(unknown, dtype=numpy.float64)
@@ -0,0 +1,267 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+import sys
+import numpy
+from nlp.dataset import Dataset
+from nlp.term_document_matrix import TermDocumentMatrix
+
+
+class NeighbourSearch(ABC):
+
+    """An abstract class to find the most similar training vectors (rows of a sparse matrix) to query vectors;
+    both the training and the query vectors are expected to be normalised to unit length,
+    so the cosine similarity is the dot product."""
+
+    def __init__(self, matrix):
+        """Initializes the search structure given the (normalised) training matrix, one row per document."""
+        self.matrix = matrix
+
+    @abstractmethod
+    def search(self, query_matrix, k):
+        """(Abstract) Returns a list containing, for each row of the query matrix, the array of indices
+        of the k most similar training vectors and the array of their similarities."""
+        return None
+
+    @staticmethod
+    def get_neighbour_search(name, matrix, options=None):
+        """Returns the neighbour search matching the name provided (if any, otherwise None),
+        built with the given options as a dictionary of keyword arguments."""
+        if options is None:
+            options = {}
+        if name == "exact":
+            return ExactSearch(matrix, **options)
+        elif name == "lsh":
+            return LSHSearch(matrix, **options)
+        else:
+            return None
+
+    @staticmethod
+    def get_normalised_matrix(matrix):
+        """Returns a copy of the given sparse (CSR) matrix with every non-zero row scaled to unit length."""
+        normalised = matrix.astype(numpy.float64)
+        magnitudes = numpy.sqrt(numpy.asarray(normalised.multiply(normalised).sum(axis=1)).ravel())
+        magnitudes[magnitudes == 0] = 1
+        normalised.data /= numpy.repeat(magnitudes, numpy.diff(normalised.indptr))
+        return normalised
+
+    @staticmethod
+    def get_top_indices(similarities, k):
+        """Returns the indices of the k highest values in the given array, sorted by decreasing value;
+        ties are broken by the lowest index as a stable sort of every value would do."""
+        n = len(similarities)
+        if k >= n:
+            return numpy.argsort(-similarities, kind="stable")
+        threshold = similarities[numpy.argpartition(similarities, n - k)[n - k]]
+        above = numpy.flatnonzero(similarities > threshold)
+        tied = numpy.flatnonzero(similarities == threshold)[0:k - len(above)]
+        indices = numpy.concatenate((above, tied))
+        return indices[numpy.argsort(-similarities[indices], kind="stable")]
+
+    @staticmethod
+    def get_top_candidates(candidates, similarities, k, n):
+        """Returns the indices and similarities of the k most similar documents out of n given the (sorted) indices
+        of the candidate documents and their similarities, every other document having a similarity of zero.
+
+        The result is the same as ranking all n documents; when at least k candidates have a positive similarity
+        only those are ranked, otherwise the documents with zero (or negative) similarity are needed as well."""
+        positive = similarities > 0
+        if numpy.count_nonzero(positive) >= k:
+            candidates = candidates[positive]
+            similarities = similarities[positive]
+            top = NeighbourSearch.get_top_indices(similarities, k)
+            return candidates[top], similarities[top]
+        all_similarities = numpy.zeros(n)
+        all_similarities[candidates] = similarities
+        top = NeighbourSearch.get_top_indices(all_similarities, k)
+        return top, all_similarities[top]
+
+    @staticmethod
+    def get_benchmark(documents, k, name, options=None, split=0.8):
+        """Returns the recall@k of the given neighbour search (with respect to the exact search) and the number of
+        queries per second of both searches, using a balanced split of the documents into training and queries."""
+        training, testing = Dataset.get_split_documents(documents, split)
+        term_document_matrix = TermDocumentMatrix(training)
+        matrix = NeighbourSearch.get_normalised_matrix(term_document_matrix.matrix)
+        query_matrix = NeighbourSearch.get_normalised_matrix(term_document_matrix.get_document_matrix(testing))
+        exact_search = ExactSearch(matrix)
+        neighbour_search = NeighbourSearch.get_neighbour_search(name, matrix, options)
+        start = datetime.now()
+        exact_results = exact_search.search(query_matrix, k)
+        exact_seconds = (datetime.now() - start).total_seconds()
+        start = datetime.now()
+        results = neighbour_search.search(query_matrix, k)
+        seconds = (datetime.now() - start).total_seconds()
+        found = 0
+        for i in range(0, len(results)):
+            found += len(set(results[i][0].tolist()) & set(exact_results[i][0].tolist()))
+        recall = found / (len(results) * min(k, len(training)))
+        return recall, len(testing) / max(exact_seconds, 1e-9), len(testing) / max(seconds, 1e-9)
+
+
+class ExactSearch(NeighbourSearch):
+
+    """An exact neighbour search over an inverted index: the nth row of the index holds the postings list
+    of the nth word, that is the training documents containing it along with their weights."""
+
+    def __init__(self, matrix):
+        """Initializes the search given the (normalised) training matrix and builds the inverted index."""
+        NeighbourSearch.__init__(self, matrix)
+        self.inverted_index = matrix.T.tocsr()
+
+    def search(self, query_matrix, k):
+        """Returns the k most similar training vectors for each query vector; the similarities are accumulated
+        term by term from the postings lists of the query words in a single sparse matrix product, so only
+        the training documents sharing at least a word with a query (the candidates) are ever scored."""
+        results = []
+        similarities = query_matrix @ self.inverted_index
+        similarities.sort_indices()
+        for i in range(0, similarities.shape[0]):
+            begin, end = similarities.indptr[i], similarities.indptr[i + 1]
+            results.append(NeighbourSearch.get_top_candidates(similarities.indices[begin:end],
+                                                              similarities.data[begin:end], k, self.matrix.shape[0]))
+        return results
+
+
+class LSHSearch(NeighbourSearch):
+
+    """An approximate neighbour search based on locality-sensitive hashing with signed random projections;
+    each of the hash tables maps a vector to the signs of its projections on a number of random hyperplanes,
+    so that vectors with a small angle between them are likely to share a bucket.
+
+    More tables and probing the buckets whose hash differs by one bit increase the recall,
+    more bits per hash reduce the size of the buckets (hence the latency)."""
+
+    def __init__(self, matrix, bits=6, tables=16, multiprobe=True, seed=42, block_size=256):
+        """Initializes the search given the (normalised) training matrix, the number of bits per hash,
+        the number of hash tables, whether to also probe the buckets at one bit of distance,
+        the seed for the random hyperplanes and the number of queries whose candidates are scored at once;
+        it hashes every training vector."""
+        NeighbourSearch.__init__(self, matrix)
+        self.bits = bits
+        self.tables = tables
+        self.probes = [0]
+        if multiprobe:
+            for bit in range(0, bits):
+                self.probes.append(1 << bit)
+        self.exact_search = None
+        self.seed = seed
+        self.block_size = block_size
+        self.buckets = self.get_buckets(self.get_hashes(matrix))
+
+    def get_hashes(self, matrix, feature_block_size=4096):
+        """Returns an array of size (rows, tables) containing the hash of each row of the matrix for each table.
+
+        The hyperplanes are never stored: the projections of the rows are accumulated over blocks of the columns
+        (features) occurring in the matrix, with the hyperplane weights of each block generated from the seed,
+        so the memory used depends on the block size rather than on the number of features."""
+        csc_matrix = matrix.tocsc()
+        columns = numpy.flatnonzero(numpy.diff(csc_matrix.indptr))
+        projections = numpy.zeros((matrix.shape[0], self.tables * self.bits))
+        for start in range(0, len(columns), feature_block_size):
+            block = columns[start:start + feature_block_size]
+            projections += csc_matrix[:, block] @ LSHSearch.get_hyperplanes(block, self.tables * self.bits, self.seed)
+        signs = (projections > 0).reshape(matrix.shape[0], self.tables, self.bits)
+        return signs @ (1 << numpy.arange(self.bits, dtype=numpy.int64))
+
+    @staticmethod
+    def get_hyperplanes(features, size, seed):
+        """Returns an array of size len(features) x size with the weights (+1 or -1) of the given features in each of
+        the hyperplanes; each weight is derived from a (SplitMix64) hash of the seed, the feature and the hyperplane,
+        so the weights of any feature can be generated on demand (signed random projections with
+        Rademacher rather than Gaussian weights preserve the angles just as well)."""
+        keys = features.astype(numpy.uint64)[:, numpy.newaxis] * numpy.uint64(size)
+        keys = keys + numpy.arange(size, dtype=numpy.uint64)[numpy.newaxis, :]
+        keys ^= numpy.uint64((seed * 0xD1B54A32D192ED03) & 0xFFFFFFFFFFFFFFFF)
+        keys += numpy.uint64(0x9E3779B97F4A7C15)
+        keys = (keys ^ (keys >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+        keys = (keys ^ (keys >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+        keys ^= keys >> numpy.uint64(31)
+        return numpy.where(keys >> numpy.uint64(63), -1.0, 1.0)
+
+    def get_buckets(self, hashes):
+        """Returns a list containing, for each table, a dictionary (hash, array of the indices of the rows)."""
+        buckets = []
+        for table in range(0, self.tables):
+            order = numpy.argsort(hashes[:, table], kind="stable")
+            keys, starts = numpy.unique(hashes[order, table], return_index=True)
+            buckets.append(dict(zip(keys.tolist(), numpy.split(order, starts[1:]))))
+        return buckets
+
+    def search(self, query_matrix, k):
+        """Returns the (approximately) k most similar training vectors for each query vector; only the training
+        vectors sharing a (probed) bucket with the query in at least one table are scored, one block of queries at
+        a time, unless fewer than k of them are found, in which case the query is answered by an exact search."""
+        results = []
+        for start in range(0, query_matrix.shape[0], self.block_size):
+            results.extend(self.search_block(query_matrix[start:start + self.block_size], k))
+        return results
+
+    def search_block(self, query_matrix, k):
+        """Returns the (approximately) k most similar training vectors for each query vector of the given block;
+        the candidates of all the queries are scored at once."""
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        hashes = self.get_hashes(query_matrix).tolist()
+        results = [None] * query_matrix.shape[0]
+        queries = []
+        candidates = []
+        unmatched = []
+        for i in range(0, query_matrix.shape[0]):
+            buckets = []
+            for table in range(0, self.tables):
+                for probe in self.probes:
+                    buckets.append(self.buckets[table].get(hashes[i][table] ^ probe, empty))
+            query_candidates = numpy.unique(numpy.concatenate(buckets))
+            if len(query_candidates) < k:
+                unmatched.append(i)
+            else:
+                queries.append(numpy.full(len(query_candidates), i))
+                candidates.append(query_candidates)
+        if len(candidates) != 0:
+            offsets = numpy.cumsum([0] + [len(query_candidates) for query_candidates in candidates])
+            queries = numpy.concatenate(queries)
+            candidates = numpy.concatenate(candidates)
+            rows = numpy.unique(candidates)
+            products = (self.matrix[rows] @ query_matrix.T).toarray()
+            similarities = products[numpy.searchsorted(rows, candidates), queries]
+            for j in range(0, len(offsets) - 1):
+                query_candidates = candidates[offsets[j]:offsets[j + 1]]
+                query_similarities = similarities[offsets[j]:offsets[j + 1]]
+                top = NeighbourSearch.get_top_indices(query_similarities, k)
+                results[queries[offsets[j]]] = (query_candidates[top], query_similarities[top])
+        if len(unmatched) != 0:
+            if self.exact_search is None:
+                self.exact_search = ExactSearch(self.matrix)
+            exact_results = self.exact_search.search(query_matrix[unmatched], k)
+            for j in range(0, len(unmatched)):
+                results[unmatched[j]] = exact_results[j]
+        return results
+
+
+# neighbour_search.py <dataset> <neighbours> [<bits> <tables>]
+
+if __name__ == '__main__':
+    arguments = sys.argv
+    format = "neighbour_search.py <dataset> <neighbours> [<bits> <tables>]"
+    if len(arguments) in [3, 5]:
+        try:
+            k = int(arguments[2])
+            options = {}
+            if len(arguments) == 5:
+                options = {"bits": int(arguments[3]), "tables": int(arguments[4])}
+        except:
+            print("Invalid number format for neighbours, bits or tables; provide an integer.")
+            print("  > " + format)
+            exit()
+        dataset = Dataset.get_dataset(arguments[1])
+        if dataset is not None:
+            recall, exact_queries_per_second, queries_per_second = NeighbourSearch.get_benchmark(dataset.documents, k,
+                                                                                                  "lsh", options)
+            print("Exact search: " + str(round(exact_queries_per_second, 2)) + " queries/s")
+            print("LSH search: " + str(round(queries_per_second, 2)) + " queries/s")
+            print("Recall@" + str(k) + " is " + str(round(100 * recall, 2)) + "%.")
+        else:
+            print("Invalid dataset name.")
+            print("  > " + format)
+    else:
+        print("Invalid number of arguments.")
+        print("  > " + format)
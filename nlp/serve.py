@@ -0,0 +1,240 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from json import loads, dumps
+from time import perf_counter
+import numpy
+import sys
+from nlp.document import Document, Tokenizer
+from nlp.model_file import ModelFile
+from nlp.naive_bayes import NaiveBayes
+from nlp.knn import KNN
+from nlp.id3 import ID3
+
+
+class PredictionService:
+
+    """A local HTTP service classifying texts with a trained classifier (NaiveBayes, KNN or ID3), built on asyncio.
+
+    The texts of the requests are tokenized as they arrive and queued; a single task collects the queued requests
+    into micro-batches, closed once they hold the maximum number of documents or once the first request of the batch
+    has waited for the maximum delay, and predicts each batch at once with predict_batch in a separate thread, so the
+    service keeps accepting requests meanwhile. The latencies of the most recent requests are kept for the stats.
+
+    Endpoints: POST /predict with a JSON body {"text": ...} or {"texts": [...]}, answered by {"classes": [...]},
+    and GET /stats, answered by the request, document and batch counters, the p50 and p99 latencies (in milliseconds)
+    and the throughput (in documents per second since the service started)."""
+
+    def __init__(self, classifier, maximum_batch_size=64, maximum_delay=0.005, preserve_duplicates=False,
+                 remove_stopwords=False, ngrams=None, window=10000):
+        """Initializes the service given the classifier, the maximum number of documents of a batch, the maximum
+        delay (in seconds) a request waits for the batch to fill, the options of the documents (which should be the
+        ones of the training documents) and the number of recent requests whose latencies are kept."""
+        self.classifier = classifier
+        self.maximum_batch_size = maximum_batch_size
+        self.maximum_delay = maximum_delay
+        self.tokenizer = Tokenizer.get_tokenizer(preserve_duplicates=preserve_duplicates,
+                                                 remove_stopwords=remove_stopwords, ngrams=ngrams)
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.documents = 0
+        self.batches = 0
+        self.start = perf_counter()
+        self.queue = None
+        self.batch_task = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def predict(self, texts):
+        """Returns the list of predicted classes for the given texts, once the batch holding them is predicted."""
+        start = perf_counter()
+        if self.batch_task is None:
+            self.queue = asyncio.Queue()
+            self.batch_task = asyncio.get_running_loop().create_task(self.run_batches())
+        documents = [Document(text, tokenizer=self.tokenizer, keep_text=False) for text in texts]
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((documents, future))
+        classes = await future
+        self.latencies.append(perf_counter() - start)
+        self.requests += 1
+        return classes
+
+    async def run_batches(self):
+        """Collects the queued requests into batches and predicts them, one batch at a time, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self.queue.get()]
+            size = len(requests[0][0])
+            deadline = loop.time() + self.maximum_delay
+            while size < self.maximum_batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    request = self.queue.get_nowait()
+                requests.append(request)
+                size += len(request[0])
+            documents = []
+            for request_documents, future in requests:
+                documents.extend(request_documents)
+            try:
+                predictions = await loop.run_in_executor(self.executor, self.classifier.predict_batch, documents)
+            except Exception as exception:
+                for request_documents, future in requests:
+                    if not future.done():
+                        future.set_exception(exception)
+                continue
+            offset = 0
+            for request_documents, future in requests:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(request_documents)])
+                offset += len(request_documents)
+            self.batches += 1
+            self.documents += len(documents)
+
+    def get_stats(self):
+        """Returns a dictionary with the number of requests, documents and batches served so far, the mean number
+        of documents per batch, the p50 and p99 latencies of the recent requests (in milliseconds)
+        and the throughput (in documents per second)."""
+        stats = {"requests": self.requests, "documents": self.documents, "batches": self.batches,
+                 "mean_batch_size": self.documents / self.batches if self.batches != 0 else 0.0,
+                 "p50_latency_ms": None, "p99_latency_ms": None,
+                 "throughput": self.documents / max(perf_counter() - self.start, 1e-9)}
+        if len(self.latencies) != 0:
+            p50, p99 = numpy.percentile(numpy.array(self.latencies), [50, 99]).tolist()
+            stats["p50_latency_ms"] = 1000 * p50
+            stats["p99_latency_ms"] = 1000 * p99
+        return stats
+
+    async def get_response(self, method, target, body):
+        """Returns the status code and the JSON content answering the request with the given method, target and body;
+        an error of the classifier is answered with a 500 status, so the connection is still answered."""
+        if target == "/stats" and method == "GET":
+            return 200, self.get_stats()
+        elif target == "/predict" and method == "POST":
+            try:
+                request = loads(body)
+                texts = request["texts"] if "texts" in request else [request["text"]]
+                if type(texts) is not list or any(type(text) is not str for text in texts):
+                    raise ValueError()
+            except:
+                return 400, {"error": "Invalid request; send {\"text\": <text>} or {\"texts\": [<text>, ...]}."}
+            try:
+                return 200, {"classes": await self.predict(texts)}
+            except Exception as exception:
+                return 500, {"error": "Prediction failed: " + type(exception).__name__ + "."}
+        else:
+            return 404, {"error": "Not found; use POST /predict or GET /stats."}
+
+    async def handle_connection(self, reader, writer):
+        """Answers the HTTP requests received on a connection until it is closed (connections are kept alive)."""
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in [b"\r\n", b"\n", b""]:
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    status, content = 400, {"error": "Invalid request line."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(headers.get("content-length", 0)))
+                    status, content = await self.get_response(parts[0], parts[1], body)
+                    keep_alive = parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                data = dumps(content).encode("utf-8")
+                writer.write(("HTTP/1.1 " + str(status) + " " + reasons[status] + "\r\n" +
+                              "Content-Type: application/json\r\n" +
+                              "Content-Length: " + str(len(data)) + "\r\n" +
+                              "Connection: " + ("keep-alive" if keep_alive else "close") + "\r\n\r\n").encode("latin-1"))
+                writer.write(data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000, socket=None):
+        """Serves requests on the given host and port, or on the Unix socket at the given path, until cancelled."""
+        if socket is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket)
+            print("Serving on " + socket + ".")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            print("Serving on http://" + host + ":" + str(port) + ".")
+        async with server:
+            await server.serve_forever()
+
+    @staticmethod
+    def get_classifier(path):
+        """Returns the classifier saved to the folder at the given path (if it is a NaiveBayes, KNN or ID3 model,
+        otherwise None); its document options, read from the header, are the ones the service should parse
+        the texts with (see get_service)."""
+        model = ModelFile.get_model(path)
+        if model == "NaiveBayes":
+            return NaiveBayes.load(path)
+        elif model == "KNN":
+            return KNN.load(path)
+        elif model == "ID3":
+            return ID3.load(path)
+        else:
+            return None
+
+    @staticmethod
+    def get_service(path, maximum_batch_size=64, maximum_delay=0.005):
+        """Returns the service for the classifier saved to the folder at the given path (None if there is none),
+        parsing the texts with the options of the documents the classifier was trained on."""
+        classifier = PredictionService.get_classifier(path)
+        if classifier is None:
+            return None
+        return PredictionService(classifier, maximum_batch_size=maximum_batch_size, maximum_delay=maximum_delay,
+                                 **classifier.document_options)
+
+
+# serve.py <model> [--host=<host>] [--port=<port>] [--socket=<path>] [--batch-size=<size>] [--delay=<milliseconds>]
+
+if __name__ == '__main__':
+    format = "serve.py <model> [--host=<host>] [--port=<port>] [--socket=<path>] [--batch-size=<size>] " \
+             "[--delay=<milliseconds>]"
+    arguments = []
+    options = {"host": "127.0.0.1", "port": "8000", "socket": None, "batch-size": "64", "delay": "5"}
+    for argument in sys.argv:
+        if argument.startswith("--") and argument[2:].partition("=")[0] in options:
+            name, _, value = argument[2:].partition("=")
+            options[name] = value
+        else:
+            arguments.append(argument)
+    if len(arguments) == 2:
+        try:
+            port = int(options["port"])
+            batch_size = int(options["batch-size"])
+            delay = float(options["delay"]) / 1000
+        except:
+            print("Invalid number format for port, batch size or delay; provide a number.")
+            print("  > " + format)
+            exit()
+        service = PredictionService.get_service(arguments[1], maximum_batch_size=batch_size, maximum_delay=delay)
+        if service is not None:
+            try:
+                asyncio.run(service.serve(host=options["host"], port=port, socket=options["socket"]))
+            except KeyboardInterrupt:
+                print(dumps(service.get_stats()))
+        else:
+            print("Invalid model; provide the folder of a saved NaiveBayes, KNN or ID3 model.")
+            print("  > " + format)
+    else:
+        print("Invalid number of arguments.")
+        print("  > " + format)
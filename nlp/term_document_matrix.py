@@ -1,73 +1,243 @@
 from math import log
+from os.path import exists
+from collections import Counter
+from scipy.sparse import csr_matrix, vstack
+import numpy
 from nlp.utilities import Process
+from nlp.feature_hasher import FeatureHasher
+from nlp.model_file import ModelFile
 
 
 class TermDocumentMatrix:
 
-    def __init__(self, documents, compute_word_vectors=True, compute_document_vectors=True, minimum_word_count=0, log=False):
+    def __init__(self, documents, compute_word_vectors=True, compute_document_vectors=True, minimum_word_count=0, log=False,
+                 document_frequency_table=None, hasher=None, vocabulary=None):
         """Initialises a term-document matrix object with tf-idf weights for the given documents.
 
-        A vocabulary is always generated with the words appearing more than minimum_word_count times;
-        word vectors and document vectors are always generated unless it is otherwise specified."""
+        A vocabulary is always generated with the words appearing more than minimum_word_count times,
+        along with a dictionary (word, id) mapping each word to its position in the vocabulary;
+        the weights are stored in a sparse matrix with a row per document and a column per word.
+        The document frequencies are counted in the same pass as the word counts, unless a previously
+        computed document frequency table (e.g. loaded from disk for the same corpus) is given.
+        The word vectors and document vectors are generated lazily on first access, hence the
+        compute_word_vectors and compute_document_vectors options are only kept for compatibility.
+        If a vocabulary is given (e.g. the words kept by a FeatureSelector), it is used as is instead,
+        and the words outside of it are ignored.
+
+        If a feature hasher is given, no vocabulary is built (the vocabulary and word ids are None): the columns are
+        the features of the hasher, the document frequencies are counted from the term frequencies and the vectors
+        are indexed by feature rather than by word."""
         self.documents = documents
         self.log = log
-        self.inverse_document_frequencies = {}
-        word_counts = TermDocumentMatrix.get_word_counts(documents)
-        self.vocabulary = TermDocumentMatrix.get_vocabulary(word_counts, minimum=minimum_word_count)
-        if compute_document_vectors:
-            self.document_vectors = self.get_document_vectors(documents)
-        if compute_word_vectors:
-            self.word_vectors = self.get_word_vectors(documents)
+        self.hasher = hasher
+        self.cached_word_vectors = None
+        self.cached_document_vectors = None
+        if hasher is not None:
+            self.document_frequency_table = None
+            self.vocabulary = None
+            self.word_ids = None
+            self.term_frequencies = self.get_term_frequencies(documents)
+            self.document_frequencies = numpy.bincount(self.term_frequencies.indices, minlength=hasher.size)
+            self.inverse_document_frequencies = numpy.log(len(documents) / (self.document_frequencies + 1.0))
+        else:
+            if document_frequency_table is None:
+                document_frequency_table = DocumentFrequencyTable()
+                word_counts = TermDocumentMatrix.get_word_counts(documents, log=log,
+                                                                 document_frequency_table=document_frequency_table)
+            elif vocabulary is None:
+                word_counts = TermDocumentMatrix.get_word_counts(documents, log=log)
+            self.document_frequency_table = document_frequency_table
+            if vocabulary is None:
+                vocabulary = TermDocumentMatrix.get_vocabulary(word_counts, minimum=minimum_word_count)
+            self.vocabulary = list(vocabulary)
+            self.word_ids = TermDocumentMatrix.get_word_ids(self.vocabulary)
+            self.document_frequencies = document_frequency_table.get_document_frequencies(self.vocabulary)
+            self.inverse_document_frequencies = document_frequency_table.get_inverse_document_frequencies(
+                self.vocabulary)
+            self.term_frequencies = self.get_term_frequencies(documents)
+        self.matrix = self.get_weighted_matrix(self.term_frequencies)
+
+    def get_state(self):
+        """Returns the header and the arrays of the matrix to be saved with a model (see ModelFile): the vocabulary,
+        the (inverse) document frequencies, the term frequencies and the document frequencies of the words
+        of the document frequency table outside of the vocabulary."""
+        header = {"hasher": ModelFile.get_hasher_header(self.hasher), "number_of_documents": None}
+        arrays = {"document_frequencies": self.document_frequencies,
+                  "inverse_document_frequencies": self.inverse_document_frequencies}
+        arrays.update(ModelFile.get_sparse_arrays("term_frequencies", self.term_frequencies))
+        if self.hasher is None:
+            table = self.document_frequency_table
+            other_words = [word for word in table.counts if word not in self.word_ids]
+            header["number_of_documents"] = table.number_of_documents
+            arrays["vocabulary"] = numpy.array(self.vocabulary, dtype=str)
+            arrays["other_words"] = numpy.array(other_words, dtype=str)
+            arrays["other_document_frequencies"] = numpy.array([table.counts[word] for word in other_words],
+                                                               dtype=numpy.int64)
+        return header, arrays
+
+    def set_state(self, header, arrays, documents):
+        """Sets the attributes of the matrix from the given header and arrays of a saved model and the given
+        documents (the training documents, as far as they are kept); the tf-idf weights are computed again."""
+        self.documents = documents
+        self.log = False
+        self.hasher = None if header["hasher"] is None else FeatureHasher(**header["hasher"])
+        self.cached_word_vectors = None
+        self.cached_document_vectors = None
+        self.document_frequencies = arrays["document_frequencies"]
+        self.inverse_document_frequencies = arrays["inverse_document_frequencies"]
+        self.term_frequencies = ModelFile.get_sparse_matrix(arrays, "term_frequencies")
+        if self.hasher is None:
+            self.vocabulary = arrays["vocabulary"].tolist()
+            self.word_ids = TermDocumentMatrix.get_word_ids(self.vocabulary)
+            self.document_frequency_table = DocumentFrequencyTable()
+            self.document_frequency_table.counts = dict(zip(self.vocabulary, self.document_frequencies.tolist()))
+            self.document_frequency_table.counts.update(zip(arrays["other_words"].tolist(),
+                                                            arrays["other_document_frequencies"].tolist()))
+            self.document_frequency_table.number_of_documents = header["number_of_documents"]
+        else:
+            self.document_frequency_table = None
+            self.vocabulary = None
+            self.word_ids = None
+        self.matrix = self.get_weighted_matrix(self.term_frequencies)
+
+    @property
+    def word_vectors(self):
+        """Returns a list of size len(vocabulary) containing tuples of size len(documents)
+        containing the tf-idf weights of the words for the documents; it is generated on first access."""
+        if self.cached_word_vectors is None:
+            self.cached_word_vectors = self.get_word_vectors(self.documents)
+        return self.cached_word_vectors
+
+    @property
+    def document_vectors(self):
+        """Returns a list of size len(documents) where the nth entry is a dictionary (word, tf-idf weight)
+        for the nth document; it is generated on first access."""
+        if self.cached_document_vectors is None:
+            self.cached_document_vectors = self.get_vectors_from_matrix(self.matrix)
+        return self.cached_document_vectors
 
     def get_word_vectors(self, documents):
         """Returns a list of size len(vocabulary) containing tuples of size len(documents)
         containing the tf-idf weights of the words for the documents. The nth entry in the
         list of vectors is the word vector for the nth word in the vocabulary."""
+        matrix = self.matrix if documents is self.documents else self.get_document_matrix(documents)
         word_vectors = []
-        if self.log: p = Process("Generating word vectors", len(self.vocabulary), 1)
-        for word in self.vocabulary:
+        if self.log: p = Process("Generating word vectors", matrix.shape[1], 1)
+        for row in matrix.T.toarray().tolist():
             if self.log: p.add()
-            word_vector = []
-            idf = self.get_inverse_document_frequency(word)
-            for document in documents:
-                tf = TermDocumentMatrix.get_term_frequency(word, document)
-                word_vector.append(tf * idf)
-            word_vectors.append(tuple(word_vector))
+            word_vectors.append(tuple(row))
         if self.log: p.finish()
         return word_vectors
 
     def get_document_vectors(self, documents):
         """Returns the vectors of the given documents as a list of size len(documents)
         where the nth entry is a dictionary (word, tf-idf weight) for the nth document."""
+        return self.get_vectors_from_matrix(self.get_document_matrix(documents))
+
+    def get_vectors_from_matrix(self, matrix):
+        """Returns a list containing a dictionary (word, weight) for each row of the given sparse matrix;
+        the dictionaries are (feature, weight) if the words are hashed."""
         vectors = []
-        if self.log: p = Process("Generating document vectors", len(documents), 1)
-        for document in documents:
+        if self.log: p = Process("Generating document vectors", matrix.shape[0], 1)
+        for i in range(0, matrix.shape[0]):
             if self.log: p.add()
-            vectors.append(self.get_document_vector(document))
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            vector = {}
+            for word_id, weight in zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist()):
+                vector[word_id if self.vocabulary is None else self.vocabulary[word_id]] = weight
+            vectors.append(vector)
         if self.log: p.finish()
         return vectors
 
     def get_document_vector(self, document):
-        """Returns a dictionary (word, tf-idf weight) for the given document."""
-        vector = {}
+        """Returns a dictionary (word, tf-idf weight) for the given document, (feature, weight) if the words are hashed."""
+        if self.hasher is not None:
+            return self.get_document_vectors([document])[0]
+        counts = Counter()
         for word in document.bag_of_words:
-            if word in self.vocabulary and word not in vector:
-                tf = TermDocumentMatrix.get_term_frequency(word, document)
-                idf = self.get_inverse_document_frequency(word)
-                vector[word] = tf * idf
+            if word in self.word_ids:
+                counts[word] += 1
+        vector = {}
+        for word in counts:
+            vector[word] = counts[word] * float(self.inverse_document_frequencies[self.word_ids[word]])
         return vector
 
+    def get_document_matrix(self, documents):
+        """Returns a sparse (CSR) matrix with the tf-idf weights of the given documents;
+        the nth row is the vector for the nth document, words outside of the vocabulary are ignored."""
+        return self.get_weighted_matrix(self.get_term_frequencies(documents))
+
+    def add_documents(self, documents):
+        """Appends the rows of the given documents to the term frequencies and the tf-idf matrix and returns
+        the tf-idf rows of the documents; the vocabulary and the (inverse) document frequencies are kept as they are,
+        so words outside of the vocabulary are ignored and the weights of the other documents do not change."""
+        term_frequencies = self.get_term_frequencies(documents)
+        matrix = self.get_weighted_matrix(term_frequencies)
+        self.term_frequencies = vstack([self.term_frequencies, term_frequencies], format="csr")
+        self.matrix = vstack([self.matrix, matrix], format="csr")
+        self.documents = self.documents + list(documents)
+        self.cached_word_vectors = None
+        self.cached_document_vectors = None
+        return matrix
+
+    def get_term_frequencies(self, documents):
+        """Returns a sparse (CSR) matrix of size len(documents) x len(vocabulary) containing the term frequencies
+        of the vocabulary words in the given documents; it is built in a single pass over the documents.
+        The ids of interned documents are turned into columns at once, without decoding their words.
+        If the words are hashed, it is the matrix of the (signed) feature counts of the documents instead."""
+        if self.hasher is not None:
+            return self.hasher.get_matrix(documents)
+        indptr = [0]
+        indices = []
+        data = []
+        interner = None
+        columns = None
+        if self.log: p = Process("Generating term frequencies", len(documents), 1)
+        for document in documents:
+            if self.log: p.add()
+            if document.interner is not None:
+                if document.interner is not interner or len(columns) != len(document.interner.words):
+                    interner = document.interner
+                    columns = interner.get_positions(self.word_ids)
+                document_columns = columns[numpy.asarray(document.words, dtype=numpy.int64)]
+                document_columns, counts = numpy.unique(document_columns[document_columns != -1], return_counts=True)
+                indices.extend(document_columns.tolist())
+                data.extend(counts.tolist())
+            else:
+                counts = Counter()
+                for word in document.bag_of_words:
+                    word_id = self.word_ids.get(word)
+                    if word_id is not None:
+                        counts[word_id] += 1
+                indices.extend(counts.keys())
+                data.extend(counts.values())
+            indptr.append(len(indices))
+        if self.log: p.finish()
+        matrix = csr_matrix((numpy.array(data, dtype=numpy.int32), numpy.array(indices, dtype=numpy.int32),
+                             numpy.array(indptr, dtype=numpy.int64)), shape=(len(indptr) - 1, len(self.vocabulary)))
+        matrix.sort_indices()
+        return matrix
+
+    def get_weighted_matrix(self, term_frequencies):
+        """Returns a copy of the given term frequencies matrix where each entry is multiplied by the
+        inverse document frequency of its word; explicit zero weights are retained."""
+        return TermDocumentMatrix.get_weighted_columns(term_frequencies, self.inverse_document_frequencies)
+
+    @staticmethod
+    def get_weighted_columns(matrix, weights):
+        """Returns a copy of the given sparse (CSR) matrix as floats where each column is multiplied by its weight."""
+        matrix = matrix.astype(numpy.float64)
+        matrix.data *= weights[matrix.indices]
+        return matrix
+
     def get_inverse_document_frequency(self, word):
-        """Returns the inverse document frequency of the given word."""
-        if word in self.inverse_document_frequencies:
-            return self.inverse_document_frequencies[word]
+        """Returns the inverse document frequency of the given word (of its feature, if the words are hashed)."""
+        if self.hasher is not None:
+            return float(self.inverse_document_frequencies[self.hasher.get_features([word])[0]])
+        if word in self.word_ids:
+            return float(self.inverse_document_frequencies[self.word_ids[word]])
         else:
-            count = 0
-            for document in self.documents:
-                if word in document.bag_of_words:
-                    count += 1
-            self.inverse_document_frequencies[word] = log(len(self.documents) / (count + 1))
-            return self.get_inverse_document_frequency(word)
+            return self.document_frequency_table.get_inverse_document_frequency(word)
 
     @staticmethod
     def get_term_frequency(word, document):
@@ -79,20 +249,28 @@ class TermDocumentMatrix:
         else:
             return document.bag_of_words.count(word)
 
+    @staticmethod
+    def get_word_ids(vocabulary):
+        """Returns a dictionary (word, id) where the id is the position of the word in the given vocabulary."""
+        word_ids = {}
+        for word_id in range(0, len(vocabulary)):
+            word_ids[vocabulary[word_id]] = word_id
+        return word_ids
+
     @staticmethod
     def get_vocabulary(word_counts, minimum=0):
         """Returns the vocabulary as a list of word for the given word counts;
         only words whose count is higher than the optional parameter minimum are retained."""
         vocabulary = []
         for word in word_counts:
-            if word_counts[word] > minimum and word not in vocabulary:
+            if word_counts[word] > minimum:
                 vocabulary.append(word)
         return vocabulary
 
     @staticmethod
-    def get_word_counts(documents, log=False):
+    def get_word_counts(documents, log=False, document_frequency_table=None):
         """Returns a dictionary (word, count) of the word counts for each word
-        in the given documents."""
+        in the given documents; if a document frequency table is given, it is updated in the same pass."""
         word_counts = {}
         p = None
         if log:
@@ -104,6 +282,70 @@ class TermDocumentMatrix:
                 if word not in word_counts:
                     word_counts[word] = 0
                 word_counts[word] += 1
+            if document_frequency_table is not None:
+                document_frequency_table.add(document)
         if log:
             p.finish()
-        return word_counts
\ No newline at end of file
+        return word_counts
+
+
+class DocumentFrequencyTable:
+
+    """A data structure to count the number of documents each word appears in, one document at a time;
+    it provides the inverse document frequencies and can be saved to disk to be reused by several models
+    built on the same corpus."""
+
+    def __init__(self, documents=None):
+        """Initializes an empty table and adds the given documents (if any)."""
+        self.counts = {}
+        self.number_of_documents = 0
+        if documents is not None:
+            for document in documents:
+                self.add(document)
+
+    def add(self, document):
+        """Updates the table with the words found in the given document, each counted once."""
+        self.number_of_documents += 1
+        words = document.bag_of_words
+        if type(words) is not set:
+            words = set(words)
+        counts = self.counts
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+
+    def get_document_frequency(self, word):
+        """Returns the number of documents the given word appears in."""
+        return self.counts.get(word, 0)
+
+    def get_inverse_document_frequency(self, word):
+        """Returns the inverse document frequency of the given word, as log(N / (df + 1))."""
+        return log(self.number_of_documents / (self.get_document_frequency(word) + 1))
+
+    def get_document_frequencies(self, vocabulary):
+        """Returns an array where the nth entry is the document frequency of the nth word in the vocabulary."""
+        document_frequencies = numpy.zeros(len(vocabulary), dtype=numpy.int64)
+        for word_id in range(0, len(vocabulary)):
+            document_frequencies[word_id] = self.counts.get(vocabulary[word_id], 0)
+        return document_frequencies
+
+    def get_inverse_document_frequencies(self, vocabulary):
+        """Returns an array where the nth entry is the inverse document frequency of the nth word in the vocabulary."""
+        return numpy.log(self.number_of_documents / (self.get_document_frequencies(vocabulary) + 1.0))
+
+    def save(self, path):
+        """Saves the table to the given path as a NumPy archive (.npz)."""
+        words = list(self.counts.keys())
+        counts = numpy.array([self.counts[word] for word in words], dtype=numpy.int64)
+        numpy.savez(path, words=numpy.array(words, dtype=str), counts=counts,
+                    number_of_documents=numpy.array(self.number_of_documents))
+
+    @staticmethod
+    def load(path):
+        """Returns the table previously saved at the given path."""
+        if not exists(path) and exists(path + ".npz"):
+            path += ".npz"
+        with numpy.load(path) as archive:
+            table = DocumentFrequencyTable()
+            table.counts = dict(zip(archive["words"].tolist(), archive["counts"].tolist()))
+            table.number_of_documents = int(archive["number_of_documents"])
+        return table
@@ -1,3 +1,6 @@
+import multiprocessing
+
+
 class ConfusionMatrix:
 
     """A class to manage the results of a classification process."""
@@ -86,3 +89,15 @@ class Process:
         print("done!\n")
 
 
+class ProcessContext:
+
+    """A class to choose how the processes of the pools are started."""
+
+    @staticmethod
+    def get_context():
+        """Returns the multiprocessing context the pools of processes are created with: processes are forked where
+        possible, so the workers share the data given to their initializer with the parent, otherwise they are
+        started with the default method (e.g. spawned on Windows) and the data is pickled once per worker."""
+        if "fork" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("fork")
+        return multiprocessing.get_context()
@@ -0,0 +1,42 @@
+import unittest
+from os.path import join
+from tempfile import TemporaryDirectory
+from nlp.bench import Benchmark, BenchmarkSuite
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        calls = []
+        benchmark = Benchmark("append", lambda values: calls.append(len(values)), lambda values: len(values),
+                              setup=lambda: ([1, 2, 3],))
+        result = benchmark.run(repeats=2, minimum_time=0)
+        self.assertEqual(result["loops"], 1)
+        self.assertEqual(result["items"], 3)
+        self.assertEqual(calls, [3, 3, 3, 3])
+        self.assertLessEqual(result["minimum_seconds"], result["seconds"])
+        self.assertGreaterEqual(result["peak_memory_mb"], 0)
+
+    def test_regressions(self):
+        baseline = {"benchmarks": {"a": {"minimum_seconds": 1.0}, "b": {"minimum_seconds": 2.0}}}
+        results = {"benchmarks": {"a": {"minimum_seconds": 1.2, "seconds": 1.3, "throughput": 1, "peak_memory_mb": 0},
+                                  "b": {"minimum_seconds": 4.0, "seconds": 4.0, "throughput": 1, "peak_memory_mb": 0},
+                                  "c": {"minimum_seconds": 9.0, "seconds": 9.0, "throughput": 1, "peak_memory_mb": 0}}}
+        self.assertEqual(BenchmarkSuite.get_regressions(results, baseline), [("b", 2.0)])
+        self.assertEqual(BenchmarkSuite.get_regressions(results, baseline, tolerance=0.1), [("a", 1.2), ("b", 2.0)])
+        self.assertIn("+100.0%", BenchmarkSuite.get_report(results, baseline))
+        self.assertEqual(BenchmarkSuite.get_environment_differences(results, baseline), ["environment"])
+        environment = BenchmarkSuite.get_environment()
+        results.update({"python": "3.11.7", "numpy": "2.4.6", "environment": environment})
+        baseline.update({"python": "3.11.7", "numpy": "2.4.6", "environment": dict(environment)})
+        self.assertEqual(BenchmarkSuite.get_environment_differences(results, baseline), [])
+        baseline.update({"python": "3.12.0", "environment": dict(environment, cpus=-1)})
+        self.assertEqual(BenchmarkSuite.get_environment_differences(results, baseline), ["python", "cpus"])
+        with TemporaryDirectory() as directory:
+            path = join(directory, "benchmarks", "results.json")
+            BenchmarkSuite.save(results, path)
+            self.assertEqual(BenchmarkSuite.load(path), results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from nlp.cross_validator import NaiveBayesCrossValidator, KNNCrossValidator
+from nlp.dataset import Dataset
+from nlp.document import ClassDocument
+
+
+class TestCrossValidator(unittest.TestCase):
+
+    def test_get_sets(self):
+        documents = [
+            ClassDocument("Great sound, great value.", "+"),
+            ClassDocument("Great cable.", "+"),
+            ClassDocument("Works well, good value.", "+"),
+            ClassDocument("Broken cable.", "-"),
+            ClassDocument("Awful sound, broken.", "-"),
+            ClassDocument("Bad value, awful.", "-"),
+        ]
+        cv = NaiveBayesCrossValidator(Dataset(documents), 3)
+        expected_sets = [[documents[0], documents[3]], [documents[1], documents[4]], [documents[2], documents[5]]]
+        self.assertEqual(cv.sets, expected_sets)
+
+    def test_get_parallel_test_results(self):
+        documents = [
+            ClassDocument("Great sound, great value.", "+"),
+            ClassDocument("Great cable, works well.", "+"),
+            ClassDocument("Works well, good value.", "+"),
+            ClassDocument("Great value, good sound.", "+"),
+            ClassDocument("Broken cable.", "-"),
+            ClassDocument("Awful sound, broken.", "-"),
+            ClassDocument("Bad value, awful.", "-"),
+            ClassDocument("Broken, bad sound.", "-"),
+        ]
+        cv = NaiveBayesCrossValidator(Dataset(documents), 4)
+        expected_matrices = []
+        for i in range(0, 4):
+            expected_matrices.append(cv.get_fold_test_results(i).matrix)
+        matrices = []
+        for confusion_matrix in cv.get_parallel_test_results(2):
+            matrices.append(confusion_matrix.matrix)
+        self.assertEqual(matrices, expected_matrices)
+
+    def test_get_shared_test_results(self):
+        documents = [
+            ClassDocument("Great sound, great value.", "+"),
+            ClassDocument("Broken cable.", "-"),
+            ClassDocument("Great cable, works well.", "+"),
+            ClassDocument("Awful sound, broken.", "-"),
+            ClassDocument("Works well, good value.", "+"),
+            ClassDocument("Bad value, awful.", "-"),
+            ClassDocument("Great value, good sound.", "+"),
+            ClassDocument("Broken, bad sound.", "-"),
+        ]
+        for cv, shared_cv in [(NaiveBayesCrossValidator(Dataset(documents), 4),
+                               NaiveBayesCrossValidator(Dataset(documents), 4, shared=True)),
+                              (KNNCrossValidator(Dataset(documents), 4, 3),
+                               KNNCrossValidator(Dataset(documents), 4, 3, shared=True))]:
+            for i in range(0, 4):
+                self.assertEqual(shared_cv.get_fold_test_results(i).matrix, cv.get_fold_test_results(i).matrix)
+            self.assertGreater(shared_cv.counting_time.total_seconds(), 0)
@@ -1,6 +1,11 @@
 import unittest
-from nlp.dataset import Dataset, ClassDataset
-from nlp.document import ClassDocument
+import json
+import os
+import tempfile
+import shutil
+import numpy
+from nlp.dataset import Dataset, ClassDataset, DatasetCache
+from nlp.document import ClassDocument, Tokenizer
 
 
 class TestDataset(unittest.TestCase):
@@ -68,3 +73,76 @@ class TestDataset(unittest.TestCase):
         ], [documents[4], documents[9]]
         self.assertEqual(split_documents, expected_split_documents)
 
+
+    def test_get_amazon_documents(self):
+        reviews = [("Great value.", 5.0), ("Just fine.", 3.0), ("Broken cable.", 1.0), ("Great sound.", 5.0),
+                   ("Bad value.", 2.0), ("Awful sound.", 1.0), ("Works well.", 5.0), ("\"overall\": 5.0", 4.0)]
+        file, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(file, "w") as f:
+            for text, score in reviews:
+                f.write(json.dumps({"reviewText": text, "overall": score}) + "\n")
+        try:
+            documents = list(Dataset.get_amazon_documents(path))
+            self.assertEqual([document.text for document in documents],
+                             ["Great value.", "Broken cable.", "Great sound.", "Awful sound.", "Works well."])
+            self.assertEqual([document.c for document in documents], ["+", "-", "+", "-", "+"])
+            self.assertEqual(documents[1].bag_of_words, {"broken", "cable"})
+            parallel_documents = list(Dataset.get_amazon_documents(path, workers=2, chunk_size=2))
+            self.assertEqual([(document.text, document.bag_of_words) for document in parallel_documents],
+                             [(document.text, document.bag_of_words) for document in documents])
+            self.assertEqual(len(list(Dataset.get_amazon_documents(path, maximum=2))), 2)
+            balanced_documents = list(Dataset.get_amazon_documents(path, balanced=True))
+            self.assertEqual(sorted([document.c for document in balanced_documents]), ["+", "+", "-", "-"])
+            balanced_documents = list(Dataset.get_amazon_documents(path, balanced=True, maximum=2))
+            self.assertEqual(sorted([document.c for document in balanced_documents]), ["+", "-"])
+        finally:
+            os.remove(path)
+
+    def test_get_tokenized_reviews(self):
+        tokenizer = Tokenizer()
+        reviews = [("Great value.", "+"), ("Broken cable.", "-"), ("Great sound.", "+"), ("Awful sound.", "-"),
+                   ("Works well.", "+")]
+        expected = [(text, c, tokenizer.get_bag_of_words(text)) for text, c in reviews]
+        self.assertEqual(list(Dataset.get_tokenized_reviews(reviews, tokenizer, workers=2, chunk_size=2)), expected)
+        self.assertEqual(list(Dataset.get_tokenized_reviews(iter(reviews), tokenizer, workers=2, chunk_size=2)),
+                         expected)
+
+    def test_dataset_cache(self):
+        documents = [
+            ClassDocument("Great cable, great sound.", "+", preserve_duplicates=True),
+            ClassDocument("Broken cable.", "-", preserve_duplicates=True),
+            ClassDocument("", "-", preserve_duplicates=True),
+        ]
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "dataset")
+        DatasetCache.save(Dataset(documents), path)
+        cached_documents = DatasetCache.load(path).documents
+        self.assertEqual([document.bag_of_words for document in cached_documents],
+                         [document.bag_of_words for document in documents])
+        self.assertEqual([document.c for document in cached_documents], ["+", "-", "-"])
+        self.assertIsInstance(cached_documents[0].words.base, numpy.memmap)
+        key = DatasetCache.get_key("dataset", [path], {"ngrams": None})
+        self.assertEqual(key, DatasetCache.get_key("dataset", [path], {"ngrams": None}))
+        self.assertNotEqual(key, DatasetCache.get_key("dataset", [path], {"ngrams": [2]}))
+        documents = [ClassDocument("The cable, the great sound.", "+", remove_stopwords=True, ngrams=[2])]
+        DatasetCache.save(Dataset(documents), os.path.join(directory, "options"))
+        cached_documents = DatasetCache.load(os.path.join(directory, "options")).documents
+        self.assertEqual(cached_documents[0].bag_of_words, documents[0].bag_of_words)
+        self.assertEqual(Tokenizer.get_document_options(cached_documents),
+                         {"preserve_duplicates": False, "remove_stopwords": True, "ngrams": [2]})
+        shutil.rmtree(directory)
+
+    def test_get_directory_documents(self):
+        root = tempfile.mkdtemp()
+        files = {"pos": {"a.txt": "Great sound.", "b.txt": "Great value."}, "neg": {"c.txt": "Broken cable.", "d.md": "-"}}
+        for c in files:
+            os.makedirs(os.path.join(root, c))
+            for filename in files[c]:
+                with open(os.path.join(root, c, filename), "w", encoding="utf-8") as file:
+                    file.write(files[c][filename])
+        documents = list(Dataset.get_directory_documents(root, workers=2, chunk_size=1))
+        self.assertEqual(sorted([(document.c, document.text) for document in documents]),
+                         [("neg", "Broken cable."), ("pos", "Great sound."), ("pos", "Great value.")])
+        self.assertEqual(documents[0].bag_of_words, {"broken", "cable"})
+        self.assertEqual(len(Dataset.get_directory_dataset(root).documents), 3)
+        shutil.rmtree(root)
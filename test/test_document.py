@@ -1,5 +1,5 @@
 import unittest
-from nlp.document import Document
+from nlp.document import Document, ClassDocument, Tokenizer, Interner
 
 
 class TestDocument(unittest.TestCase):
@@ -28,3 +28,43 @@ class TestDocument(unittest.TestCase):
         expected_bag_of_words = ["sample", "parsed", "text", "to", "split", "on", "whitespace"]
         self.assertEqual(bag_of_words, expected_bag_of_words)
 
+
+    def test_tokenizer_get_bag_of_words(self):
+        tokenizer = Tokenizer(preserve_duplicates=True, remove_stopwords=True, ngrams=[2])
+        bag_of_words = tokenizer.get_bag_of_words("The cable: it's 2 metres, and the CABLE works!")
+        expected_bag_of_words = ["cable", "it's", "metres", "cable", "works",
+                                 "cable it's", "it's metres", "metres cable", "cable works"]
+        self.assertEqual(bag_of_words, expected_bag_of_words)
+        self.assertEqual(Tokenizer().get_bag_of_words("The cable, the CABLE."), {"the", "cable"})
+        self.assertIs(Tokenizer.get_tokenizer(ngrams=[2]), Tokenizer.get_tokenizer(ngrams=[2]))
+
+    def test_get_document_options(self):
+        documents = [Document("Great cable.", remove_stopwords=True, ngrams=[2])]
+        self.assertEqual(Tokenizer.get_document_options(documents),
+                         {"preserve_duplicates": False, "remove_stopwords": True, "ngrams": [2]})
+        self.assertEqual(Tokenizer.get_document_options([]),
+                         {"preserve_duplicates": False, "remove_stopwords": False, "ngrams": None})
+        self.assertEqual(Tokenizer.get_document_options(set(documents)), Tokenizer.get_document_options(documents))
+        self.assertEqual(Tokenizer.get_document_options(iter(documents)), Tokenizer.get_document_options(documents))
+
+    def test_interned_bag_of_words(self):
+        interner = Interner()
+        tokenizer = Tokenizer(preserve_duplicates=True, interner=interner)
+        document = ClassDocument("Great cable, great sound.", "+", tokenizer=tokenizer, keep_text=False)
+        self.assertEqual(list(document.words), [0, 1, 0, 2])
+        self.assertEqual(document.bag_of_words, ["great", "cable", "great", "sound"])
+        self.assertIsNone(document.text)
+        other = Document("Broken cable.", tokenizer=Tokenizer(interner=interner))
+        self.assertEqual(list(other.words), [1, 3])
+        self.assertEqual(other.bag_of_words, {"broken", "cable"})
+        self.assertIsNot(other.bag_of_words, other.bag_of_words)
+        self.assertIs(other.interner, interner)
+        self.assertTrue(other.contains("broken"))
+        self.assertFalse(other.contains("great"))
+        self.assertFalse(other.contains("missing"))
+        other.bag_of_words = {"fixed"}
+        self.assertEqual(other.bag_of_words, {"fixed"})
+        self.assertIsNone(other.interner)
+        self.assertTrue(other.contains("fixed"))
+        self.assertEqual(other.tokenizer.get_options(), Tokenizer().get_options())
+        self.assertFalse(hasattr(document, "__dict__"))
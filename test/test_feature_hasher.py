@@ -0,0 +1,46 @@
+import unittest
+from zlib import crc32
+from nlp.feature_hasher import FeatureHasher
+from nlp.term_document_matrix import TermDocumentMatrix
+from nlp.naive_bayes import NaiveBayes
+from nlp.knn import KNN
+from nlp.document import Document, ClassDocument
+
+
+class TestFeatureHasher(unittest.TestCase):
+
+    documents = [
+        ClassDocument("Great sound, great value.", "+", preserve_duplicates=True),
+        ClassDocument("Great cable, works well.", "+", preserve_duplicates=True),
+        ClassDocument("Broken cable, awful sound.", "-", preserve_duplicates=True),
+        ClassDocument("Bad value, broken.", "-", preserve_duplicates=True),
+    ]
+
+    def test_get_features(self):
+        hasher = FeatureHasher(bits=4)
+        self.assertEqual(hasher.get_features(["great", "sound"]), [crc32(b"great") % 16, crc32(b"sound") % 16])
+
+    def test_get_matrix(self):
+        hasher = FeatureHasher(bits=8)
+        matrix = hasher.get_matrix(self.documents)
+        self.assertEqual(matrix.shape, (4, 256))
+        feature = hasher.get_features(["great"])[0]
+        sign = -1 if crc32(b"great") >> 31 else 1
+        self.assertEqual(matrix[0, feature], 2 * sign)
+        self.assertEqual((hasher.get_matrix(self.documents, workers=2) != matrix).nnz, 0)
+        self.assertEqual(FeatureHasher(bits=8, signed=False).get_matrix(self.documents).min(), 0)
+
+    def test_term_document_matrix(self):
+        term_document_matrix = TermDocumentMatrix(self.documents, hasher=FeatureHasher(bits=10))
+        self.assertIsNone(term_document_matrix.vocabulary)
+        self.assertEqual(term_document_matrix.matrix.shape, (4, 1024))
+        self.assertEqual(term_document_matrix.get_inverse_document_frequency("cable"),
+                         term_document_matrix.get_inverse_document_frequency("great"))
+
+    def test_classifiers(self):
+        test_document = Document("Awful cable, broken.", preserve_duplicates=True)
+        nb = NaiveBayes(self.documents, hasher=FeatureHasher(bits=16, signed=False))
+        self.assertEqual(nb.predict_batch([test_document]), ["-"])
+        self.assertEqual(nb.get_prediction(test_document), "-")
+        knn = KNN(self.documents, 1, hasher=FeatureHasher(bits=16))
+        self.assertEqual(knn.predict_batch([test_document]), ["-"])
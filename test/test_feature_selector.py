@@ -0,0 +1,51 @@
+import unittest
+from nlp.feature_selector import FeatureSelector
+from nlp.naive_bayes import NaiveBayes
+from nlp.knn import KNN
+from nlp.id3 import ID3
+from nlp.document import Document, ClassDocument
+
+
+class TestFeatureSelector(unittest.TestCase):
+
+    documents = [
+        ClassDocument("great sound great value", "+", preserve_duplicates=True),
+        ClassDocument("great cable works well", "+", preserve_duplicates=True),
+        ClassDocument("broken cable awful sound", "-", preserve_duplicates=True),
+        ClassDocument("bad value broken", "-", preserve_duplicates=True),
+    ]
+
+    def test_document_frequencies(self):
+        selector = FeatureSelector(self.documents)
+        self.assertEqual(selector.vocabulary, selector.words)
+        frequencies = dict(zip(selector.words, selector.document_frequencies.tolist()))
+        self.assertEqual(frequencies["great"], 2)
+        self.assertEqual(frequencies["works"], 1)
+        selector = FeatureSelector(self.documents, minimum_document_frequency=2, maximum_document_ratio=0.5)
+        self.assertEqual(selector.vocabulary, ["great", "sound", "value", "cable", "broken"])
+
+    def test_scores(self):
+        selector = FeatureSelector(self.documents, number_of_words=2, score="chi2")
+        self.assertEqual(selector.vocabulary, ["great", "broken"])
+        scores = dict(zip(selector.words, selector.scores.tolist()))
+        self.assertAlmostEqual(scores["great"], 4.0)
+        self.assertAlmostEqual(scores["sound"], 0.0)
+        selector = FeatureSelector(self.documents, number_of_words=2, score="information_gain")
+        self.assertEqual(selector.vocabulary, ["great", "broken"])
+        self.assertRaises(ValueError, FeatureSelector, self.documents, score="none")
+
+    def test_classifiers(self):
+        vocabulary = FeatureSelector(self.documents, number_of_words=2, score="chi2").vocabulary
+        document = Document("great sound, broken", preserve_duplicates=True)
+        naive_bayes = NaiveBayes(self.documents, vocabulary=vocabulary)
+        self.assertEqual(sorted(naive_bayes.word_ids), ["broken", "great"])
+        knn = KNN(self.documents, 1, vocabulary=vocabulary)
+        self.assertEqual(knn.term_document_matrix.matrix.shape, (4, 2))
+        id3 = ID3(self.documents, vocabulary=vocabulary)
+        self.assertEqual(id3.vocabulary, {"great", "broken"})
+        self.assertEqual(id3.get_prediction(Document("great cable", preserve_duplicates=True)), "+")
+        self.assertIn(naive_bayes.get_prediction(document), ["+", "-"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
-from nlp.document import ClassDocument
-from nlp.id3 import ID3
+from nlp.document import ClassDocument, Tokenizer, Interner
+from nlp.id3 import ID3, SplitFinder
+from nlp.term_document_matrix import TermDocumentMatrix
+import numpy
 from math import log
 
 
@@ -60,5 +62,87 @@ class TestID3(unittest.TestCase):
         expected_split_data = set([documents[0], documents[3]]), set([documents[1], documents[2], documents[4]])
         self.assertEqual(id3.get_split_data("friend", documents), expected_split_data)
 
+    def test_get_information_gains(self):
+        documents = [
+            ClassDocument("A positive document.", "+"),
+            ClassDocument("Another positive document.", "+"),
+            ClassDocument("Still a document.", "+"),
+            ClassDocument("This time it's negative.", "-"),
+            ClassDocument("Negative again.", "-"),
+        ]
+        id3 = ID3(documents)
+        term_document_matrix = TermDocumentMatrix(documents)
+        occurrences = term_document_matrix.term_frequencies.astype(numpy.float64)
+        split_finder = SplitFinder(occurrences, numpy.array([0, 0, 0, 1, 1]), 2)
+        gains = split_finder.get_information_gains(numpy.arange(5))
+        for word_id in range(0, len(term_document_matrix.vocabulary)):
+            word = term_document_matrix.vocabulary[word_id]
+            self.assertAlmostEqual(gains[word_id], id3.get_information_gain(word, documents))
+
+    def test_get_split(self):
+        documents = [
+            ClassDocument("Hello, friend!", "+"),
+            ClassDocument("Hello, pal!", "+"),
+            ClassDocument("Hello, you.", "+"),
+            ClassDocument("Goodbye, friend.", "-"),
+            ClassDocument("Bye, human.", "-"),
+        ]
+        term_document_matrix = TermDocumentMatrix(documents)
+        occurrences = term_document_matrix.term_frequencies.astype(numpy.float64)
+        split_finder = SplitFinder(occurrences, numpy.array([0, 0, 0, 1, 1]), 2)
+        with_word, without_word = split_finder.get_split(numpy.array([0, 2, 3, 4]), term_document_matrix.word_ids["friend"])
+        self.assertEqual((with_word.tolist(), without_word.tolist()), ([0, 3], [2, 4]))
 
+    def test_get_tree(self):
+        documents = [
+            ClassDocument("Hello, friend!", "+"),
+            ClassDocument("Hello, pal!", "+"),
+            ClassDocument("Hello, you.", "+"),
+            ClassDocument("Goodbye, friend.", "-"),
+            ClassDocument("Bye, human.", "-"),
+        ]
+        id3 = ID3(documents)
+        self.assertEqual(id3.tree.get_string(0), "hello\n  +\n  -")
+        for document in documents:
+            self.assertEqual(id3.get_prediction(document), document.c)
+
+    def test_stopping_criteria(self):
+        documents = [
+            ClassDocument("Great sound, great value.", "+"),
+            ClassDocument("Great cable.", "+"),
+            ClassDocument("Works well, good value.", "+"),
+            ClassDocument("Broken cable.", "-"),
+            ClassDocument("Awful sound, broken.", "-"),
+            ClassDocument("Bad value, awful.", "-"),
+        ]
+        self.assertEqual(ID3(documents, maximum_depth=0).features, [-1])
+        self.assertEqual(ID3(documents, minimum_documents=7).features, [-1])
+        self.assertEqual(ID3(documents, minimum_gain=1.5).features, [-1])
+        self.assertEqual(ID3(documents, maximum_leaves=2).features.count(-1), 2)
+        id3 = ID3(documents, maximum_depth=1)
+        self.assertEqual(len(id3.features), 3)
+        self.assertEqual(id3.features[1:], [-1, -1])
 
+    def test_predict_batch(self):
+        documents = [
+            ClassDocument("Great sound, great value.", "+"),
+            ClassDocument("Great cable.", "+"),
+            ClassDocument("Works well, good value.", "+"),
+            ClassDocument("Broken cable.", "-"),
+            ClassDocument("Awful sound, broken.", "-"),
+            ClassDocument("Bad value, awful.", "-"),
+            ClassDocument("Same words.", "+"),
+            ClassDocument("Same words.", "-"),
+        ]
+        id3 = ID3(documents)
+        testing = documents + [ClassDocument("Nothing known", "+"), ClassDocument("Great, but broken", "-")]
+        predictions = id3.predict_batch(testing)
+        self.assertEqual(predictions[0:6], ["+", "+", "+", "-", "-", "-"])
+        self.assertEqual(predictions, [id3.get_prediction(document) for document in testing])
+        self.assertEqual(predictions, [id3.classify(document, id3.tree) for document in testing])
+        tokenizer = Tokenizer(interner=Interner())
+        interned = [ClassDocument(document.text, document.c, tokenizer=tokenizer) for document in testing]
+        self.assertEqual(id3.predict_batch(interned), predictions)
+        self.assertEqual([id3.get_prediction(document) for document in interned], predictions)
+        interned_id3 = ID3(interned[0:8])
+        self.assertEqual(interned_id3.predict_batch(interned), predictions)
@@ -0,0 +1,56 @@
+import unittest
+import numpy
+from nlp.kmeans import KMeans
+from nlp.latent_semantic_analysis import LatentSemanticAnalysis
+from nlp.document import Document
+
+
+class TestKMeans(unittest.TestCase):
+
+    word_vectors = [
+        ("cable", (0.0, 0.1)), ("wire", (0.1, 0.0)), ("plug", (0.0, 0.0)),
+        ("guitar", (5.0, 5.1)), ("bass", (5.1, 5.0)), ("drum", (5.0, 5.0)),
+        ("screen", (10.0, 0.0)), ("monitor", (10.1, 0.1)),
+    ]
+
+    def test_cluster(self):
+        kmeans = KMeans(self.word_vectors, 3, seed=0)
+        clusters = sorted([sorted(cluster) for cluster in kmeans.get_clusters()])
+        self.assertEqual(clusters, [["bass", "drum", "guitar"], ["cable", "plug", "wire"], ["monitor", "screen"]])
+        self.assertEqual(kmeans.centroids.shape, (3, 2))
+        distances = KMeans.get_squared_distances(kmeans.vectors, kmeans.centroids)
+        self.assertAlmostEqual(kmeans.inertia, float(numpy.sum(numpy.min(distances, axis=1))))
+
+    def test_get_squared_distances(self):
+        distances = KMeans.get_squared_distances(numpy.array([[0.0, 0.0], [3.0, 4.0]]), numpy.array([[0.0, 0.0]]))
+        self.assertEqual(distances.tolist(), [[0.0], [25.0]])
+
+    def test_get_centroids(self):
+        vectors = numpy.array([[0.0, 0.0], [2.0, 2.0], [9.0, 9.0]])
+        centroids = KMeans.get_centroids(vectors, numpy.array([0, 0, 0]), numpy.array([1.0, 1.0, 50.0]), 2)
+        self.assertEqual(centroids.tolist(), [[11 / 3, 11 / 3], [9.0, 9.0]])
+
+    def test_mini_batch_cluster(self):
+        kmeans = KMeans(self.word_vectors, 3, seed=0, batch_size=4, restarts=3)
+        clusters = sorted([sorted(cluster) for cluster in kmeans.get_clusters()])
+        self.assertEqual(clusters, [["bass", "drum", "guitar"], ["cable", "plug", "wire"], ["monitor", "screen"]])
+
+    def test_parallel_restarts(self):
+        kmeans = KMeans(self.word_vectors, 2, seed=0, restarts=4)
+        parallel_kmeans = KMeans(self.word_vectors, 2, seed=0, restarts=4, workers=2)
+        self.assertEqual(parallel_kmeans.inertia, kmeans.inertia)
+        self.assertEqual(parallel_kmeans.labels.tolist(), kmeans.labels.tolist())
+
+    def test_get_mini_batch_centroids(self):
+        counts = numpy.array([1.0, 0.0])
+        centroids = KMeans.get_mini_batch_centroids(numpy.array([[3.0, 3.0], [10.0, 10.0]]),
+                                                    numpy.array([[1.0, 1.0], [9.0, 9.0]]), counts)
+        self.assertEqual(centroids.tolist(), [[2.0, 2.0], [10.0, 10.0]])
+        self.assertEqual(counts.tolist(), [2.0, 1.0])
+
+    def test_get_lsa_word_vectors(self):
+        documents = [Document("guitar bass drum"), Document("guitar bass"), Document("cable plug"), Document("cable")]
+        lsa = LatentSemanticAnalysis(documents, rank=2)
+        word_vectors = KMeans.get_lsa_word_vectors(lsa)
+        self.assertEqual([word for word, vector in word_vectors], lsa.vocabulary)
+        self.assertEqual(len(word_vectors[0][1]), 2)
@@ -53,3 +53,41 @@ class TestKNN(unittest.TestCase):
         similarities = [0.9, 0.8, 0.3, 0.2, 0.1]
         self.assertEqual(KNN.get_majority_class(documents, similarities), "+")
 
+    def test_get_most_similar_documents(self):
+        documents = [
+            ClassDocument("A great product, works great.", "+"),
+            ClassDocument("Great value and it works.", "+"),
+            ClassDocument("Broken on arrival, awful.", "-"),
+            ClassDocument("Awful sound and broken cable.", "-"),
+            ClassDocument("Nothing in common here.", "-")
+        ]
+        knn = KNN(documents, 4)
+        target = ClassDocument("Great sound, great value.", "+")
+        target_vector = knn.term_document_matrix.get_document_vector(target)
+        expected_similarities = []
+        for document_vector in knn.document_vectors:
+            expected_similarities.append(KNN.get_similarity(target_vector, document_vector))
+        expected_indices = sorted(range(0, len(documents)), key=lambda i: expected_similarities[i], reverse=True)[0:4]
+        most_similar_documents, similarities = knn.get_most_similar_documents(target)
+        self.assertEqual(most_similar_documents, [documents[i] for i in expected_indices])
+        for i in range(0, 4):
+            self.assertAlmostEqual(similarities[i], expected_similarities[expected_indices[i]])
+
+    def test_predict_batch(self):
+        documents = [
+            ClassDocument("A great product, works great.", "+"),
+            ClassDocument("Great value and it works.", "+"),
+            ClassDocument("Really happy, great sound.", "+"),
+            ClassDocument("Broken on arrival, awful.", "-"),
+            ClassDocument("Awful sound and broken cable.", "-"),
+            ClassDocument("It broke, awful value.", "-")
+        ]
+        knn = KNN(documents, 3, block_size=2)
+        testing = [
+            ClassDocument("Great sound, works.", "+"),
+            ClassDocument("Awful, broken.", "-"),
+            ClassDocument("Great product.", "+")
+        ]
+        predictions = knn.predict_batch(testing)
+        self.assertEqual(predictions, ["+", "-", "+"])
+        self.assertEqual(predictions, [knn.get_prediction(document) for document in testing])
@@ -0,0 +1,61 @@
+import unittest
+import numpy
+from nlp.latent_semantic_analysis import LatentSemanticAnalysis
+from nlp.document import Document
+
+
+class TestLatentSemanticAnalysis(unittest.TestCase):
+
+    documents = [
+        Document("The team won the match after a late goal.", preserve_duplicates=True),
+        Document("A late goal decided the cup match for the team.", preserve_duplicates=True),
+        Document("The minister won the election for the government.", preserve_duplicates=True),
+        Document("The government called an election and the minister spoke.", preserve_duplicates=True),
+        Document("Shares fell as the bank reported weaker growth.", preserve_duplicates=True),
+        Document("The bank said growth and shares would recover.", preserve_duplicates=True),
+    ]
+
+    def test_truncated_decomposition(self):
+        lsa = LatentSemanticAnalysis(self.documents)
+        for algorithm in ["lanczos", "randomized"]:
+            truncated_lsa = LatentSemanticAnalysis(self.documents, rank=3, algorithm=algorithm)
+            self.assertEqual(truncated_lsa.word_vectors.shape, (len(lsa.vocabulary), 3))
+            self.assertEqual(truncated_lsa.document_vectors.shape, (3, len(self.documents)))
+            self.assertTrue(numpy.allclose(truncated_lsa.singular_values, lsa.singular_values[0:3]))
+            self.assertTrue(numpy.allclose(numpy.abs(truncated_lsa.word_vectors), numpy.abs(lsa.word_vectors[:, 0:3]),
+                                           atol=1e-6))
+            self.assertTrue(numpy.allclose(numpy.abs(truncated_lsa.document_vectors), numpy.abs(lsa.document_vectors[0:3]),
+                                           atol=1e-6))
+
+    def test_get_signed_vectors(self):
+        word_vectors, document_vectors = LatentSemanticAnalysis.get_signed_vectors(numpy.array([[-3.0, 1.0], [1.0, -2.0]]),
+                                                                                   numpy.array([[1.0, 2.0], [3.0, 4.0]]))
+        self.assertEqual(word_vectors.tolist(), [[3.0, -1.0], [-1.0, 2.0]])
+        self.assertEqual(document_vectors.tolist(), [[-1.0, -2.0], [-3.0, -4.0]])
+
+    def test_transform(self):
+        lsa = LatentSemanticAnalysis(self.documents, rank=3)
+        self.assertTrue(numpy.allclose(lsa.transform(self.documents[0:2]), lsa.document_vectors[:, 0:2].T))
+
+    def test_update(self):
+        lsa = LatentSemanticAnalysis(self.documents[0:4])
+        lsa.update(self.documents[4:], block_size=1)
+        matrix = lsa.term_document_matrix.get_document_matrix(self.documents).T.toarray()
+        self.assertEqual(lsa.document_vectors.shape[1], len(self.documents))
+        self.assertTrue(numpy.allclose(lsa.term_document_matrix.matrix.T.toarray(), matrix))
+        self.assertEqual(len(lsa.term_document_matrix.documents), len(self.documents))
+        self.assertTrue(numpy.allclose(lsa.singular_values, numpy.linalg.svd(matrix, compute_uv=False)))
+        self.assertTrue(numpy.allclose((lsa.word_vectors * lsa.singular_values) @ lsa.document_vectors, matrix))
+
+    def test_update_wider_than_vocabulary(self):
+        documents = [Document("alpha alpha", preserve_duplicates=True), Document("beta", preserve_duplicates=True),
+                     Document("gamma beta gamma", preserve_duplicates=True)]
+        new_documents = [Document(text, preserve_duplicates=True) for text in ["alpha", "beta beta", "gamma alpha",
+                                                                             "alpha beta gamma", "gamma delta"]]
+        for rank in [None, 2]:
+            lsa = LatentSemanticAnalysis(documents, rank=rank)
+            lsa.update(new_documents)
+            matrix = lsa.term_document_matrix.get_document_matrix(documents + new_documents).T.toarray()
+            self.assertEqual(lsa.document_vectors.shape[1], 8)
+            expected = numpy.linalg.svd(matrix, compute_uv=False)
+            self.assertTrue(numpy.allclose(lsa.singular_values, expected[0:len(lsa.singular_values)]))
@@ -0,0 +1,89 @@
+import unittest
+from os.path import join
+from tempfile import TemporaryDirectory
+import numpy
+from nlp.model_file import ModelFile
+from nlp.naive_bayes import NaiveBayes
+from nlp.knn import KNN
+from nlp.id3 import ID3
+from nlp.latent_semantic_analysis import LatentSemanticAnalysis
+from nlp.feature_hasher import FeatureHasher
+from nlp.document import Document, ClassDocument
+
+
+class TestModelFile(unittest.TestCase):
+
+    documents = [
+        ClassDocument("great sound great value", "+", preserve_duplicates=True),
+        ClassDocument("great cable works well", "+", preserve_duplicates=True),
+        ClassDocument("broken cable awful sound", "-", preserve_duplicates=True),
+        ClassDocument("bad value broken", "-", preserve_duplicates=True),
+    ]
+
+    testing = [
+        Document("great value", preserve_duplicates=True),
+        Document("awful broken cable", preserve_duplicates=True),
+        Document("unknown words only", preserve_duplicates=True),
+    ]
+
+    def test_save_and_load(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "model")
+            ModelFile.save(path, "Test", {"k": 1}, {"values": numpy.arange(3)})
+            ModelFile.save(path, "Test", {"k": 2}, {"values": numpy.arange(4)})
+            header, arrays = ModelFile.load(path, "Test")
+            self.assertEqual(header, {"k": 2})
+            self.assertIsInstance(arrays["values"], numpy.memmap)
+            self.assertEqual(arrays["values"].tolist(), [0, 1, 2, 3])
+            self.assertRaises(ValueError, ModelFile.load, path, "Other")
+
+    def test_classifiers(self):
+        classifiers = [NaiveBayes(self.documents), NaiveBayes(self.documents, hasher=FeatureHasher(bits=8, signed=False)),
+                       NaiveBayes(self.documents, vocabulary=["great", "broken"]), KNN(self.documents, 3),
+                       KNN(self.documents, 1, search="lsh", search_options={"bits": 2, "tables": 2}),
+                       ID3(self.documents)]
+        with TemporaryDirectory() as directory:
+            for i in range(0, len(classifiers)):
+                path = join(directory, str(i))
+                classifiers[i].save(path)
+                loaded = type(classifiers[i]).load(path)
+                self.assertEqual(loaded.predict_batch(self.testing), classifiers[i].predict_batch(self.testing))
+                self.assertEqual(loaded.document_options, {"preserve_duplicates": True, "remove_stopwords": False,
+                                                           "ngrams": None})
+                for document in self.testing:
+                    self.assertEqual(loaded.get_prediction(document), classifiers[i].get_prediction(document))
+            naive_bayes = NaiveBayes.load(join(directory, "0"))
+            naive_bayes.partial_fit(self.documents[0:1])
+            self.assertEqual(naive_bayes.vocabulary["great"], 5)
+            self.assertEqual(naive_bayes.class_document_counts["+"], 3)
+
+    def test_latent_semantic_analysis(self):
+        lsa = LatentSemanticAnalysis(self.documents, rank=2)
+        with TemporaryDirectory() as directory:
+            lsa.save(join(directory, "lsa"))
+            loaded = LatentSemanticAnalysis.load(join(directory, "lsa"))
+            self.assertEqual(loaded.vocabulary, lsa.vocabulary)
+            self.assertEqual(loaded.document_options, lsa.document_options)
+            self.assertTrue(numpy.allclose(loaded.transform(self.testing), lsa.transform(self.testing)))
+            self.assertEqual(loaded.get_keywords_for_topics(2, 3), lsa.get_keywords_for_topics(2, 3))
+            self.assertEqual(loaded.term_document_matrix.get_inverse_document_frequency("missing"),
+                             lsa.term_document_matrix.get_inverse_document_frequency("missing"))
+
+    def test_latent_semantic_analysis_update(self):
+        lsa = LatentSemanticAnalysis(self.documents[0:3], rank=2)
+        inverse_document_frequencies = lsa.term_document_matrix.inverse_document_frequencies.copy()
+        lsa.update(self.documents[3:])
+        with TemporaryDirectory() as directory:
+            lsa.save(join(directory, "lsa"))
+            loaded = LatentSemanticAnalysis.load(join(directory, "lsa"))
+            self.assertEqual(loaded.term_document_matrix.matrix.shape[0], loaded.document_vectors.shape[1])
+            self.assertEqual(loaded.term_document_matrix.matrix.shape[0], len(self.documents))
+            self.assertTrue(numpy.allclose(loaded.term_document_matrix.matrix.toarray(),
+                                           lsa.term_document_matrix.matrix.toarray()))
+            self.assertTrue(numpy.allclose(loaded.term_document_matrix.inverse_document_frequencies,
+                                           inverse_document_frequencies))
+            self.assertTrue(numpy.allclose(loaded.transform(self.testing), lsa.transform(self.testing)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,7 @@ class TestNaiveBayes(unittest.TestCase):
             "don't": 1, "it": 1, "hard": 1, "not": 1
         }
         self.assertEqual(nb.vocabulary, expected_vocabulary)
+        self.assertEqual(NaiveBayes(set(documents)).vocabulary, expected_vocabulary)
 
     def test_class_vocabularies(self):
         documents = [
@@ -67,4 +68,65 @@ class TestNaiveBayes(unittest.TestCase):
         self.assertEqual(nb.get_likelihood("use", "+"), log((1 + 1) / (10 + 14 * 1)))
         self.assertEqual(nb.get_likelihood("use", "-"), log((1 + 1) / (8 + 14 * 1)))
 
+    def test_log_likelihoods(self):
+        documents = [
+            ClassDocument("I like this product very much.", "+"),
+            ClassDocument("Easy to use, recommended.", "+"),
+            ClassDocument("Don't like it, hard to use. Not recommended.", "-"),
+        ]
+        nb = NaiveBayes(documents)
+        self.assertEqual(nb.log_likelihoods.shape, (2, 14))
+        self.assertEqual(nb.log_likelihoods[0, nb.word_ids["easy"]], log((1 + 1) / (10 + 14 * 1)))
+        self.assertEqual(nb.log_likelihoods[1, nb.word_ids["easy"]], log((0 + 1) / (8 + 14 * 1)))
+        self.assertEqual(nb.unknown_log_likelihoods.tolist(), [log(1 / (10 + 14 * 1)), log(1 / (8 + 14 * 1))])
+        self.assertEqual(nb.get_likelihood("unseen", "-"), log(1 / (8 + 14 * 1)))
+
+    def test_predict_batch(self):
+        documents = [
+            ClassDocument("I like this product very much.", "+"),
+            ClassDocument("Easy to use, recommended.", "+"),
+            ClassDocument("Don't like it, hard to use. Not recommended.", "-"),
+        ]
+        nb = NaiveBayes(documents)
+        testing = [
+            ClassDocument("Very easy, I like it.", "+"),
+            ClassDocument("Hard to use, not good.", "-"),
+            ClassDocument("Unseen words only", "+")
+        ]
+        predictions = nb.predict_batch(testing)
+        self.assertEqual(predictions, ["+", "-", "+"])
+        self.assertEqual(predictions, [nb.get_prediction(document) for document in testing])
 
+    def test_partial_fit(self):
+        documents = [
+            ClassDocument("I like this product very much.", "+"),
+            ClassDocument("Easy to use, recommended.", "+"),
+            ClassDocument("Don't like it, hard to use. Not recommended.", "-"),
+            ClassDocument("Awful, I would not buy it again.", "-"),
+        ]
+        nb = NaiveBayes(documents)
+        incremental_nb = NaiveBayes(documents[0:2])
+        incremental_nb.partial_fit(documents[2:])
+        self.assertEqual(incremental_nb.classes, nb.classes)
+        self.assertEqual(incremental_nb.vocabulary, nb.vocabulary)
+        self.assertEqual(incremental_nb.class_vocabularies, nb.class_vocabularies)
+        self.assertEqual(incremental_nb.class_word_counts, nb.class_word_counts)
+        self.assertEqual(incremental_nb.priors, nb.priors)
+        self.assertEqual(incremental_nb.log_likelihoods.tolist(), nb.log_likelihoods.tolist())
+
+    def test_merge(self):
+        documents = [
+            ClassDocument("I like this product very much.", "+"),
+            ClassDocument("Don't like it, hard to use. Not recommended.", "-"),
+            ClassDocument("Easy to use, recommended.", "+"),
+            ClassDocument("Awful, I would not buy it again.", "-"),
+        ]
+        nb = NaiveBayes(documents)
+        merged_nb = NaiveBayes(documents[0:2])
+        merged_nb.merge(NaiveBayes(documents[2:]))
+        self.assertEqual(merged_nb.vocabulary, nb.vocabulary)
+        self.assertEqual(merged_nb.class_vocabularies, nb.class_vocabularies)
+        self.assertEqual(merged_nb.class_document_counts, {"+": 2, "-": 2})
+        self.assertEqual(merged_nb.priors, nb.priors)
+        self.assertEqual(merged_nb.log_likelihoods.tolist(), nb.log_likelihoods.tolist())
+        self.assertEqual(merged_nb.predict_batch(documents), nb.predict_batch(documents))
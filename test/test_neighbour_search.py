@@ -0,0 +1,69 @@
+import unittest
+from nlp.neighbour_search import NeighbourSearch, ExactSearch, LSHSearch
+from scipy.sparse import csr_matrix
+import numpy
+
+
+class TestNeighbourSearch(unittest.TestCase):
+
+    def test_get_top_indices(self):
+        similarities = numpy.array([0.2, 0.9, 0.2, 0.5, 0.2, 0.1])
+        self.assertEqual(NeighbourSearch.get_top_indices(similarities, 3).tolist(), [1, 3, 0])
+        self.assertEqual(NeighbourSearch.get_top_indices(similarities, 4).tolist(), [1, 3, 0, 2])
+        self.assertEqual(NeighbourSearch.get_top_indices(similarities, 10).tolist(), [1, 3, 0, 2, 4, 5])
+
+    def test_get_top_candidates(self):
+        candidates = numpy.array([1, 3, 4, 7])
+        similarities = numpy.array([0.4, -0.2, 0.9, 0.4])
+        indices, top_similarities = NeighbourSearch.get_top_candidates(candidates, similarities, 2, 8)
+        self.assertEqual((indices.tolist(), top_similarities.tolist()), ([4, 1], [0.9, 0.4]))
+        indices, top_similarities = NeighbourSearch.get_top_candidates(candidates, similarities, 5, 8)
+        self.assertEqual(indices.tolist(), [4, 1, 7, 0, 2])
+        self.assertEqual(top_similarities.tolist(), [0.9, 0.4, 0.4, 0.0, 0.0])
+        indices, top_similarities = NeighbourSearch.get_top_candidates(candidates, similarities, 8, 8)
+        self.assertEqual(indices.tolist(), [4, 1, 7, 0, 2, 5, 6, 3])
+
+    def test_get_normalised_matrix(self):
+        matrix = csr_matrix(numpy.array([[3.0, 0.0, 4.0], [0.0, 0.0, 0.0], [0.0, 2.0, 0.0]]))
+        expected_matrix = [[0.6, 0.0, 0.8], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+        self.assertEqual(NeighbourSearch.get_normalised_matrix(matrix).toarray().tolist(), expected_matrix)
+
+    def test_exact_search(self):
+        matrix = NeighbourSearch.get_normalised_matrix(csr_matrix(numpy.array([
+            [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 0.0, 1.0], [0.0, 2.0, 1.0]
+        ])))
+        query_matrix = NeighbourSearch.get_normalised_matrix(csr_matrix(numpy.array([[0.0, 1.0, 0.0]])))
+        indices, similarities = ExactSearch(matrix).search(query_matrix, 3)[0]
+        self.assertEqual(indices.tolist(), [3, 1, 0])
+        self.assertAlmostEqual(similarities[0], 2 / numpy.sqrt(5))
+        self.assertAlmostEqual(similarities[1], 1 / numpy.sqrt(2))
+        self.assertEqual(similarities[2], 0.0)
+
+    def test_lsh_search(self):
+        generator = numpy.random.default_rng(0)
+        matrix = NeighbourSearch.get_normalised_matrix(csr_matrix(generator.random((200, 30))))
+        query_matrix = matrix[0:20]
+        lsh_search = LSHSearch(matrix, bits=4, tables=6)
+        self.assertEqual(sum(len(bucket) for bucket in lsh_search.buckets[0].values()) > 0, True)
+        for i, (indices, similarities) in enumerate(lsh_search.search(query_matrix, 5)):
+            self.assertEqual(len(indices), 5)
+            self.assertEqual(indices[0], i)
+            self.assertAlmostEqual(similarities[0], 1.0)
+        blocked_search = LSHSearch(matrix, bits=4, tables=6, block_size=7)
+        self.assertEqual([indices.tolist() for indices, similarities in blocked_search.search(query_matrix, 5)],
+                         [indices.tolist() for indices, similarities in lsh_search.search(query_matrix, 5)])
+        self.assertTrue(numpy.array_equal(lsh_search.get_hashes(matrix, feature_block_size=4),
+                                          lsh_search.get_hashes(matrix)))
+
+    def test_get_hyperplanes(self):
+        hyperplanes = LSHSearch.get_hyperplanes(numpy.array([3, 1 << 20]), 24, 42)
+        self.assertEqual(hyperplanes.shape, (2, 24))
+        self.assertEqual(set(hyperplanes.ravel().tolist()), {-1.0, 1.0})
+        self.assertTrue(numpy.array_equal(LSHSearch.get_hyperplanes(numpy.array([1 << 20]), 24, 42), hyperplanes[1:]))
+        self.assertFalse(numpy.array_equal(LSHSearch.get_hyperplanes(numpy.array([3]), 24, 7), hyperplanes[0:1]))
+
+    def test_get_neighbour_search(self):
+        matrix = csr_matrix(numpy.eye(3))
+        self.assertEqual(type(NeighbourSearch.get_neighbour_search("exact", matrix)), ExactSearch)
+        self.assertEqual(type(NeighbourSearch.get_neighbour_search("lsh", matrix, {"bits": 2})), LSHSearch)
+        self.assertEqual(NeighbourSearch.get_neighbour_search("unknown", matrix), None)
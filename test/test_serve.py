@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+from os.path import join
+from tempfile import TemporaryDirectory
+from json import loads, dumps
+from nlp.serve import PredictionService
+from nlp.naive_bayes import NaiveBayes
+from nlp.document import Document, ClassDocument
+
+
+class TestPredictionService(unittest.TestCase):
+
+    documents = [
+        ClassDocument("great sound great value", "+"),
+        ClassDocument("great cable works well", "+"),
+        ClassDocument("broken cable awful sound", "-"),
+        ClassDocument("bad value broken", "-"),
+    ]
+
+    texts = ["great value", "awful broken cable", "great sound", "bad cable"]
+
+    def test_predict(self):
+        classifier = NaiveBayes(self.documents)
+        service = PredictionService(classifier, maximum_batch_size=3, maximum_delay=0.05)
+
+        async def predict():
+            return await asyncio.gather(*[service.predict([text]) for text in self.texts])
+
+        results = asyncio.run(predict())
+        expected = classifier.predict_batch([Document(text) for text in self.texts])
+        self.assertEqual([result[0] for result in results], expected)
+        stats = service.get_stats()
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(stats["documents"], 4)
+        self.assertEqual(stats["batches"], 2)
+        self.assertLessEqual(stats["p50_latency_ms"], stats["p99_latency_ms"])
+
+    def test_prediction_error(self):
+        class FailingClassifier:
+            def predict_batch(self, documents):
+                raise KeyError("missing")
+
+        service = PredictionService(FailingClassifier(), maximum_delay=0)
+
+        async def request():
+            server = await asyncio.start_server(service.handle_connection, host="127.0.0.1", port=0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(b"POST /predict HTTP/1.0\r\nContent-Length: 17\r\n\r\n{\"text\": \"great\"}")
+            response = await reader.read()
+            writer.close()
+            server.close()
+            return response
+
+        head, _, body = asyncio.run(request()).partition(b"\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 500 Internal Server Error"))
+        self.assertIn("KeyError", loads(body)["error"])
+
+    def test_get_service(self):
+        documents = [ClassDocument(document.text, document.c, preserve_duplicates=True, ngrams=[2])
+                     for document in self.documents]
+        with TemporaryDirectory() as directory:
+            NaiveBayes(documents).save(join(directory, "model"))
+            service = PredictionService.get_service(join(directory, "model"), maximum_batch_size=8)
+            self.assertIsNone(PredictionService.get_service(directory))
+        self.assertEqual(service.maximum_batch_size, 8)
+        self.assertEqual(service.tokenizer.get_options(),
+                         {"preserve_duplicates": True, "remove_stopwords": False, "ngrams": [2]})
+
+    def test_http(self):
+        service = PredictionService(NaiveBayes(self.documents), maximum_delay=0)
+
+        async def request(port, data):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), loads(body)
+
+        async def requests():
+            server = await asyncio.start_server(service.handle_connection, host="127.0.0.1", port=0)
+            port = server.sockets[0].getsockname()[1]
+            body = dumps({"texts": self.texts[0:2]}).encode("utf-8")
+            responses = [
+                await request(port, b"POST /predict HTTP/1.0\r\nContent-Length: " + str(len(body)).encode() +
+                             b"\r\n\r\n" + body),
+                await request(port, b"POST /predict HTTP/1.0\r\nContent-Length: 2\r\n\r\n{}"),
+                await request(port, b"GET /stats HTTP/1.0\r\n\r\n"),
+                await request(port, b"GET / HTTP/1.0\r\n\r\n"),
+            ]
+            server.close()
+            return responses
+
+        responses = asyncio.run(requests())
+        self.assertEqual(responses[0], (200, {"classes": ["+", "-"]}))
+        self.assertEqual(responses[1][0], 400)
+        self.assertEqual(responses[2][0], 200)
+        self.assertEqual(responses[2][1]["documents"], 2)
+        self.assertEqual(responses[3][0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
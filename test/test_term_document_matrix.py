@@ -1,7 +1,9 @@
 import unittest
-from nlp.term_document_matrix import TermDocumentMatrix
-from nlp.document import Document
+from nlp.term_document_matrix import TermDocumentMatrix, DocumentFrequencyTable
+from nlp.document import Document, Tokenizer, Interner
 from math import log
+from os.path import join
+from tempfile import TemporaryDirectory
 
 
 class TestTermDocumentMatrix(unittest.TestCase):
@@ -108,5 +110,74 @@ class TestTermDocumentMatrix(unittest.TestCase):
         ]
         self.assertEqual(word_vector, tuple(expected_word_vector))
 
+    def test_get_word_ids(self):
+        word_ids = TermDocumentMatrix.get_word_ids(["nice", "document", "bad"])
+        self.assertEqual(word_ids, {"nice": 0, "document": 1, "bad": 2})
 
+    def test_get_term_frequencies(self):
+        documents = [
+            Document("Nice document, document", preserve_duplicates=True),
+            Document("Bad document"),
+            Document("Nice day")
+        ]
+        term_document_matrix = TermDocumentMatrix(documents)
+        expected_term_frequencies = [
+            [1, 2, 0, 0],
+            [0, 1, 1, 0],
+            [1, 0, 0, 1]
+        ]
+        self.assertEqual(term_document_matrix.vocabulary, ["nice", "document", "bad", "day"])
+        self.assertEqual(term_document_matrix.term_frequencies.toarray().tolist(), expected_term_frequencies)
+        self.assertEqual(term_document_matrix.document_frequencies.tolist(), [2, 2, 1, 1])
+        interner = Interner()
+        interned_documents = [Document("Unseen words", tokenizer=Tokenizer(interner=interner))]
+        interned_documents += [Document(document.text, tokenizer=Tokenizer(preserve_duplicates=True, interner=interner))
+                               for document in documents]
+        self.assertEqual(term_document_matrix.get_term_frequencies(interned_documents).toarray().tolist(),
+                         [[0, 0, 0, 0], [1, 2, 0, 0], [0, 1, 1, 0], [1, 0, 0, 1]])
+
+    def test_get_document_vectors(self):
+        documents = [
+            Document("Nice document, document", preserve_duplicates=True),
+            Document("Bad document"),
+            Document("Nice day")
+        ]
+        term_document_matrix = TermDocumentMatrix(documents)
+        expected_document_vectors = [
+            {"nice": 1 * log(3 / 3), "document": 2 * log(3 / 3)},
+            {"document": 1 * log(3 / 3), "bad": 1 * log(3 / 2)},
+            {"nice": 1 * log(3 / 3), "day": 1 * log(3 / 2)}
+        ]
+        self.assertEqual(term_document_matrix.document_vectors, expected_document_vectors)
+        self.assertEqual(term_document_matrix.get_document_vectors(documents), expected_document_vectors)
+
+    def test_document_frequency_table(self):
+        documents = [
+            Document("This document is a document with duplicates.", preserve_duplicates=True),
+            Document("This is just to check that a word is not present.", preserve_duplicates=True)
+        ]
+        document_frequency_table = DocumentFrequencyTable()
+        word_counts = TermDocumentMatrix.get_word_counts(documents, document_frequency_table=document_frequency_table)
+        self.assertEqual(word_counts["document"], 2)
+        self.assertEqual(document_frequency_table.get_document_frequency("document"), 1)
+        self.assertEqual(document_frequency_table.get_document_frequency("is"), 2)
+        self.assertEqual(document_frequency_table.get_document_frequency("not_present"), 0)
+        self.assertEqual(document_frequency_table.get_inverse_document_frequencies(["is", "just"]).tolist(),
+                         [log(2 / 3), log(2 / 2)])
 
+    def test_document_frequency_table_reuse(self):
+        documents = [
+            Document("Nice document"),
+            Document("Bad document"),
+            Document("Nice day today")
+        ]
+        document_frequency_table = DocumentFrequencyTable(documents)
+        with TemporaryDirectory() as directory:
+            path = join(directory, "frequencies.npz")
+            document_frequency_table.save(path)
+            loaded_table = DocumentFrequencyTable.load(path)
+        self.assertEqual(loaded_table.counts, document_frequency_table.counts)
+        self.assertEqual(loaded_table.number_of_documents, 3)
+        term_document_matrix = TermDocumentMatrix(documents[0:2], document_frequency_table=loaded_table)
+        self.assertEqual(term_document_matrix.get_inverse_document_frequency("nice"), log(3 / 3))
+        self.assertEqual(term_document_matrix.get_inverse_document_frequency("today"), log(3 / 2))